@@ -0,0 +1,159 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+# Applied to every connection as libpq startup options, so they cost no extra round trip
+DEFAULT_SESSION_SETTINGS = {
+    "statement_timeout": "300000",  # 5 phút
+    "idle_in_transaction_session_timeout": "60000",
+}
+
+
+def startup_options(settings: Dict[str, str]) -> str:
+    return " ".join(f"-c {name}={value}" for name, value in settings.items())
+
+
+class DatabasePool:
+    """Process-wide Postgres connection budget for the Streamlit apps.
+
+    ``max_connections`` is the most this process will ever hold open against
+    Supabase. ``vecs_connections`` of them go to the SQLAlchemy engine that
+    mem0's vector store uses through vecs; the rest back a psycopg2 pool for
+    direct queries. Callers that find the budget exhausted wait up to
+    ``timeout`` seconds for a connection to be returned instead of opening a
+    new one.
+
+    Every connection starts with ``session_settings``. A connection that has
+    been idle for more than ``health_check_interval`` seconds is checked with
+    ``SELECT 1`` when it is handed out and replaced if it is dead.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        max_connections: int = 8,
+        vecs_connections: int = 3,
+        min_connections: int = 0,
+        timeout: float = 10.0,
+        health_check_interval: float = 30.0,
+        session_settings: Optional[Dict[str, str]] = None,
+    ):
+        if not 0 <= vecs_connections < max_connections:
+            raise ValueError("vecs_connections must leave at least one connection for direct queries")
+        self.dsn = dsn
+        self.max_connections = max_connections
+        self.vecs_connections = vecs_connections
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.session_settings = dict(DEFAULT_SESSION_SETTINGS if session_settings is None else session_settings)
+        self.options = startup_options(self.session_settings)
+
+        direct_connections = max_connections - vecs_connections
+        self._pool = pg_pool.ThreadedConnectionPool(
+            min(min_connections, direct_connections), direct_connections, dsn, options=self.options
+        )
+        # ThreadedConnectionPool raises instead of waiting when it is empty
+        self._slots = threading.BoundedSemaphore(direct_connections)
+        self._last_used: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.replaced = 0
+
+    def _checkout(self):
+        if not self._slots.acquire(blocking=False):
+            self.waits += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                raise pg_pool.PoolError(
+                    f"All {self.max_connections - self.vecs_connections} database connections are in use"
+                )
+        try:
+            conn = self._pool.getconn()
+            idle_since = self._last_used.get(id(conn))
+            if idle_since is not None and time.monotonic() - idle_since > self.health_check_interval:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                    conn.rollback()
+                except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                    self._discard(conn)
+                    self.replaced += 1
+                    conn = self._pool.getconn()
+            with self._lock:
+                self.checkouts += 1
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def _checkin(self, conn):
+        try:
+            if conn.closed:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success and rolls back on error."""
+        conn = self._checkout()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self._checkin(conn)
+
+    def engine_options(self) -> Dict[str, Any]:
+        """SQLAlchemy ``create_engine`` arguments that keep vecs inside its share of the budget."""
+        return {
+            "pool_size": self.vecs_connections,
+            "max_overflow": 0,
+            "pool_timeout": self.timeout,
+            "pool_pre_ping": True,
+            "pool_recycle": 1800,
+            "connect_args": {"options": self.options},
+        }
+
+    def vecs_client(self):
+        """A vecs client whose engine uses the bounded pool from ``engine_options``."""
+        import vecs
+        import vecs.client
+
+        if not self.vecs_connections:
+            # SQLAlchemy reads pool_size=0 as "no limit"
+            raise ValueError("This pool has no connections set aside for vecs")
+        create_engine = vecs.client.create_engine
+        vecs.client.create_engine = lambda url, **kwargs: create_engine(url, **{**self.engine_options(), **kwargs})
+        try:
+            return vecs.create_client(self.dsn)
+        finally:
+            vecs.client.create_engine = create_engine
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_connections": self.max_connections,
+            "vecs_connections": self.vecs_connections,
+            "open_direct": len(self._pool._used) + len(self._pool._pool),
+            "in_use_direct": len(self._pool._used),
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "replaced": self.replaced,
+        }
+
+    def close(self):
+        self._pool.closeall()
@@ -2,6 +2,15 @@ from dotenv import load_dotenv
 from openai import OpenAI
 from mem0 import Memory
 import os
+import sys
+
+# The memory and cache helpers are shared with the agent API. Its directory
+# name has hyphens, so it goes on the path instead of being imported as a package.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "studio-integration-version"))
+
+from context_builder import ContextBuilder
+from memory_cache import CachedMemory
+from memory_factory import build_memory
 
 # Load environment variables
 load_dotenv()
@@ -13,22 +22,40 @@ config = {
             "model": os.getenv('MODEL_CHOICE', 'gpt-4o-mini')
         }
     },
+    # VECTOR_STORE_PROVIDER=local keeps memories in an embedded store on this machine
     "vector_store": {
+        "provider": "local",
+        "config": {
+            "path": os.getenv("LOCAL_VECTOR_STORE_PATH", "local_vector_store"),
+            "collection_name": "memories"
+        }
+    } if os.getenv("VECTOR_STORE_PROVIDER", "supabase") == "local" else {
         "provider": "supabase",
         "config": {
             "connection_string": os.environ['DATABASE_URL'],
             "collection_name": "memories"
         }
-    }    
+    }
 }
 
+# Only relevant, non-duplicate memories within the token budget go into the prompt
+context_builder = ContextBuilder(
+    max_distance=float(os.getenv("MEMORY_MAX_DISTANCE", "0.65")),
+    memory_tokens=int(os.getenv("MEMORY_TOKEN_BUDGET", "400"))
+)
+MEMORY_SEARCH_CANDIDATES = int(os.getenv("MEMORY_SEARCH_CANDIDATES", "10"))
+
 openai_client = OpenAI()
-memory = Memory.from_config(config)
+memory = CachedMemory(
+    build_memory(config),
+    max_entries=int(os.getenv("MEMORY_SEARCH_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("MEMORY_SEARCH_CACHE_TTL", "300"))
+)
 
 def chat_with_memories(message: str, user_id: str = "default_user") -> str:
     # Retrieve relevant memories
-    relevant_memories = memory.search(query=message, user_id=user_id, limit=3)
-    memories_str = "\n".join(f"- {entry['memory']}" for entry in relevant_memories["results"])
+    relevant_memories = memory.search(query=message, user_id=user_id, limit=MEMORY_SEARCH_CANDIDATES)
+    memories_str = context_builder.format_memories(relevant_memories["results"])
     
     # Generate Assistant response
     system_prompt = f"You are a helpful AI. Answer the question based on query and memories.\nUser Memories:\n{memories_str}"
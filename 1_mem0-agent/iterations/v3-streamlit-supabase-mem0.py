@@ -1,4 +1,5 @@
 import os
+import sys
 import streamlit as st
 from dotenv import load_dotenv
 from openai import OpenAI
@@ -6,8 +7,18 @@ from mem0 import Memory
 import supabase
 from supabase.client import Client, ClientOptions
 import uuid
-import vecs
-import psycopg2
+
+# The memory, cache and resilience helpers are shared with the agent API.
+# Its directory name has hyphens, so it goes on the path instead of being
+# imported as a package; the Docker image copies them next to this file.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "studio-integration-version"))
+
+from context_builder import ContextBuilder
+from db_pool import DatabasePool
+from embedding_cache import embedding_stats
+from memory_cache import CachedMemory
+from memory_factory import build_memory
+from resilience import Dependency
 
 # Load environment variables
 load_dotenv()
@@ -36,31 +47,35 @@ client = OpenAI()
 # Cache OpenAI client and Memory instance
 @st.cache_resource
 def get_openai_client():
-    return OpenAI()
+    # Retries are budgeted by the Dependency below instead of by the client
+    return OpenAI(max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "0")))
+
+@st.cache_resource
+def get_dependencies():
+    # Shared by every session, so once a dependency keeps failing each rerun
+    # skips it at once instead of waiting out the full timeout
+    return {
+        "llm": Dependency("llm", max_timeout=float(os.getenv("LLM_TIMEOUT", "60")), min_timeout=float(os.getenv("LLM_MIN_TIMEOUT", "10"))),
+        # mem0 takes no timeout, so for it only the breaker and retries apply
+        "mem0": Dependency("mem0")
+    }
+
+@st.cache_resource
+def get_db_pool():
+    # One bounded set of Postgres connections shared by every session and rerun
+    return DatabasePool(
+        os.environ['DATABASE_URL'],
+        max_connections=int(os.getenv("DB_POOL_MAX_CONNECTIONS", "8")),
+        vecs_connections=int(os.getenv("DB_POOL_VECS_CONNECTIONS", "3")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    )
 
 @st.cache_resource
 def get_memory():
     try:
-        # Kết nối trực tiếp để tăng timeout
-        conn_str = os.environ['DATABASE_URL']
-        
-        # Tăng statement_timeout cho toàn bộ phiên
-        try:
-            direct_conn = psycopg2.connect(conn_str)
-            with direct_conn.cursor() as cur:
-                # Tăng statement_timeout lên 5 phút
-                cur.execute("SET statement_timeout = 300000")  # 5 phút
-                direct_conn.commit()
-            
-            # Sửa đổi chuỗi kết nối để thêm options
-            if "?" in conn_str:
-                conn_str += "&options=--statement_timeout=300000"
-            else:
-                conn_str += "?options=--statement_timeout=300000"
-                
-            direct_conn.close()
-        except Exception as e:
-            st.warning(f"Không thể cấu hình timeout: {str(e)}")
+        # VECTOR_STORE_PROVIDER=local keeps memories in an embedded store on this node
+        provider = os.getenv("VECTOR_STORE_PROVIDER", "supabase")
+        conn_str = os.environ.get('DATABASE_URL', '')
         
         # Tạo config cho Memory - loại bỏ create_collection
         config = {
@@ -71,33 +86,38 @@ def get_memory():
                 }
             },
             "vector_store": {
+                "provider": "local",
+                "config": {
+                    "path": os.getenv("LOCAL_VECTOR_STORE_PATH", "local_vector_store"),
+                    "collection_name": "memories_new",
+                    "embedding_model_dims": 1536
+                }
+            } if provider == "local" else {
                 "provider": "supabase",
                 "config": {
                     "connection_string": conn_str,
                     "collection_name": "memories_new",
                     "embedding_model_dims": 1536  # Số chiều của OpenAI text-embedding-ada-002
                 }
-            }    
+            },
+            # Reuse embeddings of repeated queries and facts across reruns and restarts
+            "embedding_cache": {
+                "path": os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"),
+                "memory_items": int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+            }
         }
         
-        # Thử tạo collection trước khi khởi tạo Memory
-        try:
-            import vecs
-            db = vecs.create_client(conn_str)
-            # Kiểm tra nếu collection đã tồn tại
-            try:
-                # Sử dụng get_or_create_collection thay vì create_collection
-                db.get_or_create_collection(
-                    name="memories_new",
-                    dimension=1536
-                )
-                st.success("Collection đã được tạo/truy cập thành công!")
-            except Exception as e:
-                st.warning(f"Không thể tạo collection: {str(e)}")
-        except Exception as e:
-            st.warning(f"Không thể kết nối với vecs: {str(e)}")
+        # mem0's vecs client draws from the shared pool, which also applies statement_timeout;
+        # mem0 creates the collection itself when it is missing
+        if provider == "supabase":
+            config["db_pool"] = get_db_pool()
         
-        return Memory.from_config(config)
+        # Repeated searches are served from cache until the user's memories change
+        return CachedMemory(
+            build_memory(config),
+            max_entries=int(os.getenv("MEMORY_SEARCH_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("MEMORY_SEARCH_CACHE_TTL", "300"))
+        )
     except Exception as e:
         st.error(f"Lỗi khởi tạo Memory: {str(e)}")
         # Trả về đối tượng giả
@@ -110,9 +130,21 @@ def get_memory():
                 pass
         return FallbackMemory()
 
+# Only relevant, non-duplicate memories within the token budget go into the prompt
+@st.cache_resource
+def get_context_builder():
+    return ContextBuilder(
+        max_distance=float(os.getenv("MEMORY_MAX_DISTANCE", "0.65")),
+        memory_tokens=int(os.getenv("MEMORY_TOKEN_BUDGET", "400"))
+    )
+
+MEMORY_SEARCH_CANDIDATES = int(os.getenv("MEMORY_SEARCH_CANDIDATES", "10"))
+
 # Get cached resources
 openai_client = get_openai_client()
 memory = get_memory()
+context_builder = get_context_builder()
+dependencies = get_dependencies()
 
 # Authentication functions
 def sign_up(email, password, full_name):
@@ -168,8 +200,12 @@ def chat_with_memories(message, user_id):
         # Retrieve relevant memories
         with st.spinner("Searching memories..."):
             try:
-                relevant_memories = memory.search(query=message, user_id=user_id, limit=3)
-                memories_str = "\n".join(f"- {entry['memory']}" for entry in relevant_memories["results"])
+                relevant_memories = dependencies["mem0"].call_sync(
+                    "search",
+                    lambda timeout: memory.search(query=message, user_id=user_id, limit=MEMORY_SEARCH_CANDIDATES),
+                    retry=True
+                )
+                memories_str = context_builder.format_memories(relevant_memories["results"])
             except Exception as e:
                 st.error(f"Error retrieving memories: {str(e)}")
                 memories_str = "(No memories available)"
@@ -180,10 +216,15 @@ def chat_with_memories(message, user_id):
         
         with st.spinner("Thinking..."):
             try:
-                response = openai_client.chat.completions.create(
-                    model="gpt-4o-mini", 
-                    messages=messages,
-                    timeout=60  # Increase timeout to 60 seconds
+                # Up to LLM_TIMEOUT (60s) at first, then a few times the recent p99
+                response = dependencies["llm"].call_sync(
+                    "chat",
+                    lambda timeout: openai_client.chat.completions.create(
+                        model="gpt-4o-mini",
+                        messages=messages,
+                        timeout=timeout
+                    ),
+                    retry=True
                 )
                 assistant_response = response.choices[0].message.content
             except Exception as e:
@@ -193,7 +234,7 @@ def chat_with_memories(message, user_id):
         # Create new memories from the conversation
         try:
             messages.append({"role": "assistant", "content": assistant_response})
-            memory.add(messages, user_id=user_id)
+            dependencies["mem0"].call_sync("add", lambda timeout: memory.add(messages, user_id=user_id))
         except Exception as e:
             st.warning(f"Could not save this conversation to memory: {str(e)}")
 
@@ -280,6 +321,13 @@ with st.sidebar:
                 st.session_state.messages = []
                 st.rerun()
 
+            stats = embedding_stats(memory)
+            if stats:
+                st.caption(
+                    f"Embedding cache hit rate: {stats['hit_rate']:.0%} "
+                    f"({stats['memory_hits'] + stats['disk_hits']} hits, {stats['misses']} misses)"
+                )
+
 # Main chat interface
 if st.session_state.authenticated and st.session_state.user:
     # Use the user from session state directly
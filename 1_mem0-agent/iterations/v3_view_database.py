@@ -4,9 +4,10 @@ from dotenv import load_dotenv
 import supabase
 import pandas as pd
 import time
-import psycopg2
 from psycopg2 import sql
 
+from db_pool import DatabasePool
+
 # Load environment variables
 load_dotenv()
 
@@ -15,6 +16,117 @@ SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY", "")
 DB_URL = os.environ.get("DATABASE_URL", "")
 
+@st.cache_resource
+def get_db_pool():
+    # Reruns and sessions share these connections instead of opening one per rerun
+    return DatabasePool(
+        DB_URL,
+        max_connections=int(os.getenv("DB_POOL_MAX_CONNECTIONS", "2")),
+        vecs_connections=0,
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    )
+
+PAGE_SIZES = [50, 100, 250, 500]
+METADATA_FIELDS = ["user_id", "memory"]
+
+SCHEMA_CACHE_TTL = int(os.getenv("SCHEMA_CACHE_TTL", "300"))
+
+@st.cache_data(ttl=SCHEMA_CACHE_TTL, show_spinner=False)
+def load_tables():
+    """(schema, table, estimated rows, total bytes) for every readable table and view."""
+    # reltuples is the planner's estimate, kept current by ANALYZE/autovacuum, so no count(*)
+    with get_db_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT n.nspname, c.relname, c.reltuples::bigint, pg_total_relation_size(c.oid)
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind IN ('r', 'p', 'v', 'm', 'f')
+              AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+              AND n.nspname NOT LIKE 'pg_toast%'
+              AND has_table_privilege(c.oid, 'SELECT')
+            ORDER BY n.nspname, c.relname
+        """)
+        return cur.fetchall()
+
+@st.cache_data(ttl=SCHEMA_CACHE_TTL, show_spinner=False)
+def load_columns(schema, table):
+    with get_db_pool().connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT column_name, udt_name
+            FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s
+            ORDER BY ordinal_position
+        """, (schema, table))
+        return cur.fetchall()
+
+def format_bytes(size):
+    for unit in ["B", "kB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def describe_table(estimated_rows, total_bytes):
+    # reltuples is -1 (or 0 on old servers) until the table is first analyzed
+    rows = f"~{estimated_rows:,} rows" if estimated_rows >= 0 else "rows unknown"
+    return f"{rows}, {format_bytes(total_bytes)}"
+
+def page_key_columns(table_columns):
+    """Columns that order a table's rows uniquely: (created_at, id) for messages, id for vecs collections."""
+    names = {name for name, _ in table_columns}
+    if {"created_at", "id"} <= names:
+        return ["created_at", "id"]
+    return ["id"] if "id" in names else []
+
+def build_page_query(schema, table, table_columns, include_vectors=False, key_columns=(), after=None, page_size=50):
+    """SELECT and parameters for one table page: vector columns only on request, metadata fields projected in SQL.
+
+    With key columns the page starts right after the ``after`` key (keyset
+    paging: one index range scan however deep the page); tables without a
+    key are paged by OFFSET, with ``after`` the number of rows to skip.
+    """
+    names = {name for name, _ in table_columns}
+    items = [
+        sql.Identifier(name)
+        for name, udt_name in table_columns
+        if include_vectors or udt_name != "vector"
+    ]
+    if ("metadata", "jsonb") in table_columns or ("metadata", "json") in table_columns:
+        items += [
+            sql.SQL("{} ->> {} AS {}").format(sql.Identifier("metadata"), sql.Literal(field), sql.Identifier(field))
+            for field in METADATA_FIELDS if field not in names
+        ]
+    query = sql.SQL("SELECT {} FROM {}.{}").format(
+        sql.SQL(", ").join(items) if items else sql.SQL("*"),
+        sql.Identifier(schema),
+        sql.Identifier(table)
+    )
+    # One extra row tells whether another page follows
+    if not key_columns:
+        return query + sql.SQL(" LIMIT %s OFFSET %s"), [page_size + 1, after or 0]
+    keys = sql.SQL(", ").join(sql.Identifier(name) for name in key_columns)
+    params = []
+    if after is not None:
+        query += sql.SQL(" WHERE ({}) > ({})").format(keys, sql.SQL(", ").join(sql.Placeholder() * len(key_columns)))
+        params += list(after)
+    query += sql.SQL(" ORDER BY {} LIMIT %s").format(keys)
+    return query, params + [page_size + 1]
+
+def fetch_page(conn, query, params, page_size):
+    """Read one page; returns columns, rows and whether more follow."""
+    with conn.cursor() as page_cur:
+        page_cur.execute(query, params)
+        rows = page_cur.fetchall()
+        columns = [desc[0] for desc in page_cur.description]
+    return columns, rows[:page_size], len(rows) > page_size
+
+def next_page_start(columns, rows, key_columns, after, page_size):
+    """The ``after`` value of the page following ``rows``."""
+    if not key_columns:
+        return (after or 0) + page_size
+    last = rows[-1]
+    return tuple(last[columns.index(name)] for name in key_columns)
+
 # Streamlit page configuration
 st.set_page_config(
     page_title="Memory Database Explorer",
@@ -55,89 +167,93 @@ except Exception as e:
 # Direct PostgreSQL connection
 try:
     if DB_URL:
-        conn = psycopg2.connect(DB_URL)
+        db_pool = get_db_pool()
         st.success("Direct PostgreSQL connection established!")
         
-        # Find all tables in all schemas
-        with conn.cursor() as cur:
-            # Query to get all tables from all schemas
-            cur.execute("""
-                SELECT table_schema, table_name 
-                FROM information_schema.tables 
-                WHERE table_schema NOT IN ('pg_catalog', 'information_schema')
-                ORDER BY table_schema, table_name
-            """)
-            tables = cur.fetchall()
+        # Schema metadata is cached; only the selected page is read on each rerun
+        tables = load_tables()
+        
+        if tables:
+            st.subheader("All Tables in Database")
+            table_options = [f"{schema}.{table}" for schema, table, _, _ in tables]
+            table_info = {f"{schema}.{table}": (rows, size) for schema, table, rows, size in tables}
+            selected_table = st.selectbox(
+                "Select a table to view",
+                table_options,
+                format_func=lambda name: f"{name} ({describe_table(*table_info[name])})"
+            )
             
-            if tables:
-                st.subheader("All Tables in Database")
-                table_options = [f"{schema}.{table}" for schema, table in tables]
-                selected_table = st.selectbox("Select a table to view", table_options)
-                
-                if selected_table:
-                    schema, table = selected_table.split('.')
-                    
-                    # Get data from the selected table
-                    cur.execute(
-                        sql.SQL("SELECT * FROM {}.{} LIMIT 100").format(
-                            sql.Identifier(schema),
-                            sql.Identifier(table)
-                        )
-                    )
-                    
-                    # Get column names
-                    columns = [desc[0] for desc in cur.description]
-                    
-                    # Fetch data
-                    data = cur.fetchall()
-                    
-                    # Convert to DataFrame
-                    df = pd.DataFrame(data, columns=columns)
-                    
-                    # Display the data
-                    st.subheader(f"Contents of {selected_table}")
-                    st.write(f"Found {len(df)} records")
-                    st.dataframe(df, use_container_width=True)
-                    
-                    # Look for vecs collections
-                    if "metadata" in df.columns:
-                        st.subheader("Extracted Metadata")
-                        
-                        # Process metadata
-                        formatted_data = []
-                        for _, row in df.iterrows():
-                            try:
-                                metadata = row.get("metadata")
-                                if metadata:
-                                    formatted_row = {"id": row.get("id", "")}
-                                    
-                                    # Try to extract fields from metadata
-                                    if isinstance(metadata, dict):
-                                        formatted_row["user_id"] = metadata.get("user_id", "")
-                                        formatted_row["memory"] = metadata.get("memory", "")
-                                    
-                                    formatted_data.append(formatted_row)
-                            except Exception as e:
-                                st.error(f"Error processing row: {str(e)}")
-                        
-                        if formatted_data:
-                            formatted_df = pd.DataFrame(formatted_data)
-                            st.dataframe(formatted_df, use_container_width=True)
-                    
-                    # Check for special vecs tables
-                    vecs_tables = [t for t in table_options if 'vecs' in t.lower()]
-                    if vecs_tables:
-                        st.subheader("Vector Collection Tables")
-                        st.write("These tables might be used by mem0:")
-                        for vt in vecs_tables:
-                            st.write(f"- {vt}")
-            else:
-                st.warning("No tables found in database")
+            with st.expander("Table sizes"):
+                st.dataframe(
+                    pd.DataFrame(tables, columns=["schema", "table", "estimated_rows", "total_bytes"])
+                    .sort_values("total_bytes", ascending=False),
+                    use_container_width=True
+                )
+
+            if selected_table:
+                schema, table = selected_table.split('.')
+
+                table_columns = load_columns(schema, table)
+
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+                with col2:
+                    include_vectors = st.checkbox("Include vector columns", value=False)
+
+                # The start key of every page shown so far, so Previous goes back
+                # without a query; reset when the table or page size changes
+                pager = st.session_state.setdefault(
+                    f"pager_{selected_table}_{page_size}",
+                    {"starts": [None], "next": None}
+                )
+                page = len(pager["starts"])
+                after = pager["starts"][-1]
+
+                # Only this page crosses the network; vectors stay on the server unless asked for
+                key_columns = page_key_columns(table_columns)
+                query, params = build_page_query(schema, table, table_columns, include_vectors, key_columns, after, page_size)
+                with db_pool.connection() as conn:
+                    columns, rows, has_next = fetch_page(conn, query, params, page_size)
+                pager["next"] = next_page_start(columns, rows, key_columns, after, page_size) if has_next else None
+                # Callbacks run before the rerun, so the buttons act on the page fetched above
+                with col3:
+                    st.button("Previous page", disabled=page == 1, on_click=pager["starts"].pop)
+                with col4:
+                    st.button("Next page", disabled=not has_next, on_click=lambda: pager["starts"].append(pager["next"]))
+                df = pd.DataFrame(rows, columns=columns)
+
+                # Display the data
+                first_row = (page - 1) * page_size + 1
+                st.subheader(f"Contents of {selected_table} (page {page})")
+                if df.empty:
+                    st.write("No records on this page")
+                else:
+                    st.write(f"Rows {first_row}-{first_row + len(df) - 1}" + (" (more on the next page)" if has_next else ""))
+                st.dataframe(df, use_container_width=True)
+
+                # Look for vecs collections: user_id and memory come straight from SQL
+                if METADATA_FIELDS[0] in df.columns and not df.empty:
+                    st.subheader("Extracted Metadata")
+                    metadata_columns = [c for c in ["id", *METADATA_FIELDS] if c in df.columns]
+                    st.dataframe(df[metadata_columns], use_container_width=True)
+
+                # Check for special vecs tables
+                vecs_tables = [t for t in table_options if 'vecs' in t.lower()]
+                if vecs_tables:
+                    st.subheader("Vector Collection Tables")
+                    st.write("These tables might be used by mem0:")
+                    for vt in vecs_tables:
+                        st.write(f"- {vt}")
+        else:
+            st.warning("No tables found in database")
     else:
         st.error("DATABASE_URL environment variable is missing")
 except Exception as e:
     st.error(f"Error accessing PostgreSQL directly: {str(e)}")
 
-# Add refresh button
+# Add refresh button; it also drops the cached schema metadata
 if st.button("Refresh"):
+    load_tables.clear()
+    load_columns.clear()
     st.rerun() 
\ No newline at end of file
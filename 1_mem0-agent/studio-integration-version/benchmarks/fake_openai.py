@@ -0,0 +1,212 @@
+"""Local stand-in for the OpenAI chat completion and embedding APIs.
+
+Usage:
+    python benchmarks/fake_openai.py [--port 8101] [--chat-latency 0.4] [--token-latency 0.01]
+
+Answers mem0's fact extraction and memory update prompts with well-formed
+JSON, everything else (the agent, the summary agent) with ``--reply-tokens``
+filler words, streamed when asked. Latency is ``--chat-latency`` to the
+first token plus ``--token-latency`` per token, scaled by a random
+``--jitter``. Embeddings are deterministic bag-of-words vectors, so texts
+that share words are close and memory search finds something. Model
+lookups (the endpoint's readiness probe) get a stub. GET /stats returns
+request counts.
+"""
+import argparse
+import ast
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import random
+import re
+import time
+import uuid
+from array import array
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+settings = argparse.Namespace(
+    chat_latency=0.4,
+    token_latency=0.01,
+    embedding_latency=0.05,
+    reply_tokens=40,
+    jitter=0.2
+)
+counters: Dict[str, int] = {"chat_requests": 0, "stream_requests": 0, "embedding_requests": 0, "embedded_texts": 0}
+app = FastAPI()
+
+FILLER = "the quick assistant replies with a short and friendly answer about what it remembers".split()
+
+
+async def wait(seconds: float):
+    if seconds > 0:
+        await asyncio.sleep(seconds * (1 + random.uniform(-settings.jitter, settings.jitter)))
+
+
+def word_vector(text: str, dims: int) -> List[float]:
+    """Unit vector summing a few pseudo-random signed dimensions per word."""
+    vector = [0.0] * dims
+    for word in re.findall(r"\w+", text.lower()):
+        rng = random.Random(hashlib.sha256(word.encode("utf-8")).digest())
+        for _ in range(8):
+            vector[rng.randrange(dims)] += rng.choice((-1.0, 1.0))
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def prompt_text(messages: List[Dict[str, Any]]) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def mem0_reply(prompt: str) -> Optional[str]:
+    """JSON answer to mem0's fact extraction or memory update prompt, or None for other prompts."""
+    if "Personal Information Organizer" in prompt:
+        # The conversation comes last, one "user: ..." line per message
+        facts = [line[len("user: "):].strip()[:120] for line in prompt.splitlines() if line.startswith("user: ")]
+        return json.dumps({"facts": facts[-3:]})
+    if "smart memory manager" in prompt:
+        blocks = re.findall(r"```\s*\n(.*?)\n\s*```", prompt, re.S)
+        try:
+            facts = ast.literal_eval(blocks[-1].strip()) if blocks else []
+        except (ValueError, SyntaxError):
+            facts = []
+        known = prompt[:prompt.rfind("```")] if blocks else prompt
+        return json.dumps({"memory": [
+            {"id": str(i), "text": fact, "event": "NONE" if fact in known else "ADD"}
+            for i, fact in enumerate(facts) if isinstance(fact, str)
+        ]})
+    return None
+
+
+def completion_chunk(completion_id: str, model: str, delta: Dict[str, Any], finish_reason=None) -> str:
+    return "data: " + json.dumps({
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }) + "\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "gpt-4o-mini")
+    prompt = prompt_text(body.get("messages") or [])
+    content = mem0_reply(prompt)
+    tokens = content.split() if content is not None else [
+        FILLER[i % len(FILLER)] for i in range(settings.reply_tokens)
+    ]
+    if content is None:
+        content = " ".join(tokens)
+    usage = {
+        "prompt_tokens": len(prompt) // 4,
+        "completion_tokens": len(tokens),
+        "total_tokens": len(prompt) // 4 + len(tokens)
+    }
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    if not body.get("stream"):
+        counters["chat_requests"] += 1
+        await wait(settings.chat_latency + settings.token_latency * len(tokens))
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    counters["stream_requests"] += 1
+
+    async def events():
+        await wait(settings.chat_latency)
+        for i, token in enumerate(tokens):
+            yield completion_chunk(completion_id, model, {"role": "assistant", "content": ("" if i == 0 else " ") + token})
+            await wait(settings.token_latency)
+        yield completion_chunk(completion_id, model, {}, "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": usage
+            }) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    texts = body.get("input")
+    texts = [texts] if isinstance(texts, str) else list(texts or [])
+    dims = int(body.get("dimensions") or 1536)
+    counters["embedding_requests"] += 1
+    counters["embedded_texts"] += len(texts)
+    await wait(settings.embedding_latency)
+
+    data = []
+    for index, text in enumerate(texts):
+        vector = word_vector(str(text), dims)
+        if body.get("encoding_format") == "base64":
+            embedding: Any = base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+        else:
+            embedding = vector
+        data.append({"object": "embedding", "index": index, "embedding": embedding})
+    tokens = sum(len(str(text)) // 4 for text in texts)
+    return JSONResponse({
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "text-embedding-3-small"),
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+    })
+
+
+@app.get("/v1/models/{model}")
+async def retrieve_model(model: str):
+    # The endpoint's readiness probe
+    return {"id": model, "object": "model", "created": 0, "owned_by": "benchmark"}
+
+
+@app.get("/stats")
+async def stats():
+    return counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--chat-latency", type=float, default=settings.chat_latency, help="seconds to the first token")
+    parser.add_argument("--token-latency", type=float, default=settings.token_latency, help="seconds per output token")
+    parser.add_argument("--embedding-latency", type=float, default=settings.embedding_latency, help="seconds per embedding request")
+    parser.add_argument("--reply-tokens", type=int, default=settings.reply_tokens, help="words in each agent reply")
+    parser.add_argument("--jitter", type=float, default=settings.jitter, help="latencies vary by up to this fraction")
+    args = parser.parse_args()
+    for name in vars(settings):
+        setattr(settings, name, getattr(args, name))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
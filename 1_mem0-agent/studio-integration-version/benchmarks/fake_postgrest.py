@@ -0,0 +1,211 @@
+"""In-memory stand-in for the Supabase REST (PostgREST) API of the endpoint's tables.
+
+Usage:
+    python benchmarks/fake_postgrest.py [--port 8102] [--latency 0.01]
+
+Serves ``/rest/v1/messages`` and ``/rest/v1/session_summaries`` with the
+subset of PostgREST the endpoint uses: select, eq/neq/gt/gte/lt/lte
+filters, ``or=(...)`` with nested ``and(...)``, multi-column order, limit,
+and upserts with ``on_conflict`` and ignore/merge duplicate resolution.
+Each request waits ``--latency`` seconds, a stand-in for the round-trip to
+Supabase. GET /stats returns request counts per table and method.
+"""
+import argparse
+import asyncio
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+
+settings = argparse.Namespace(latency=0.01)
+app = FastAPI()
+
+# Primary key of each table; messages ids are assigned like a bigserial
+TABLES: Dict[str, str] = {"messages": "id", "session_summaries": "session_id"}
+rows: Dict[str, List[Dict[str, Any]]] = {table: [] for table in TABLES}
+next_id = 1
+counters: Counter = Counter()
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "or", "on_conflict", "columns"}
+
+
+def canonical_timestamp(value: str) -> str:
+    """Timestamps are stored with a fixed layout so they sort as strings."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def coerce(value: str, like: Any) -> Any:
+    """Convert a filter value from the query string to the type of the column value."""
+    value = value.strip('"')
+    if isinstance(like, bool):
+        return value == "true"
+    if isinstance(like, int):
+        return int(value)
+    if isinstance(like, float):
+        return float(value)
+    if isinstance(like, str) and value[:4].isdigit() and "T" in value:
+        try:
+            return canonical_timestamp(value)
+        except ValueError:
+            return value
+    return value
+
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+
+
+def condition(column: str, op: str, value: str) -> Callable[[Dict[str, Any]], bool]:
+    if op not in OPERATORS:
+        raise HTTPException(status_code=400, detail=f"Unsupported operator {op}")
+    compare = OPERATORS[op]
+
+    def check(row: Dict[str, Any]) -> bool:
+        current = row.get(column)
+        return current is not None and compare(current, coerce(value, current))
+    return check
+
+
+def split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def logic_tree(kind: str, body: str) -> Callable[[Dict[str, Any]], bool]:
+    """Condition for an ``or(...)``/``and(...)`` group; ``body`` is the text inside the parentheses."""
+    checks = []
+    for term in split_top_level(body):
+        if term.startswith(("and(", "or(")):
+            nested, _, rest = term.partition("(")
+            checks.append(logic_tree(nested, rest[:-1]))
+        else:
+            column, op, value = term.split(".", 2)
+            checks.append(condition(column, op, value))
+    combine = any if kind == "or" else all
+    return lambda row: combine(check(row) for check in checks)
+
+
+def row_filter(params: List[tuple]) -> Callable[[Dict[str, Any]], bool]:
+    checks = []
+    for key, value in params:
+        if key == "or":
+            checks.append(logic_tree("or", value[1:-1]))
+        elif key not in RESERVED_PARAMS:
+            op, _, operand = value.partition(".")
+            checks.append(condition(key, op, operand))
+    return lambda row: all(check(row) for check in checks)
+
+
+def order_rows(selected: List[Dict[str, Any]], order: Optional[str]) -> List[Dict[str, Any]]:
+    # Stable sorts applied from the last key to the first give a multi-column order
+    for term in reversed(split_top_level(order) if order else []):
+        column, _, direction = term.partition(".")
+        selected.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=direction.startswith("desc"))
+    return selected
+
+
+def project(row: Dict[str, Any], select: Optional[str]) -> Dict[str, Any]:
+    if not select or select == "*":
+        return dict(row)
+    return {column: row.get(column) for column in select.split(",")}
+
+
+def table_rows(table: str) -> List[Dict[str, Any]]:
+    if table not in rows:
+        raise HTTPException(status_code=404, detail=f"Unknown table {table}")
+    return rows[table]
+
+
+@app.get("/rest/v1/{table}")
+async def select(table: str, request: Request):
+    counters[f"{table} GET"] += 1
+    await asyncio.sleep(settings.latency)
+    params = list(request.query_params.multi_items())
+    query = dict(params)
+    keep = row_filter(params)
+    matched = [row for row in table_rows(table) if keep(row)]
+    matched = order_rows(matched, query.get("order"))
+    offset = int(query.get("offset", 0))
+    if "limit" in query:
+        matched = matched[offset:offset + int(query["limit"])]
+    else:
+        matched = matched[offset:]
+    return JSONResponse([project(row, query.get("select")) for row in matched])
+
+
+@app.post("/rest/v1/{table}")
+async def upsert(table: str, request: Request):
+    global next_id
+    counters[f"{table} POST"] += 1
+    await asyncio.sleep(settings.latency)
+    stored = table_rows(table)
+    body = await request.json()
+    prefer = request.headers.get("prefer", "")
+    key = request.query_params.get("on_conflict") or TABLES[table]
+    written = []
+    for incoming in body if isinstance(body, list) else [body]:
+        row = dict(incoming)
+        for column, value in row.items():
+            if column.endswith("_at") and isinstance(value, str):
+                row[column] = canonical_timestamp(value)
+        existing = next((r for r in stored if row.get(key) is not None and r.get(key) == row.get(key)), None)
+        if existing is not None:
+            if "resolution=ignore-duplicates" in prefer:
+                continue
+            if "resolution=merge-duplicates" not in prefer:
+                raise HTTPException(status_code=409, detail="duplicate key value violates unique constraint")
+            existing.update(row)
+            written.append(existing)
+            continue
+        if table == "messages":
+            row.setdefault("id", next_id)
+            next_id = max(next_id, row["id"]) + 1
+        row.setdefault("created_at", canonical_timestamp(datetime.now(timezone.utc).isoformat()))
+        stored.append(row)
+        written.append(row)
+    if "return=representation" in prefer:
+        return JSONResponse(written, status_code=201)
+    return Response(status_code=201)
+
+
+@app.get("/stats")
+async def stats():
+    return {"requests": dict(counters), "rows": {table: len(stored) for table, stored in rows.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--latency", type=float, default=settings.latency, help="seconds added to each request")
+    args = parser.parse_args()
+    settings.latency = args.latency
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""End-to-end latency benchmark of mem0_agent_endpoint.py against local stand-ins.
+
+Usage:
+    python benchmarks/run_benchmark.py [--sessions 20] [--turns 5] [--concurrency 10] [--stream]
+        [--chat-latency 0.4] [--postgrest-latency 0.01] [--workers 1] [--env KEY=VALUE ...]
+        [--json results.json] [--baseline earlier.json] [--max-regression 0.2]
+
+Starts benchmarks/fake_openai.py and benchmarks/fake_postgrest.py, then the
+endpoint under uvicorn with OpenAI and Supabase pointed at them and the
+local vector store in a temporary directory, so no API keys or network are
+needed. Drives concurrent chat sessions, each session's turns in order, and
+reports throughput and p50/p95/p99 of the end-to-end latency and of every
+stage in the Server-Timing header, plus OpenAI and Supabase requests per
+turn. Endpoint settings can be varied with --env (e.g. --env
+EMBEDDING_BATCH_SIZE=1). With --baseline the p95s are compared with an
+earlier --json result and the exit code is 1 if any stage regressed by
+more than --max-regression.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+APP_DIR = BENCHMARK_DIR.parent
+API_TOKEN = "benchmark-token"
+
+# Statements give mem0 facts to extract, questions make memory search matter
+QUERIES = [
+    "I live in Lisbon and work as a data engineer.",
+    "What city do I live in?",
+    "My favourite food is grilled sardines with salad.",
+    "Can you suggest a dinner I would enjoy tonight?",
+    "I am training for a half marathon in the spring.",
+    "How should I plan my running week?",
+    "I prefer short answers with bullet points.",
+    "Remind me what you know about my job.",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Stage durations in ms from a ``name;dur=12.3, ...`` Server-Timing header."""
+    stages = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                stages[name] = float(value)
+    return stages
+
+
+class Recorder:
+    """Latency samples per stage of the measured turns."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.turns = 0
+        self.errors = 0
+
+    def record(self, total_ms: float, stages: Dict[str, float], ok: bool):
+        self.turns += 1
+        if not ok:
+            self.errors += 1
+            return
+        self.samples["total"].append(total_ms)
+        for name, ms in stages.items():
+            self.samples[name].append(ms)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "count": len(values),
+                "p50": round(percentile(values, 50), 1),
+                "p95": round(percentile(values, 95), 1),
+                "p99": round(percentile(values, 99), 1),
+                "mean": round(sum(values) / len(values), 1),
+                "max": round(max(values), 1),
+            }
+            for name, values in self.samples.items() if values
+        }
+
+
+async def run_turn(client: httpx.AsyncClient, stream: bool, session_id: str, user_id: str, query: str, recorder: Recorder):
+    request = {"query": query, "user_id": user_id, "request_id": str(uuid.uuid4()), "session_id": session_id}
+    stages: Dict[str, float] = {}
+    ok = False
+    start = time.perf_counter()
+    try:
+        if stream:
+            async with client.stream("POST", "/api/mem0-agent/stream", json=request) as response:
+                response.raise_for_status()
+                # Sent before the agent runs, so it covers the preparation stages only
+                stages = parse_server_timing(response.headers.get("server-timing", ""))
+                async for line in response.aiter_lines():
+                    if line == "event: token" and "first_token" not in stages:
+                        stages["first_token"] = 1000 * (time.perf_counter() - start)
+                    elif line in ("event: done", "event: error"):
+                        ok = line == "event: done"
+        else:
+            response = await client.post("/api/mem0-agent", json=request)
+            response.raise_for_status()
+            ok = bool(response.json().get("success"))
+            stages = parse_server_timing(response.headers.get("server-timing", ""))
+    except httpx.HTTPError as e:
+        print(f"Turn of session {session_id} failed: {type(e).__name__}: {str(e)}")
+    recorder.record(1000 * (time.perf_counter() - start), stages, ok)
+
+
+async def run_sessions(client: httpx.AsyncClient, args, prefix: str, sessions: int, recorder: Recorder):
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def session(index: int):
+        async with slots:
+            for turn in range(args.turns):
+                query = QUERIES[(index + turn) % len(QUERIES)]
+                await run_turn(client, args.stream, f"{prefix}-{index}", f"bench-user-{index % args.users}", query, recorder)
+
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+
+
+def counter_delta(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+    return {key: after.get(key, 0) - before.get(key, 0) for key in after}
+
+
+async def benchmark(args, app_url: str, openai_url: str, postgrest_url: str) -> Dict[str, Any]:
+    async with httpx.AsyncClient(
+        base_url=app_url,
+        headers={"Authorization": f"Bearer {API_TOKEN}"},
+        timeout=args.request_timeout,
+        limits=httpx.Limits(max_connections=args.concurrency * 2)
+    ) as client:
+        run_id = uuid.uuid4().hex[:8]
+        if args.warmup_sessions:
+            await run_sessions(client, args, f"warmup-{run_id}", args.warmup_sessions, Recorder())
+
+        openai_before = (await client.get(f"{openai_url}/stats")).json()
+        postgrest_before = (await client.get(f"{postgrest_url}/stats")).json()["requests"]
+        recorder = Recorder()
+        start = time.perf_counter()
+        await run_sessions(client, args, f"bench-{run_id}", args.sessions, recorder)
+        wall = time.perf_counter() - start
+        openai = counter_delta(openai_before, (await client.get(f"{openai_url}/stats")).json())
+        postgrest = counter_delta(postgrest_before, (await client.get(f"{postgrest_url}/stats")).json()["requests"])
+        health = (await client.get("/health")).json()
+
+    return {
+        "config": {
+            name: getattr(args, name) for name in (
+                "sessions", "turns", "concurrency", "users", "stream", "workers", "chat_latency",
+                "token_latency", "embedding_latency", "reply_tokens", "postgrest_latency", "env"
+            )
+        },
+        "turns": recorder.turns,
+        "errors": recorder.errors,
+        "wall_seconds": round(wall, 3),
+        "turns_per_second": round(recorder.turns / wall, 2) if wall else 0.0,
+        "stages": recorder.summary(),
+        "openai_requests": openai,
+        "supabase_requests": postgrest,
+        "health": health,
+    }
+
+
+def print_report(results: Dict[str, Any]):
+    turns = results["turns"] or 1
+    print(
+        f"\n{results['turns']} turns ({results['errors']} errors) in {results['wall_seconds']:.1f} s: "
+        f"{results['turns_per_second']:.2f} turns/s"
+    )
+    print(f"\n{'stage (ms)':<16}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'mean':>10}{'max':>10}")
+    for name, s in results["stages"].items():
+        print(f"{name:<16}{s['count']:>7}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}{s['mean']:>10.1f}{s['max']:>10.1f}")
+    print("\nrequests per turn (including background memory and summary work):")
+    for name, count in {**results["openai_requests"], **results["supabase_requests"]}.items():
+        print(f"  {name:<28}{count / turns:>8.2f}")
+
+
+def regressions(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float, min_ms: float) -> List[str]:
+    """Stages whose p95 grew by more than ``max_regression`` (a fraction) and ``min_ms`` over the baseline."""
+    found = []
+    for name, stage in results["stages"].items():
+        before = (baseline.get("stages") or {}).get(name)
+        if (
+            before
+            and stage["p95"] > before["p95"] * (1 + max_regression)
+            # A few ms on a fast stage is scheduling noise
+            and stage["p95"] - before["p95"] > min_ms
+        ):
+            found.append(f"{name}: p95 {before['p95']:.1f} -> {stage['p95']:.1f} ms")
+    return found
+
+
+def start_process(command: List[str], log_path: Path, **kwargs) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, **kwargs)
+
+
+async def wait_until_ready(url: str, process: subprocess.Popen, timeout: float, log_path: Path):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}, see {log_path}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f} s, see {log_path}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="chat sessions in the measured run")
+    parser.add_argument("--turns", type=int, default=5, help="turns per session, sent one after another")
+    parser.add_argument("--concurrency", type=int, default=10, help="sessions running at the same time")
+    parser.add_argument("--users", type=int, default=5, help="distinct user_ids the sessions are spread over")
+    parser.add_argument("--warmup-sessions", type=int, default=2, help="unmeasured sessions run first")
+    parser.add_argument("--stream", action="store_true", help="use /api/mem0-agent/stream and report first_token")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the endpoint; only one of them can open the local vector store")
+    parser.add_argument("--chat-latency", type=float, default=0.4, help="fake OpenAI seconds to the first token")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="fake OpenAI seconds per output token")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="fake OpenAI seconds per embedding request")
+    parser.add_argument("--reply-tokens", type=int, default=40, help="words in each fake agent reply")
+    parser.add_argument("--postgrest-latency", type=float, default=0.01, help="fake Supabase seconds per request")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra endpoint environment")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--json", default=None, help="write the results to this file")
+    parser.add_argument("--baseline", default=None, help="results file of an earlier run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 growth over the baseline")
+    parser.add_argument("--min-regression-ms", type=float, default=5.0, help="ignore p95 growth below this many ms")
+    parser.add_argument("--keep-data", action="store_true", help="keep the temporary directory with logs and stores")
+    args = parser.parse_args()
+
+    data_dir = Path(tempfile.mkdtemp(prefix="mem0-benchmark-"))
+    openai_port, postgrest_port, app_port = free_port(), free_port(), free_port()
+    openai_url = f"http://127.0.0.1:{openai_port}"
+    postgrest_url = f"http://127.0.0.1:{postgrest_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "benchmark",
+        # pydantic-ai reads OPENAI_BASE_URL, mem0 OPENAI_API_BASE
+        "OPENAI_BASE_URL": f"{openai_url}/v1",
+        "OPENAI_API_BASE": f"{openai_url}/v1",
+        "SUPABASE_URL": postgrest_url,
+        "SUPABASE_SERVICE_KEY": "benchmark.service.key",
+        "API_BEARER_TOKEN": API_TOKEN,
+        "VECTOR_STORE_PROVIDER": "local",
+        "LOCAL_VECTOR_STORE_PATH": str(data_dir / "vectors"),
+        "EMBEDDING_CACHE_PATH": str(data_dir / "embedding_cache.sqlite3"),
+        "MEMORY_QUEUE_SPOOL_PATH": str(data_dir / "memory_queue.spool.jsonl"),
+        "MEMORY_SEARCH_GENERATIONS_PATH": str(data_dir / "memory_generations.sqlite3"),
+        "MEM0_DIR": str(data_dir / "mem0"),
+        "MEM0_TELEMETRY": "False",
+    })
+    for pair in args.env:
+        key, _, value = pair.partition("=")
+        env[key] = value
+
+    processes = []
+    try:
+        processes.append(start_process([
+            sys.executable, str(BENCHMARK_DIR / "fake_openai.py"), "--port", str(openai_port),
+            "--chat-latency", str(args.chat_latency), "--token-latency", str(args.token_latency),
+            "--embedding-latency", str(args.embedding_latency), "--reply-tokens", str(args.reply_tokens)
+        ], data_dir / "fake_openai.log"))
+        processes.append(start_process([
+            sys.executable, str(BENCHMARK_DIR / "fake_postgrest.py"), "--port", str(postgrest_port),
+            "--latency", str(args.postgrest_latency)
+        ], data_dir / "fake_postgrest.log"))
+        asyncio.run(wait_until_ready(f"{openai_url}/stats", processes[0], args.startup_timeout, data_dir / "fake_openai.log"))
+        asyncio.run(wait_until_ready(f"{postgrest_url}/stats", processes[1], args.startup_timeout, data_dir / "fake_postgrest.log"))
+
+        processes.append(start_process([
+            sys.executable, "-m", "uvicorn", "mem0_agent_endpoint:app", "--host", "127.0.0.1",
+            "--port", str(app_port), "--workers", str(args.workers), "--log-level", "warning"
+        ], data_dir / "endpoint.log", cwd=APP_DIR, env=env))
+        asyncio.run(wait_until_ready(f"{app_url}/ready", processes[2], args.startup_timeout, data_dir / "endpoint.log"))
+
+        results = asyncio.run(benchmark(args, app_url, openai_url, postgrest_url))
+    except RuntimeError as e:
+        print(str(e))
+        args.keep_data = True
+        return 1
+    finally:
+        # The endpoint first, so it can drain its memory queue while the fakes still answer
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if args.keep_data:
+            print(f"Logs and data kept in {data_dir}")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        found = regressions(results, json.loads(Path(args.baseline).read_text()), args.max_regression, args.min_regression_ms)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            return 1
+    return 1 if results["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # falls back to a characters-per-token estimate
+    tiktoken = None
+
+
+class TokenCounter:
+    """Counts prompt tokens with tiktoken, or estimates them when it is unavailable.
+
+    The encoding is loaded on the first count, not at construction, since
+    tiktoken downloads its vocabularies on first use.
+    """
+
+    def __init__(self, model: str = "gpt-4o-mini"):
+        self.model = model
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            if tiktoken is not None:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    print(f"tiktoken unavailable, estimating token counts: {str(e)}")
+            self._loaded = True
+
+    def count(self, text: str) -> int:
+        if not self._loaded:
+            self._load()
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+
+def word_set(text: str) -> frozenset:
+    return frozenset(re.findall(r"\w+", text.lower()))
+
+
+class ContextBuilder:
+    """Decides which memories and history turns go into the agent's prompt.
+
+    Memories are kept only if their search score clears ``max_distance``
+    (mem0's supabase and local stores report cosine distance: lower is
+    closer), near-duplicates of a better match are dropped, and the rest are
+    packed best-first into ``memory_tokens``. History keeps the newest turns
+    that fit in ``history_tokens``.
+    """
+
+    def __init__(
+        self,
+        max_distance: Optional[float] = 0.65,
+        score_is_distance: bool = True,
+        duplicate_threshold: float = 0.85,
+        memory_tokens: int = 400,
+        history_tokens: int = 2000,
+        model: str = "gpt-4o-mini",
+    ):
+        self.max_distance = max_distance
+        self.score_is_distance = score_is_distance
+        self.duplicate_threshold = duplicate_threshold
+        self.memory_tokens = memory_tokens
+        self.history_tokens = history_tokens
+        self.tokens = TokenCounter(model)
+
+    def _relevant(self, entry: Dict[str, Any]) -> bool:
+        score = entry.get("score")
+        if self.max_distance is None or score is None:
+            return True
+        return score <= self.max_distance if self.score_is_distance else score >= self.max_distance
+
+    def select_memories(self, results: List[Dict[str, Any]]) -> List[str]:
+        """Relevant, de-duplicated memory texts that fit the memory budget, best first."""
+        ranked = sorted(
+            (entry for entry in results if entry.get("memory") and self._relevant(entry)),
+            key=lambda entry: entry.get("score") or 0.0,
+            reverse=not self.score_is_distance
+        )
+        selected: List[str] = []
+        kept_words: List[frozenset] = []
+        used = 0
+        for entry in ranked:
+            text = entry["memory"]
+            words = word_set(text)
+            if any(
+                len(words & other) / max(len(words | other), 1) >= self.duplicate_threshold
+                for other in kept_words
+            ):
+                continue
+            # "- " and the newline cost about two tokens per memory
+            cost = self.tokens.count(text) + 2
+            if used + cost > self.memory_tokens:
+                continue
+            selected.append(text)
+            kept_words.append(words)
+            used += cost
+        return selected
+
+    def format_memories(self, results: List[Dict[str, Any]]) -> str:
+        return "\n".join(f"- {text}" for text in self.select_memories(results))
+
+    def trim_history(self, messages: List[Any], text_of: Callable[[Any], str]) -> List[Any]:
+        """The newest messages whose text fits the history budget, oldest first."""
+        kept: List[Any] = []
+        used = 0
+        for message in reversed(messages):
+            # Roughly four tokens of per-message overhead in the chat format
+            cost = self.tokens.count(text_of(message)) + 4
+            if used + cost > self.history_tokens:
+                break
+            kept.append(message)
+            used += cost
+        return kept[::-1]
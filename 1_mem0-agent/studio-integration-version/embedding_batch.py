@@ -0,0 +1,162 @@
+import json
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+
+class BatchingEmbedder:
+    """Wrapper for mem0's OpenAI embedder that sends many texts per API request.
+
+    ``embed`` calls from concurrent threads are queued, and each of the
+    ``workers`` threads takes everything waiting (up to ``max_batch`` texts)
+    into one ``embeddings.create`` call. A lone call is sent straight away,
+    so batching only happens when there is a backlog to batch.
+
+    ``prefetch`` embeds a list of texts in one request and holds the vectors
+    until ``embed`` asks for them; FactPrefetchLLM uses it so the facts mem0
+    extracts are embedded together instead of one request per fact.
+    """
+
+    def __init__(self, embedder: Any, max_batch: int = 64, workers: int = 2, max_prefetched: int = 4096):
+        self._embedder = embedder
+        self.max_batch = max_batch
+        self.workers = workers
+        self.max_prefetched = max_prefetched
+        self._queue: "queue.Queue" = queue.Queue()
+        self._prefetched: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.requests = 0
+        self.texts = 0
+        self.prefetch_hits = 0
+
+    def _create(self, texts: List[str]) -> List[List[float]]:
+        config = self._embedder.config
+        response = self._embedder.client.embeddings.create(
+            input=[text.replace("\n", " ") for text in texts],
+            model=config.model,
+            dimensions=config.embedding_dims
+        )
+        with self._lock:
+            self.requests += 1
+            self.texts += len(texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._run, name=f"embedding-batch-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                vectors = self._create([text for text, _ in batch])
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def embed(self, text: str, *args, **kwargs) -> List[float]:
+        with self._lock:
+            vector = self._prefetched.pop(text, None)
+            if vector is not None:
+                self.prefetch_hits += 1
+                return vector
+        self._start()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def prefetch(self, texts: List[str]):
+        with self._lock:
+            missing = list(dict.fromkeys(t for t in texts if t and t not in self._prefetched))
+        for start in range(0, len(missing), self.max_batch):
+            chunk = missing[start:start + self.max_batch]
+            vectors = self._create(chunk)
+            with self._lock:
+                self._prefetched.update(zip(chunk, vectors))
+                while len(self._prefetched) > self.max_prefetched:
+                    self._prefetched.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "texts": self.texts,
+                "texts_per_request": round(self.texts / self.requests, 2) if self.requests else 0.0,
+                "prefetch_hits": self.prefetch_hits,
+                "queued": self._queue.qsize(),
+            }
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._embedder, name)
+
+
+def texts_to_embed(response: str) -> List[str]:
+    """Texts mem0 is about to embed, read from one of its JSON LLM responses."""
+    text = response.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1:] if "\n" in text else text
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return []
+    if not isinstance(data, dict):
+        return []
+    # Fact extraction returns {"facts": [...]}, the update step {"memory": [{"event", "text"}, ...]}
+    texts = [fact for fact in data.get("facts") or [] if isinstance(fact, str)]
+    texts += [
+        item["text"] for item in data.get("memory") or []
+        if isinstance(item, dict) and item.get("event") in ("ADD", "UPDATE") and isinstance(item.get("text"), str)
+    ]
+    return texts
+
+
+class FactPrefetchLLM:
+    """Wrapper for mem0's LLM that prefetches the embeddings of what it returns.
+
+    mem0's ``add`` embeds every extracted fact (and every added or updated
+    memory) with its own embedding request; prefetching them as one batch
+    right after the LLM answers turns those into local lookups.
+    """
+
+    def __init__(self, llm: Any, embedder: Any):
+        self._llm = llm
+        self._embedder = embedder
+
+    def generate_response(self, *args, **kwargs) -> Any:
+        response = self._llm.generate_response(*args, **kwargs)
+        if isinstance(response, str):
+            try:
+                self._embedder.prefetch(texts_to_embed(response))
+            except Exception as e:
+                # mem0 falls back to embedding each text on its own
+                print(f"Embedding prefetch failed: {str(e)}")
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._llm, name)
+
+
+def embedding_batch_stats(memory: Any) -> Optional[Dict[str, Any]]:
+    """Request statistics of the BatchingEmbedder behind ``memory``, if it has one."""
+    embedder = getattr(memory, "embedding_model", None)
+    while embedder is not None and not isinstance(embedder, BatchingEmbedder):
+        embedder = getattr(embedder, "_embedder", None)
+    return embedder.stats() if embedder is not None else None
@@ -0,0 +1,130 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Content address of one embedding: a hash of the model name and the exact text."""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier embedding store: an in-memory LRU in front of a local SQLite file.
+
+    Vectors are stored as raw float32 blobs. The SQLite file runs in WAL mode,
+    so several worker processes on one host can share it. Pass ``path=None``
+    to keep only the in-memory tier.
+    """
+
+    def __init__(self, path: Optional[str] = "embedding_cache.sqlite3", memory_items: int = 10000):
+        self.path = path
+        self.memory_items = memory_items
+        self._front: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, vector: List[float]):
+        self._front[key] = vector
+        self._front.move_to_end(key)
+        while len(self._front) > self.memory_items:
+            self._front.popitem(last=False)
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        key = embedding_key(model, text)
+        with self._lock:
+            vector = self._front.get(key)
+            if vector is not None:
+                self._front.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    vector = array("f", row[0]).tolist()
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector
+            self.misses += 1
+            return None
+
+    def contains(self, model: str, text: str) -> bool:
+        """Whether ``text`` is cached, without counting a hit or miss."""
+        key = embedding_key(model, text)
+        with self._lock:
+            if key in self._front:
+                return True
+            if self._db is not None:
+                return self._db.execute("SELECT 1 FROM embeddings WHERE key = ?", (key,)).fetchone() is not None
+            return False
+
+    def put(self, model: str, text: str, vector: List[float]):
+        key = embedding_key(model, text)
+        with self._lock:
+            self._remember(key, list(vector))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                    (key, array("f", vector).tobytes())
+                )
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_entries": len(self._front),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedEmbedder:
+    """Drop-in wrapper for a mem0 embedder that consults an EmbeddingCache first.
+
+    mem0 embeds the query in ``search`` and each extracted fact in ``add``;
+    both paths go through ``embed``, so they share the same cache.
+    """
+
+    def __init__(self, embedder: Any, cache: EmbeddingCache):
+        self._embedder = embedder
+        self.cache = cache
+        self.model = getattr(getattr(embedder, "config", None), "model", None) or type(embedder).__name__
+
+    def embed(self, text: str, *args, **kwargs) -> List[float]:
+        vector = self.cache.get(self.model, text)
+        if vector is None:
+            vector = self._embedder.embed(text, *args, **kwargs)
+            self.cache.put(self.model, text, vector)
+        return vector
+
+    def prefetch(self, texts: List[str]):
+        """Hand the uncached texts to the wrapped embedder's ``prefetch``, if it has one."""
+        prefetch = getattr(self._embedder, "prefetch", None)
+        if prefetch is not None:
+            prefetch([text for text in texts if not self.cache.contains(self.model, text)])
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._embedder, name)
+
+
+def embedding_stats(memory: Any) -> Optional[Dict[str, Any]]:
+    """Hit-rate statistics of the embedding cache behind ``memory``, if it has one."""
+    embedder = getattr(memory, "embedding_model", None)
+    if isinstance(embedder, CachedEmbedder):
+        return embedder.cache.stats()
+    return None
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass
+class CallStats:
+    """Counters for one named kind of blocking call."""
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+    run_total: float = 0.0
+    run_max: float = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(1000 * self.wait_total / self.calls, 2) if self.calls else 0.0,
+            "max_wait_ms": round(1000 * self.wait_max, 2),
+            "avg_run_ms": round(1000 * self.run_total / self.calls, 2) if self.calls else 0.0,
+            "max_run_ms": round(1000 * self.run_max, 2),
+        }
+
+
+class BlockingExecutor:
+    """Sized thread pool for the synchronous supabase-py, psycopg and mem0 calls.
+
+    ``run`` moves a blocking call off the event loop so one slow query no
+    longer freezes every other request on the worker. Each call is recorded
+    under a name with the time it spent queued for a thread and the time it
+    spent running. A timeout stops the caller from waiting, but the thread
+    itself runs to completion because Python threads cannot be interrupted.
+
+    ``observer(name, outcome, wait, run)``, if given, is also called for every
+    call: outcome is ok or error with the wait and run seconds, or timeout
+    with neither.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        default_timeout: Optional[float] = 30.0,
+        observer: Optional[Callable[[str, str, Optional[float], Optional[float]], None]] = None
+    ):
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self.observer = observer
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking")
+        self._stats: Dict[str, CallStats] = {}
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+
+    def _stats_for(self, name: str) -> CallStats:
+        with self._lock:
+            return self._stats.setdefault(name, CallStats())
+
+    async def run(self, name: str, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` in the pool and await its result."""
+        stats = self._stats_for(name)
+        submitted = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                stats.calls += 1
+                stats.wait_total += started - submitted
+                stats.wait_max = max(stats.wait_max, started - submitted)
+            outcome = "ok"
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                outcome = "error"
+                with self._lock:
+                    stats.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.running -= 1
+                    stats.run_total += elapsed
+                    stats.run_max = max(stats.run_max, elapsed)
+                if self.observer is not None:
+                    self.observer(name, outcome, started - submitted, elapsed)
+
+        with self._lock:
+            self.queued += 1
+        future = self._pool.submit(call)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout if timeout is not None else self.default_timeout
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                stats.timeouts += 1
+            if self.observer is not None:
+                self.observer(name, "timeout", None, None)
+            raise
+        finally:
+            # A call cancelled before it reached a thread never leaves the queue itself
+            if future.cancelled():
+                with self._lock:
+                    self.queued -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "calls": {name: s.snapshot() for name, s in self._stats.items()},
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
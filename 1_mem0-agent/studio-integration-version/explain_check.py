@@ -0,0 +1,120 @@
+"""Check with EXPLAIN ANALYZE that the hot queries use the indexes from ./migrations.
+
+Usage:
+    python explain_check.py [--session-id ID] [--user-id ID] [--ef-search 40] [--strict]
+
+Runs the history query of the agent endpoint and mem0's per-user vector
+search against each vecs collection, prints the plan summary and execution
+time, and flags any sequential scan of messages or a vecs table. Samples a
+session and user from the data when none are given. With --strict the exit
+code is 1 if a check fails.
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+from dotenv import load_dotenv
+
+from migrate import resolve_params
+
+
+def plan_nodes(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+    nodes = [node]
+    for child in node.get("Plans", []):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+def explain(cur, sql: str, params: tuple) -> Dict[str, Any]:
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+    return cur.fetchone()[0][0]
+
+
+def report(name: str, plan: Dict[str, Any], table: str) -> bool:
+    nodes = plan_nodes(plan["Plan"])
+    scans = [
+        f"{n['Node Type']} on {n.get('Relation Name', '?')}" + (f" using {n['Index Name']}" if "Index Name" in n else "")
+        for n in nodes if "Relation Name" in n
+    ]
+    seq_scans = [n for n in nodes if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == table]
+    ok = not seq_scans
+    print(f"[{'ok' if ok else 'FAIL'}] {name}: {plan['Execution Time']:.2f} ms")
+    for scan in scans:
+        print(f"       {scan}")
+    if seq_scans:
+        print(f"       sequential scan of {table}; run migrate.py or ANALYZE the table")
+    return ok
+
+
+def sample(cur, sql: str) -> Optional[Any]:
+    cur.execute(sql)
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="defaults to DATABASE_URL")
+    parser.add_argument("--session-id", default=None)
+    parser.add_argument("--user-id", default=None)
+    parser.add_argument("--ef-search", type=int, default=None, help="hnsw.ef_search for the vector queries")
+    parser.add_argument("--strict", action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = psycopg2.connect(args.database_url or os.environ["DATABASE_URL"])
+    conn.autocommit = True
+    all_ok = True
+    try:
+        with conn.cursor() as cur:
+            if args.ef_search:
+                cur.execute("SET hnsw.ef_search = %s", (args.ef_search,))
+
+            session_id = args.session_id or sample(
+                cur, "SELECT session_id FROM messages ORDER BY created_at DESC LIMIT 1"
+            )
+            if session_id:
+                all_ok &= report("messages history page", explain(
+                    cur,
+                    "SELECT id, message, created_at FROM messages WHERE session_id = %s "
+                    "ORDER BY created_at DESC, id DESC LIMIT 10",
+                    (session_id,)
+                ), "messages")
+            else:
+                print("[skip] messages is empty")
+
+            for collection in resolve_params({})["collections"].split(","):
+                cur.execute("SELECT to_regclass(%s)", (f"vecs.{collection}",))
+                if cur.fetchone()[0] is None:
+                    print(f"[skip] vecs.{collection} does not exist")
+                    continue
+                user_id = args.user_id or sample(
+                    cur, f'SELECT metadata->>\'user_id\' FROM vecs."{collection}" LIMIT 1'
+                )
+                query_vec = sample(cur, f'SELECT vec::text FROM vecs."{collection}" LIMIT 1')
+                if user_id is None or query_vec is None:
+                    print(f"[skip] vecs.{collection} is empty")
+                    continue
+                all_ok &= report(f"vecs.{collection} user filter", explain(
+                    cur,
+                    f'SELECT id FROM vecs."{collection}" WHERE metadata->>\'user_id\' = %s',
+                    (user_id,)
+                ), collection)
+                all_ok &= report(f"vecs.{collection} ANN search", explain(
+                    cur,
+                    f'SELECT id, vec <=> %s::vector AS distance FROM vecs."{collection}" '
+                    f'WHERE metadata @> %s::jsonb ORDER BY vec <=> %s::vector LIMIT 3',
+                    (query_vec, json.dumps({"user_id": user_id}), query_vec)
+                ), collection)
+    finally:
+        conn.close()
+    return all_ok
+
+
+if __name__ == "__main__":
+    ok = main()
+    if not ok and "--strict" in sys.argv:
+        sys.exit(1)
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+@dataclass
+class DependencyCheck:
+    name: str
+    check: Callable[[], Awaitable[Any]]
+    # A failing required dependency makes the replica not ready; others only degrade it
+    required: bool = True
+
+
+class HealthProbe:
+    """Checks the endpoint's dependencies concurrently and caches the verdict.
+
+    Each check gets ``timeout`` seconds. The combined result is reused for
+    ``ttl`` seconds and concurrent callers share one probe in flight, so a
+    burst of load balancer probes costs the dependencies one round of
+    checks at most every ``ttl`` seconds.
+    """
+
+    def __init__(self, timeout: float = 2.0, ttl: float = 5.0):
+        self.timeout = timeout
+        self.ttl = ttl
+        self.checks: Dict[str, DependencyCheck] = {}
+        self.last: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+
+    def add(self, name: str, check: Callable[[], Awaitable[Any]], required: bool = True):
+        self.checks[name] = DependencyCheck(name, check, required)
+
+    async def _run_check(self, dependency: DependencyCheck) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(dependency.check(), self.timeout)
+            ok, error = True, None
+        except asyncio.TimeoutError:
+            ok, error = False, f"timed out after {self.timeout:g}s"
+        except Exception as e:
+            ok, error = False, str(e) or type(e).__name__
+        return {
+            "ok": ok,
+            "required": dependency.required,
+            "latency_ms": round(1000 * (time.perf_counter() - start), 1),
+            "error": error,
+        }
+
+    async def _probe(self) -> Dict[str, Any]:
+        results = await asyncio.gather(*(self._run_check(d) for d in self.checks.values()))
+        dependencies = dict(zip(self.checks, results))
+        if all(r["ok"] for r in results):
+            status = "ok"
+        elif all(r["ok"] for r in results if r["required"]):
+            status = "degraded"
+        else:
+            status = "down"
+        self.last = {"status": status, "checked_at": time.time(), "dependencies": dependencies}
+        self._checked_at = time.monotonic()
+        return self.last
+
+    async def check(self) -> Dict[str, Any]:
+        """The cached result if it is fresh, else the result of a new (or the running) probe."""
+        if self.last is not None and time.monotonic() - self._checked_at < self.ttl:
+            return self.last
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._probe())
+        # shield: a caller that disconnects must not cancel the probe others wait on
+        return await asyncio.shield(self._inflight)
@@ -0,0 +1,134 @@
+import itertools
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+@dataclass
+class CachedMessage:
+    """A stored message row, already converted to a pydantic-ai message."""
+    key: Any
+    message_type: str
+    request_id: Optional[str]
+    message: Any
+    size: int
+    created_at: Optional[str] = None
+
+
+@dataclass
+class _Session:
+    entries: Deque[CachedMessage]
+    loaded_at: float
+    last_used: float
+    size: int = 0
+    keys: set = field(default_factory=set)
+
+
+class SessionHistoryCache:
+    """Per-session ring buffer of the most recent converted messages.
+
+    ``store_message`` appends to a cached session, so a running chat is
+    served from memory instead of re-querying Supabase every turn. Sessions
+    are evicted once idle for ``idle_ttl`` seconds, or least-recently-used
+    first when the cache exceeds ``max_bytes``. Each uvicorn worker has its
+    own cache, so a session is also reloaded after ``max_age`` seconds to pick
+    up turns written by other workers. Messages stored while a session is
+    being read from the database are merged into the read once it finishes,
+    since the read may or may not have seen them.
+
+    All methods are called from the event loop and need no locking.
+    """
+
+    def __init__(self, turns: int = 10, idle_ttl: float = 900.0, max_bytes: int = 64 * 1024 * 1024, max_age: float = 60.0):
+        self.turns = turns
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        # Session and the messages stored since the read began, per read in flight
+        self._loads: Dict[int, Tuple[str, List[CachedMessage]]] = {}
+        self._tokens = itertools.count()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _evict(self, now: float):
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used < self.idle_ttl and self.size <= self.max_bytes:
+                break
+            self._drop(session_id)
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self.size -= session.size
+
+    def begin_load(self, session_id: str) -> int:
+        """Register a database read of a session; pass the token to ``finish_load``."""
+        token = next(self._tokens)
+        self._loads[token] = (session_id, [])
+        return token
+
+    def finish_load(self, token: int, entries: Optional[List[CachedMessage]]):
+        """Cache the rows read under ``token`` plus the messages stored meanwhile, unless the read failed."""
+        session_id, stored = self._loads.pop(token)
+        if entries is None:
+            return
+        now = time.monotonic()
+        self._drop(session_id)
+        session = _Session(entries=deque(maxlen=self.turns), loaded_at=now, last_used=now)
+        self._sessions[session_id] = session
+        for entry in entries:
+            self._push(session, entry)
+        # Stored after the newest row the read can have returned, so they go last
+        for entry in stored:
+            if entry.key not in session.keys:
+                self._push(session, entry)
+        self._evict(now)
+
+    def get(self, session_id: str) -> Optional[List[CachedMessage]]:
+        now = time.monotonic()
+        self._evict(now)
+        session = self._sessions.get(session_id)
+        if session is None or now - session.loaded_at > self.max_age:
+            self._drop(session_id)
+            self.misses += 1
+            return None
+        session.last_used = now
+        self._sessions.move_to_end(session_id)
+        self.hits += 1
+        return list(session.entries)
+
+    def append(self, session_id: str, entry: CachedMessage):
+        """Record a newly stored message; only sessions already in the cache or being read are updated."""
+        for loading, stored in self._loads.values():
+            if loading == session_id:
+                stored.append(entry)
+        session = self._sessions.get(session_id)
+        if session is None or entry.key in session.keys:
+            return
+        self._push(session, entry)
+        self._evict(time.monotonic())
+
+    def _push(self, session: _Session, entry: CachedMessage):
+        if len(session.entries) == session.entries.maxlen:
+            dropped = session.entries.popleft()
+            session.keys.discard(dropped.key)
+            session.size -= dropped.size
+            self.size -= dropped.size
+        session.entries.append(entry)
+        session.keys.add(entry.key)
+        session.size += entry.size
+        self.size += entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
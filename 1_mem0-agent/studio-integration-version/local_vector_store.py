@@ -0,0 +1,372 @@
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # exact search only
+    hnswlib = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: the one-process rule is not enforced
+    fcntl = None
+
+
+@dataclass
+class OutputData:
+    id: str
+    score: Optional[float]
+    payload: Optional[Dict[str, Any]]
+
+
+class LocalVectorStore:
+    """Embedded vector store for mem0, for single-node deployments and offline tests.
+
+    Normalised float32 embeddings live in a memory-mapped ``<collection>.f32``
+    file; ids and payloads live in a SQLite sidecar next to it, so reopening a
+    store only maps the file and reads the payload rows. Each user has an id
+    index of row numbers, so searches only touch that user's vectors: an exact,
+    vectorised top-k for users with up to ``ann_threshold`` memories, and a
+    per-user HNSW index (built on first use, needs ``hnswlib``) above that.
+
+    Scores are cosine distances, like the supabase provider: lower is closer.
+    A collection's files must be used by one store at a time: the store
+    takes an exclusive lock on ``<collection>.lock`` and refuses to open a
+    collection another process (or another store in this one) holds.
+    Different collections under one path can be open together.
+    """
+
+    def __init__(
+        self,
+        path: str = "local_vector_store",
+        collection_name: str = "memories",
+        embedding_model_dims: Optional[int] = 1536,
+        ann_threshold: int = 2000,
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef_search: int = 64,
+    ):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock_file = None
+        self._locked_name: Optional[str] = None
+        self.ann_threshold = ann_threshold
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        self._lock = threading.RLock()
+        self._db = None
+        self.create_col(collection_name, embedding_model_dims)
+
+    def _lock_collection(self, name: str):
+        """Hold the lock of collection ``name`` (and release the previous one) while it is open."""
+        if fcntl is None or name == self._locked_name:
+            return
+        lock_file = open(self.path / f"{name}.lock", "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.seek(0)
+            holder = lock_file.read().strip()
+            lock_file.close()
+            if holder == str(os.getpid()):
+                raise RuntimeError(
+                    f"Collection {name} of local vector store {self.path} is already open in this process; "
+                    "share that store instead of opening it twice"
+                )
+            raise RuntimeError(
+                f"Local vector store {self.path} ({name}) is in use by another process (pid {holder or 'unknown'}); "
+                "it supports a single process, so run one worker or use the supabase provider"
+            )
+        lock_file.truncate(0)
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        if self._lock_file is not None:
+            # Closing the file releases its lock
+            self._lock_file.close()
+        # Held, and the lock with it, until another collection is opened
+        self._lock_file = lock_file
+        self._locked_name = name
+
+    # Storage
+
+    def create_col(self, name: str, vector_size: Optional[int], distance: str = "cosine"):
+        with self._lock:
+            self._lock_collection(name)
+            if self._db is not None:
+                self._db.close()
+            self.collection_name = name
+            self._vectors_file = self.path / f"{name}.f32"
+            self._db = sqlite3.connect(self.path / f"{name}.sqlite3", check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # The vector file has no header, so its row width is recorded here
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            stored = self._db.execute("SELECT value FROM meta WHERE key = 'dims'").fetchone()
+            if stored is not None:
+                if vector_size is not None and vector_size != int(stored[0]):
+                    raise ValueError(f"Collection {name} holds {stored[0]}-dimensional vectors, not {vector_size}")
+                vector_size = int(stored[0])
+            elif vector_size is None:
+                raise ValueError(f"Collection {name} does not exist; its vector size is needed to create it")
+            else:
+                self._db.execute("INSERT INTO meta (key, value) VALUES ('dims', ?)", (str(vector_size),))
+            self.dims = vector_size
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS vectors (
+                    row INTEGER PRIMARY KEY,
+                    id TEXT UNIQUE NOT NULL,
+                    user_id TEXT,
+                    payload TEXT,
+                    deleted INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        self._ids: List[str] = []
+        self._payloads: List[Optional[Dict[str, Any]]] = []
+        self._row_of: Dict[str, int] = {}
+        self._user_rows: Dict[Optional[str], List[int]] = {}
+        self._ann: Dict[Optional[str], Any] = {}
+        for row, vector_id, user_id, payload, deleted in self._db.execute(
+            "SELECT row, id, user_id, payload, deleted FROM vectors ORDER BY row"
+        ):
+            # Rows are dense, but stay defensive about gaps
+            while len(self._ids) < row:
+                self._ids.append("")
+                self._payloads.append(None)
+            self._ids.append(vector_id)
+            self._payloads.append(None if deleted else json.loads(payload))
+            if not deleted:
+                self._row_of[vector_id] = row
+                self._user_rows.setdefault(user_id, []).append(row)
+        self._open_vectors(max(len(self._ids), 1024))
+
+    def _open_vectors(self, capacity: int):
+        size = capacity * self.dims * 4
+        if not self._vectors_file.exists() or self._vectors_file.stat().st_size < size:
+            with open(self._vectors_file, "ab") as f:
+                f.truncate(size)
+        self._capacity = self._vectors_file.stat().st_size // (self.dims * 4)
+        self._vectors = np.memmap(self._vectors_file, dtype=np.float32, mode="r+", shape=(self._capacity, self.dims))
+
+    def _ensure_capacity(self, rows: int):
+        if rows <= self._capacity:
+            return
+        self._vectors.flush()
+        del self._vectors
+        self._open_vectors(max(rows, self._capacity * 2))
+
+    def _normalize(self, vector: Any) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    # ANN
+
+    def _ann_for(self, user_id: Optional[str], rows: List[int]):
+        index = self._ann.get(user_id)
+        if index is None:
+            index = hnswlib.Index(space="cosine", dim=self.dims)
+            index.init_index(max_elements=max(2 * len(rows), 1024), ef_construction=self.hnsw_ef_construction, M=self.hnsw_m)
+            index.add_items(self._vectors[rows], rows)
+            index.set_ef(self.hnsw_ef_search)
+            self._ann[user_id] = index
+        return index
+
+    def _ann_add(self, user_id: Optional[str], row: int, vector: np.ndarray):
+        index = self._ann.get(user_id)
+        if index is None:
+            return
+        if index.get_current_count() >= index.get_max_elements():
+            index.resize_index(2 * index.get_max_elements())
+        index.add_items(vector.reshape(1, -1), [row])
+
+    def _ann_remove(self, user_id: Optional[str], row: int):
+        index = self._ann.get(user_id)
+        if index is not None:
+            index.mark_deleted(row)
+
+    # mem0 vector store interface
+
+    def insert(self, vectors: List[List[float]], payloads: Optional[List[Dict]] = None, ids: Optional[List[str]] = None):
+        payloads = payloads or [{} for _ in vectors]
+        ids = ids or [str(i) for i in range(len(self._ids), len(self._ids) + len(vectors))]
+        with self._lock:
+            for vector, payload, vector_id in zip(vectors, payloads, ids):
+                if vector_id in self._row_of:
+                    self.update(vector_id, vector=vector, payload=payload)
+                    continue
+                row = len(self._ids)
+                self._ensure_capacity(row + 1)
+                normalized = self._normalize(vector)
+                self._vectors[row] = normalized
+                user_id = payload.get("user_id")
+                self._db.execute(
+                    "INSERT INTO vectors (row, id, user_id, payload) VALUES (?, ?, ?, ?)",
+                    (row, vector_id, user_id, json.dumps(payload))
+                )
+                self._ids.append(vector_id)
+                self._payloads.append(dict(payload))
+                self._row_of[vector_id] = row
+                self._user_rows.setdefault(user_id, []).append(row)
+                self._ann_add(user_id, row, normalized)
+            self._vectors.flush()
+            self._db.commit()
+
+    def search(self, query: Any, vectors: Any = None, limit: int = 5, filters: Optional[Dict] = None) -> List[OutputData]:
+        # Older mem0 passes the embedding as `query`, newer ones as `vectors`
+        normalized = self._normalize(vectors if vectors is not None else query)
+        filters = dict(filters or {})
+        with self._lock:
+            if "user_id" in filters:
+                user_id = filters.pop("user_id")
+                rows = list(self._user_rows.get(user_id, []))
+            else:
+                user_id = None
+                rows = list(self._row_of.values())
+            if filters:
+                rows = [r for r in rows if all(self._payloads[r].get(k) == v for k, v in filters.items())]
+            if not rows or limit <= 0:
+                return []
+            k = min(limit, len(rows))
+
+            if hnswlib is not None and not filters and len(rows) > self.ann_threshold and user_id is not None:
+                labels, distances = self._ann_for(user_id, rows).knn_query(normalized, k=k)
+                hits = zip(labels[0].tolist(), distances[0].tolist())
+            else:
+                row_array = np.asarray(rows)
+                similarities = self._vectors[row_array] @ normalized
+                top = np.argpartition(-similarities, k - 1)[:k]
+                top = top[np.argsort(-similarities[top])]
+                hits = ((int(row_array[i]), 1.0 - float(similarities[i])) for i in top)
+
+            return [
+                OutputData(id=self._ids[row], score=float(distance), payload=dict(self._payloads[row]))
+                for row, distance in hits
+            ]
+
+    def delete(self, vector_id: str):
+        with self._lock:
+            row = self._row_of.pop(vector_id, None)
+            if row is None:
+                return
+            user_id = self._payloads[row].get("user_id")
+            self._payloads[row] = None
+            self._user_rows[user_id].remove(row)
+            self._ann_remove(user_id, row)
+            self._db.execute("UPDATE vectors SET deleted = 1, payload = NULL WHERE row = ?", (row,))
+            self._db.commit()
+
+    def update(self, vector_id: str, vector: Optional[List[float]] = None, payload: Optional[Dict] = None):
+        with self._lock:
+            row = self._row_of.get(vector_id)
+            if row is None:
+                return
+            old_user = self._payloads[row].get("user_id")
+            new_user = payload.get("user_id") if payload is not None else old_user
+            if new_user != old_user:
+                self._user_rows[old_user].remove(row)
+                self._ann_remove(old_user, row)
+                self._user_rows.setdefault(new_user, []).append(row)
+            if vector is not None:
+                self._vectors[row] = self._normalize(vector)
+                self._vectors.flush()
+            if vector is not None or new_user != old_user:
+                self._ann_add(new_user, row, self._vectors[row])
+            if payload is not None:
+                self._payloads[row] = dict(payload)
+                self._db.execute(
+                    "UPDATE vectors SET user_id = ?, payload = ? WHERE row = ?",
+                    (new_user, json.dumps(payload), row)
+                )
+                self._db.commit()
+
+    def get(self, vector_id: str) -> Optional[OutputData]:
+        with self._lock:
+            row = self._row_of.get(vector_id)
+            if row is None:
+                return None
+            return OutputData(id=vector_id, score=None, payload=dict(self._payloads[row]))
+
+    def list(self, filters: Optional[Dict] = None, limit: Optional[int] = None) -> List[List[OutputData]]:
+        filters = filters or {}
+        with self._lock:
+            if "user_id" in filters:
+                rows = list(self._user_rows.get(filters["user_id"], []))
+            else:
+                rows = sorted(self._row_of.values())
+            results = [
+                OutputData(id=self._ids[r], score=None, payload=dict(self._payloads[r]))
+                for r in rows
+                if all(self._payloads[r].get(k) == v for k, v in filters.items())
+            ]
+        # mem0 expects the records wrapped in an outer list
+        return [results[:limit] if limit else results]
+
+    def iter_records(self, batch_size: int = 500, user_id: Optional[str] = None, after_id: Optional[str] = None):
+        """Yield batches of (id, vector, payload) in id order, for bulk export."""
+        with self._lock:
+            rows = self._user_rows.get(user_id, []) if user_id is not None else self._row_of.values()
+            ids = sorted(self._ids[r] for r in rows)
+        if after_id is not None:
+            ids = [i for i in ids if i > after_id]
+        for start in range(0, len(ids), batch_size):
+            batch = []
+            with self._lock:
+                for vector_id in ids[start:start + batch_size]:
+                    row = self._row_of.get(vector_id)
+                    if row is not None:
+                        batch.append((vector_id, np.array(self._vectors[row]), dict(self._payloads[row])))
+            if batch:
+                yield batch
+
+    def list_cols(self) -> List[str]:
+        return sorted(p.stem for p in self.path.glob("*.sqlite3"))
+
+    def col_info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.collection_name,
+                "count": len(self._row_of),
+                "dims": self.dims,
+                "users": len(self._user_rows),
+                "ann_indexes": len(self._ann),
+            }
+
+    def delete_col(self):
+        with self._lock:
+            self._db.close()
+            self._db = None
+            del self._vectors
+            for suffix in (".sqlite3", ".sqlite3-wal", ".sqlite3-shm", ".f32"):
+                path = self.path / f"{self.collection_name}{suffix}"
+                if path.exists():
+                    os.remove(path)
+
+    def close(self):
+        """Write out and close the collection's files and release its lock."""
+        with self._lock:
+            if self._db is not None:
+                self._vectors.flush()
+                del self._vectors
+                self._db.close()
+                self._db = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+                self._locked_name = None
+
+    def reset(self):
+        with self._lock:
+            name, dims = self.collection_name, self.dims
+            self.delete_col()
+            self.create_col(name, dims)
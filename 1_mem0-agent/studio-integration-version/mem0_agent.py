@@ -4,42 +4,86 @@ import asyncio
 import os
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any
+from typing import Any, List
 
 import logfire
 from dotenv import load_dotenv
 
-from pydantic_ai.models.openai import OpenAIModel
 from pydantic_ai import Agent, ModelRetry, RunContext
+from pydantic_ai.messages import ModelMessage, ModelRequest, SystemPromptPart
 
 load_dotenv()
 llm = os.getenv('LLM_MODEL', 'gpt-4o-mini')
 
-# 'if-token-present' means nothing will be sent (and the example will work) if you don't have logfire configured
-logfire.configure(send_to_logfire='if-token-present')
+
+def configure_logging():
+    # 'if-token-present' means nothing will be sent (and the example will work) if you don't have logfire configured
+    logfire.configure(send_to_logfire='if-token-present')
 
 
 @dataclass
 class Mem0Deps:
     memories: str
+    # Running summary of the session's turns older than message_history
+    summary: str = ""
+
 
+SYSTEM_PROMPT = f'You are a helpful AI. Answer the question based on query and memories. The current date is: {datetime.now().strftime("%Y-%m-%d")}'
 
+# The models are attached by init_models(), so importing this module neither
+# loads the OpenAI client nor needs an API key
 mem0_agent = Agent(
-    OpenAIModel(llm),
-    system_prompt=f'You are a helpful AI. Answer the question based on query and memories. The current date is: {datetime.now().strftime("%Y-%m-%d")}',
+    None,
+    system_prompt=SYSTEM_PROMPT,
     deps_type=Mem0Deps,
     retries=2
 )
 
-@mem0_agent.system_prompt  
-def add_memories(ctx: RunContext[str]) -> str:
-    return f"\nUser Memories:\n{ctx.deps.memories}"
+def with_context(message_history: List[ModelMessage], deps: Mem0Deps) -> List[ModelMessage]:
+    """``message_history`` led by the system prompt, the user's memories and the session summary.
+
+    pydantic-ai only adds an agent's system prompts to runs without message
+    history, so runs that continue a conversation must carry them in it.
+    """
+    parts = [SystemPromptPart(SYSTEM_PROMPT)]
+    # Nothing relevant was found; leave the memory section out of the prompt
+    if deps.memories:
+        parts.append(SystemPromptPart(f"User Memories:\n{deps.memories}"))
+    if deps.summary:
+        parts.append(SystemPromptPart(f"Summary of the earlier conversation:\n{deps.summary}"))
+    return [ModelRequest(parts=parts), *message_history]
+
+# Folds older turns into the running session summary (see session_summary.py)
+summary_agent = Agent(
+    None,
+    system_prompt=(
+        'You maintain a running summary of a conversation between a user and an AI assistant. '
+        'Given the current summary and the next messages, return an updated summary that keeps '
+        'facts, decisions, open questions and the user\'s stated preferences, in at most '
+        f'{os.getenv("SUMMARY_MAX_WORDS", "250")} words. Return only the summary.'
+    ),
+    retries=2
+)
+
+
+def init_models():
+    from openai import AsyncOpenAI
+    from pydantic_ai.models.openai import OpenAIModel
+
+    # The endpoint retries within a budget (resilience.py); the client's own
+    # retries would multiply the load on a struggling API
+    client = AsyncOpenAI(max_retries=int(os.getenv('OPENAI_MAX_RETRIES', '0')))
+    mem0_agent.model = OpenAIModel(llm, openai_client=client)
+    summary_agent.model = OpenAIModel(os.getenv('SUMMARY_MODEL') or llm, openai_client=client)
+
 
 async def main():
+    configure_logging()
+    init_models()
     deps = Mem0Deps(memories="")
     
     result = await mem0_agent.run(
-        'Greetings!', deps=deps
+        'Greetings!', message_history=with_context([], deps), deps=deps
     )
     
     print('Response:', result.data)
@@ -1,15 +1,21 @@
-from typing import List, Optional, Dict, Any
-from fastapi import FastAPI, HTTPException, Security, Depends
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
+from fastapi import FastAPI, HTTPException, Security, Depends, Query, Response
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import create_client, Client
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+from postgrest.types import ReturnMethod
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from mem0 import Memory
-import httpx
+import asyncio
+import json
+import uuid
 import sys
 import os
+import logfire
 
 from pydantic_ai.messages import (
     ModelRequest,
@@ -18,13 +24,166 @@ from pydantic_ai.messages import (
     TextPart
 )
 
-from mem0_agent import mem0_agent, Mem0Deps
+from mem0_agent import mem0_agent, summary_agent, configure_logging, init_models, with_context, Mem0Deps
+from context_builder import ContextBuilder
+from executor import BlockingExecutor
+from embedding_batch import embedding_batch_stats
+from embedding_cache import embedding_stats
+from memory_cache import CachedMemory
+from health_probe import HealthProbe
+from history_cache import CachedMessage, SessionHistoryCache
+from memory_batch import MemoryBatchIngestor, RateLimitGate
+from message_writer import AlreadyStoredError, MessageBatcher
+from metrics import (
+    REQUESTS,
+    in_flight,
+    mark_worker_stopped,
+    observe_blocking_call,
+    record_usage,
+    register_stats,
+    render as render_metrics
+)
+from memory_queue import MemoryJob, MemoryQueue
+from resilience import CircuitBreaker, Dependency, RetryBudget
+from session_summary import SessionSummarizer, SessionSummary, parse_timestamp
+from timing import StageTimer
 
 # Load environment variables
 load_dotenv()
 
+# supabase-py and mem0 are synchronous, so their calls run in a thread pool
+executor = BlockingExecutor(
+    max_workers=int(os.getenv("BLOCKING_POOL_SIZE", "16")),
+    default_timeout=float(os.getenv("BLOCKING_CALL_TIMEOUT", "30")),
+    observer=observe_blocking_call
+)
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+MEM0_SEARCH_TIMEOUT = float(os.getenv("MEM0_SEARCH_TIMEOUT", "15"))
+MEM0_ADD_TIMEOUT = float(os.getenv("MEM0_ADD_TIMEOUT", "120"))
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+def create_dependency(name: str, max_timeout: float, min_timeout: float) -> Dependency:
+    """Breaker, adaptive timeout and retry budget settings shared by all dependencies."""
+    return Dependency(
+        name,
+        max_timeout=max_timeout,
+        min_timeout=min_timeout,
+        timeout_multiplier=float(os.getenv("ADAPTIVE_TIMEOUT_MULTIPLIER", "3")),
+        max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "2")),
+        breaker=CircuitBreaker(
+            name,
+            failure_rate=float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5")),
+            window=int(os.getenv("CIRCUIT_WINDOW", "20")),
+            min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "5")),
+            cooldown=float(os.getenv("CIRCUIT_COOLDOWN", "10"))
+        ),
+        budget=RetryBudget(ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.2")))
+    )
+
+# A dependency that keeps failing is skipped for a while instead of making
+# every request wait out its timeout; the configured timeouts are the ceilings
+supabase_dependency = create_dependency("supabase", SUPABASE_TIMEOUT, float(os.getenv("SUPABASE_MIN_TIMEOUT", "1")))
+# Writes get their own breaker, so failing reads don't stop messages being saved
+supabase_write_dependency = create_dependency("supabase_write", SUPABASE_TIMEOUT, float(os.getenv("SUPABASE_MIN_TIMEOUT", "1")))
+mem0_dependency = create_dependency("mem0", MEM0_SEARCH_TIMEOUT, float(os.getenv("MEM0_MIN_TIMEOUT", "2")))
+# Backfills have their own breaker, so a failing batch can't shut out live search and extraction
+mem0_batch_dependency = create_dependency("mem0_batch", MEM0_ADD_TIMEOUT, float(os.getenv("MEM0_MIN_TIMEOUT", "2")))
+llm_dependency = create_dependency("llm", LLM_TIMEOUT, float(os.getenv("LLM_MIN_TIMEOUT", "10")))
+# Hedge idempotent reads (history, summaries, memory search) that run slower than their p95
+HEDGE_READS = os.getenv("HEDGE_READS", "false").lower() == "true"
+
+async def run_blocking(
+    dependency: Dependency,
+    name: str,
+    fn: Any,
+    *args,
+    max_timeout: Optional[float] = None,
+    retry: bool = False,
+    hedge: bool = False,
+    **kwargs
+) -> Any:
+    """``executor.run`` under the dependency's breaker, adaptive timeout and retries."""
+    return await dependency.call(
+        name,
+        lambda timeout: executor.run(name, fn, *args, timeout=timeout, **kwargs),
+        max_timeout=max_timeout,
+        retry=retry,
+        hedge=hedge
+    )
+
+WARMUP_WAIT_TIMEOUT = float(os.getenv("WARMUP_WAIT_TIMEOUT", "60"))
+MEMORY_INIT_TIMEOUT = float(os.getenv("MEMORY_INIT_TIMEOUT", "120"))
+
+# Created by warm_up() once the server is accepting connections
+supabase: Optional[Any] = None
+memory: Optional[CachedMemory] = None
+warmup_task: Optional[asyncio.Task] = None
+
+async def wait_for_warmup():
+    """Wait until warm_up() has finished; raises if it failed or takes longer than WARMUP_WAIT_TIMEOUT."""
+    if warmup_task is None:
+        raise RuntimeError("Start-up has not begun")
+    # shield: a caller giving up must not cancel the warm-up for everyone else
+    await asyncio.wait_for(asyncio.shield(warmup_task), WARMUP_WAIT_TIMEOUT)
+
+async def require_ready():
+    """Route dependency: wait for warm-up, or answer 503 if it does not finish in time."""
+    try:
+        await wait_for_warmup()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Service is not ready: {str(e) or type(e).__name__}")
+
+def warmup_status() -> Tuple[str, Optional[str]]:
+    """starting, ready or failed, and the warm-up error if it failed."""
+    if warmup_task is None or not warmup_task.done():
+        return "starting", None
+    if warmup_task.cancelled():
+        return "failed", "cancelled"
+    error = warmup_task.exception()
+    return ("failed", str(error) or type(error).__name__) if error else ("ready", None)
+
+def get_memory() -> CachedMemory:
+    if memory is None:
+        raise RuntimeError("Memory is not available")
+    return memory
+
+async def add_memory_job(job: MemoryJob):
+    """Run mem0 extraction for one queued turn."""
+    await wait_for_warmup()
+    with logfire.span("memory add for {user_id}", user_id=job.user_id, _level="debug"):
+        # Not retried: a repeated extraction could store the memories twice.
+        # The queue waits out an open circuit, since then nothing was run.
+        await run_blocking(mem0_dependency, "mem0.add", get_memory().add, job.messages, user_id=job.user_id, max_timeout=MEM0_ADD_TIMEOUT)
+
+# Memory extraction runs in the background so it never delays the reply
+memory_queue = MemoryQueue(
+    add_memory_job,
+    workers=int(os.getenv("MEMORY_QUEUE_WORKERS", "4")),
+    max_depth=int(os.getenv("MEMORY_QUEUE_MAX_DEPTH", "1000")),
+    spool_path=os.getenv("MEMORY_QUEUE_SPOOL_PATH", "memory_queue.spool.jsonl")
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global warmup_task
+    configure_logging()
+    # Warm-up runs in the background so the port accepts connections right
+    # away; /ready reports when it is done and routes wait for it
+    warmup_task = asyncio.create_task(warm_up())
+    await memory_queue.start()
+    await message_batcher.start()
+    yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+    await memory_queue.stop(timeout=float(os.getenv("MEMORY_QUEUE_FLUSH_TIMEOUT", "30")))
+    await session_summarizer.stop()
+    await message_batcher.stop()
+    executor.shutdown()
+    mark_worker_stopped()
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 security = HTTPBearer()
 
 app.add_middleware(
@@ -33,15 +192,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Before-Cursor", "X-After-Cursor"],
 )
 
-# Supabase setup
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
+# Recent turns per session, kept already converted for the agent
+history_cache = SessionHistoryCache(
+    turns=int(os.getenv("HISTORY_CACHE_TURNS", "10")),
+    idle_ttl=float(os.getenv("HISTORY_CACHE_IDLE_TTL", "900")),
+    max_bytes=int(os.getenv("HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    max_age=float(os.getenv("HISTORY_CACHE_MAX_AGE", "60"))
+)
+
+async def write_message_rows(rows: List[Dict[str, Any]]) -> List[str]:
+    """Write a batch of message rows and return the idempotency keys of those inserted.
+
+    Rows already stored under the same idempotency key are skipped.
+    """
+    await wait_for_warmup()
+
+    def upsert():
+        # Only inserted rows are returned, which tells the skipped ones apart
+        return supabase.table("messages").upsert(
+            rows,
+            on_conflict="idempotency_key",
+            ignore_duplicates=True,
+            returning=ReturnMethod.representation
+        ).execute()
+
+    # The batcher retries failed batches itself
+    response = await run_blocking(supabase_write_dependency, "supabase.store_messages", upsert)
+    return [row["idempotency_key"] for row in response.data]
+
+# Messages from concurrent requests are coalesced into multi-row inserts
+message_batcher = MessageBatcher(
+    write_message_rows,
+    max_batch=int(os.getenv("MESSAGE_BATCH_SIZE", "100")),
+    max_delay=float(os.getenv("MESSAGE_BATCH_DELAY", "0.05"))
 )
 
 # Mem0 Setup
+# VECTOR_STORE_PROVIDER=local keeps memories in an embedded store on this node
+local_vector_store = {
+    "provider": "local",
+    "config": {
+        "path": os.getenv("LOCAL_VECTOR_STORE_PATH", "local_vector_store"),
+        "collection_name": "memories_api_new",
+        "embedding_model_dims": 1536,
+        "ann_threshold": int(os.getenv("LOCAL_VECTOR_STORE_ANN_THRESHOLD", "2000"))
+    }
+}
+
 config = {
     "llm": {
         "provider": "openai",
@@ -49,21 +249,63 @@ config = {
             "model": os.getenv('LLM_MODEL', 'gpt-4o-mini')
         }
     },
-    "vector_store": {
+    "vector_store": local_vector_store if os.getenv("VECTOR_STORE_PROVIDER", "supabase") == "local" else {
         "provider": "supabase",
         "config": {
             "connection_string": os.environ['DATABASE_URL'],
             "collection_name": "memories_api_new",
             "embedding_model_dims": 1536
         }
-    }    
+    },
+    # Embeddings are reused across requests and worker processes
+    "embedding_cache": {
+        "path": os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite3"),
+        "memory_items": int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+    },
+    # Concurrent embedding calls share OpenAI requests
+    "embedding_batch": {
+        "max_batch": int(os.getenv("EMBEDDING_BATCH_SIZE", "64")),
+        "workers": int(os.getenv("EMBEDDING_BATCH_WORKERS", "2"))
+    }
 }
 
-try:
-    memory = Memory.from_config(config)
-    print(f"Successfully created collection with config: {config}")
-except Exception as e:
-    print(f"Failed to create collection: {str(e)}")
+# Repeated searches are served from cache until the user's memories change.
+# The workers of one host share invalidations through a SQLite file; other
+# hosts see a change after at most SEARCH_CACHE_TTL seconds
+SEARCH_CACHE_SIZE = int(os.getenv("MEMORY_SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.getenv("MEMORY_SEARCH_CACHE_TTL", "60"))
+SEARCH_CACHE_GENERATIONS_PATH = os.getenv("MEMORY_SEARCH_GENERATIONS_PATH", "memory_generations.sqlite3")
+
+def cached_memory(built: Any) -> CachedMemory:
+    return CachedMemory(built, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, generations_path=SEARCH_CACHE_GENERATIONS_PATH)
+
+def create_supabase() -> Any:
+    # supabase-py pulls in several HTTP and realtime clients, so import it only here
+    from supabase import create_client
+
+    return create_client(
+        os.getenv("SUPABASE_URL"),
+        os.getenv("SUPABASE_SERVICE_KEY")
+    )
+
+# Falling back to the local store splits memories per node and needs a single
+# worker (the store locks its files), so it has to be asked for
+LOCAL_VECTOR_STORE_FALLBACK = os.getenv("LOCAL_VECTOR_STORE_FALLBACK", "false").lower() == "true"
+
+def create_memory() -> Optional[CachedMemory]:
+    """Build mem0 (which creates the collection if needed), optionally falling back to the local vector store."""
+    # mem0 imports its whole provider stack, so load it only here
+    from memory_factory import build_memory
+
+    try:
+        built = cached_memory(build_memory(config))
+        print(f"Successfully created collection with config: {config}")
+        return built
+    except Exception as e:
+        print(f"Failed to create collection: {str(e)}")
+    if not LOCAL_VECTOR_STORE_FALLBACK or config["vector_store"] is local_vector_store:
+        print("ERROR: memory is disabled; set LOCAL_VECTOR_STORE_FALLBACK=true to use the local vector store instead")
+        return None
     # Thử lại với cách khác nếu lỗi
     try:
         alt_config = {
@@ -72,13 +314,31 @@ except Exception as e:
                 "config": {
                     "model": os.getenv('LLM_MODEL', 'gpt-4o-mini')
                 }
-            }
+            },
+            "vector_store": local_vector_store,
+            "embedding_cache": config["embedding_cache"],
+            "embedding_batch": config["embedding_batch"]
         }
-        memory = Memory.from_config(alt_config)
-        print("Using fallback in-memory storage")
+        built = cached_memory(build_memory(alt_config))
+        print(f"WARNING: using fallback local vector store at {local_vector_store['config']['path']}; memories will not be shared with other nodes")
+        return built
     except Exception as e2:
         print(f"Failed to create fallback memory: {str(e2)}")
         # Tiếp tục khởi động API mà không có memory
+        return None
+
+async def warm_up():
+    """Create the clients concurrently, off the event loop."""
+    global supabase, memory
+    started = asyncio.get_running_loop().time()
+    supabase, memory, _, _ = await asyncio.gather(
+        executor.run("startup.supabase", create_supabase, timeout=SUPABASE_TIMEOUT),
+        executor.run("startup.memory", create_memory, timeout=MEMORY_INIT_TIMEOUT),
+        executor.run("startup.models", init_models, timeout=MEMORY_INIT_TIMEOUT),
+        # tiktoken loads (and on first use downloads) its vocabulary
+        executor.run("startup.tokenizer", context_builder.tokens.count, "warm up", timeout=MEMORY_INIT_TIMEOUT)
+    )
+    print(f"Warm-up finished in {asyncio.get_running_loop().time() - started:.1f}s")
 
 # Request/Response Models
 class AgentRequest(BaseModel):
@@ -88,7 +348,35 @@ class AgentRequest(BaseModel):
     session_id: str
 
 class AgentResponse(BaseModel):
+    # False if the turn failed, or if the query or the reply could not be saved
+    success: bool
+    # The stored assistant message, and a cursor for /api/history?after= that
+    # points just past it, so callers can merge the turn without a full reload
+    message: Optional[str] = None
+    cursor: Optional[str] = None
+
+class MemoryBatchItem(BaseModel):
+    user_id: str
+    messages: List[Dict[str, str]]
+
+class MemoryBatchRequest(BaseModel):
+    items: List[MemoryBatchItem]
+
+class MemoryBatchItemResult(BaseModel):
+    index: int
+    user_id: str
+    status: str
+    # Memories added, updated or deleted by the extraction call that covered
+    # this item; reported on the first item of each call
+    memories: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+
+class MemoryBatchResponse(BaseModel):
     success: bool
+    added: int
+    failed: int
+    results: List[MemoryBatchItemResult]
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> bool:
     """Verify the bearer token against environment variable."""
@@ -105,25 +393,179 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security))
         )
     return True    
 
-async def fetch_conversation_history(session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-    """Fetch the most recent conversation history for a session."""
-    try:
-        response = supabase.table("messages") \
-            .select("*") \
+# Only the columns callers use; the agent path also needs idempotency_key for its cache
+HISTORY_COLUMNS = "id,message,created_at"
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Keyset cursor of a messages row: its created_at and id."""
+    return f"{row['created_at']}|{row['id']}" if row.get("id") is not None else row["created_at"]
+
+def parse_cursor(cursor: str) -> Tuple[str, Optional[str]]:
+    """Split a cursor into created_at and id; cursors from agent responses carry no id."""
+    created_at, _, row_id = cursor.partition("|")
+    return created_at, row_id or None
+
+async def query_conversation_history(session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Read the most recent messages of a session from Supabase, oldest first."""
+    def query():
+        return supabase.table("messages") \
+            .select(f"{HISTORY_COLUMNS},idempotency_key") \
             .eq("session_id", session_id) \
             .order("created_at", desc=True) \
+            .order("id", desc=True) \
             .limit(limit) \
             .execute()
-        
-        # Convert to list and reverse to get chronological order
-        messages = response.data[::-1]
-        return messages
-    except Exception as e:
-        print(f"Error fetching conversation history: {str(e)}")
-        return []
 
-async def store_message(session_id: str, message_type: str, content: str, data: Optional[Dict] = None):
-    """Store a message in the Supabase messages table."""
+    response = await run_blocking(supabase_dependency, "supabase.fetch_history", query, retry=True, hedge=HEDGE_READS)
+
+    # Convert to list and reverse to get chronological order
+    return response.data[::-1]
+
+async def fetch_history_page(
+    session_id: str,
+    limit: int = 50,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    from_oldest: bool = False
+) -> List[Dict[str, Any]]:
+    """Read one keyset page of a session's messages, oldest first.
+
+    Pages are ordered by (created_at, id). ``after`` reads forward from a
+    cursor, and ``from_oldest`` forward from the first message; otherwise
+    the page ends just before ``before``, or at the newest message. Each
+    page is a bounded index range scan, however deep into the session it is.
+    """
+    if after or from_oldest:
+        cursor, descending = after, False
+    else:
+        cursor, descending = before, True
+
+    def query():
+        builder = supabase.table("messages") \
+            .select(HISTORY_COLUMNS) \
+            .eq("session_id", session_id)
+        if cursor:
+            created_at, row_id = parse_cursor(cursor)
+            op = "lt" if descending else "gt"
+            if row_id is None:
+                builder = builder.filter("created_at", op, created_at)
+            else:
+                builder = builder.or_(
+                    f'created_at.{op}."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.{op}.{row_id})'
+                )
+        return builder \
+            .order("created_at", desc=descending) \
+            .order("id", desc=descending) \
+            .limit(limit) \
+            .execute()
+
+    response = await run_blocking(supabase_dependency, "supabase.fetch_history", query, retry=True, hedge=HEDGE_READS)
+    return response.data[::-1] if descending else response.data
+
+async def stream_history(session_id: str, after: Optional[str], page_size: int) -> AsyncIterator[str]:
+    """Yield a session's messages as NDJSON lines, reading one keyset page at a time."""
+    while True:
+        # Without a cursor the stream starts at the first message, not the newest page
+        rows = await fetch_history_page(session_id, page_size, after=after, from_oldest=True)
+        for row in rows:
+            yield json.dumps(row) + "\n"
+        if len(rows) < page_size:
+            return
+        after = encode_cursor(rows[-1])
+
+async def load_session_summary(session_id: str) -> Optional[Dict[str, Any]]:
+    def query():
+        return supabase.table("session_summaries") \
+            .select("summary,covered_until") \
+            .eq("session_id", session_id) \
+            .limit(1) \
+            .execute()
+
+    response = await run_blocking(supabase_dependency, "supabase.load_summary", query, retry=True, hedge=HEDGE_READS)
+    return response.data[0] if response.data else None
+
+async def save_session_summary(session_id: str, summary: str, covered_until: str):
+    def upsert():
+        return supabase.table("session_summaries").upsert(
+            {
+                "session_id": session_id,
+                "summary": summary,
+                "covered_until": covered_until,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            },
+            returning=ReturnMethod.minimal
+        ).execute()
+
+    await run_blocking(supabase_write_dependency, "supabase.save_summary", upsert, retry=True)
+
+async def fetch_messages_after(session_id: str, cursor: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    # The newest messages may still be waiting in the write batcher
+    await message_batcher.flush()
+    return await fetch_history_page(session_id, limit, after=cursor)
+
+async def summarize_messages(previous: str, rows: List[Dict[str, Any]]) -> str:
+    transcript = "\n".join(f"{row['message']['type']}: {row['message']['content']}" for row in rows)
+    prompt = f"Current summary:\n{previous or '(none yet)'}\n\nNext messages:\n{transcript}"
+    result = await llm_dependency.call(
+        "summary",
+        lambda timeout: asyncio.wait_for(summary_agent.run(prompt), timeout),
+        retry=True
+    )
+    return result.data
+
+# Older turns are folded into a per-session summary in the background (migrations/005)
+session_summarizer = SessionSummarizer(
+    load_session_summary,
+    save_session_summary,
+    fetch_messages_after,
+    summarize_messages,
+    keep_recent=int(os.getenv("SUMMARY_KEEP_RECENT", "4")),
+    refresh_every=int(os.getenv("SUMMARY_REFRESH_EVERY", "4")),
+    concurrency=int(os.getenv("SUMMARY_CONCURRENCY", "2")),
+    max_age=float(os.getenv("HISTORY_CACHE_MAX_AGE", "60"))
+)
+
+def to_cached_message(row: Dict[str, Any]) -> CachedMessage:
+    """Convert a messages row to the pydantic-ai message the agent expects."""
+    msg_data = row["message"]
+    msg_type = msg_data["type"]
+    msg_content = msg_data["content"]
+    msg = ModelRequest(parts=[UserPromptPart(content=msg_content)]) if msg_type == "human" else ModelResponse(parts=[TextPart(content=msg_content)])
+    return CachedMessage(
+        key=row.get("idempotency_key") or row.get("id"),
+        message_type=msg_type,
+        request_id=(msg_data.get("data") or {}).get("request_id"),
+        message=msg,
+        size=len(msg_content) + 256,
+        created_at=row.get("created_at")
+    )
+
+async def load_session_history(session_id: str) -> List[CachedMessage]:
+    """Recent converted messages of a session, from the cache or Supabase on a miss."""
+    cached = history_cache.get(session_id)
+    if cached is not None:
+        return cached
+
+    entries = None
+    token = history_cache.begin_load(session_id)
+    try:
+        rows = await query_conversation_history(session_id, history_cache.turns)
+        entries = [to_cached_message(row) for row in rows]
+        return entries
+    finally:
+        history_cache.finish_load(token, entries)
+
+async def fill_summary_gap(session_id: str, summary: SessionSummary, entries: List[CachedMessage]) -> List[CachedMessage]:
+    """``entries`` preceded by the stored messages between the summary's cursor and the oldest of them."""
+    if not entries[0].created_at:
+        return entries
+    rows = await fetch_history_page(session_id, session_summarizer.batch_size, after=summary.covered_until, from_oldest=True)
+    oldest = parse_timestamp(entries[0].created_at)
+    return [to_cached_message(row) for row in rows if parse_timestamp(row["created_at"]) < oldest] + entries
+
+async def store_message(session_id: str, message_type: str, content: str, data: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+    """Write a message to the Supabase messages table and return the row, or None if it wasn't saved."""
     message_obj = {
         "type": message_type,
         "content": content
@@ -131,106 +573,445 @@ async def store_message(session_id: str, message_type: str, content: str, data:
     if data:
         message_obj["data"] = data
 
+    # Retried writes of the same turn share a key, so they are stored only once;
+    # the session is part of it because request ids only come from the client.
+    # An apology has a key of its own, so a retry's reply is not blocked by it.
+    request_id = (data or {}).get("request_id")
+    kind = "error" if "error" in (data or {}) else message_type
+    idempotency_key = f"{session_id}:{request_id}:{kind}" if request_id else str(uuid.uuid4())
+
     try:
-        supabase.table("messages").insert({
+        row = await message_batcher.enqueue({
             "session_id": session_id,
-            "message": message_obj
-        }).execute()
+            "message": message_obj,
+            "idempotency_key": idempotency_key
+        })
+        history_cache.append(session_id, to_cached_message(row))
         print(f"Stored message: {message_type} - {content[:30]}...")
+        return row
+    except AlreadyStoredError as e:
+        # A retried request: its query (or apology) is the one stored already
+        if kind != "ai":
+            return e.row
+        # The reply of an earlier attempt is stored; this different one is not
+        print(f"Reply to request {request_id} was stored by an earlier attempt; not saving this one")
+        return None
     except Exception as e:
         print(f"Failed to store message: {str(e)}")
+        return None
 
-@app.post("/api/mem0-agent", response_model=AgentResponse)
-async def web_search(
-    request: AgentRequest,
-    authenticated: bool = Depends(verify_token)
-):
+# Filters memories by relevance and keeps memories and history within their token budgets
+context_builder = ContextBuilder(
+    max_distance=float(os.getenv("MEMORY_MAX_DISTANCE", "0.65")),
+    duplicate_threshold=float(os.getenv("MEMORY_DUPLICATE_THRESHOLD", "0.85")),
+    memory_tokens=int(os.getenv("MEMORY_TOKEN_BUDGET", "400")),
+    history_tokens=int(os.getenv("HISTORY_TOKEN_BUDGET", "2000")),
+    model=os.getenv("LLM_MODEL", "gpt-4o-mini")
+)
+MEMORY_SEARCH_CANDIDATES = int(os.getenv("MEMORY_SEARCH_CANDIDATES", "10"))
+
+def message_text(message: Any) -> str:
+    return "\n".join(str(getattr(part, "content", "")) for part in message.parts)
+
+async def search_memories(query: str, user_id: str) -> str:
+    """Retrieve relevant memories with Mem0, formatted for the system prompt."""
     try:
-        # Fetch conversation history
-        conversation_history = await fetch_conversation_history(request.session_id)
-        
-        # Convert conversation history to format expected by agent
-        messages = []
-        for msg in conversation_history:
-            msg_data = msg["message"]
-            msg_type = msg_data["type"]
-            msg_content = msg_data["content"]
-            msg = ModelRequest(parts=[UserPromptPart(content=msg_content)]) if msg_type == "human" else ModelResponse(parts=[TextPart(content=msg_content)])
-            messages.append(msg)
-
-        # Store user's query
-        await store_message(
+        relevant_memories = await run_blocking(
+            mem0_dependency,
+            "mem0.search",
+            get_memory().search,
+            query=query,
+            user_id=user_id,
+            limit=MEMORY_SEARCH_CANDIDATES,
+            retry=True,
+            hedge=HEDGE_READS
+        )
+        return context_builder.format_memories(relevant_memories["results"])
+    except Exception as e:
+        print(f"Error retrieving memories: {str(e)}")
+        return "(No memories available)"
+
+async def prepare_turn(request: AgentRequest, timer: StageTimer) -> Tuple[List[Any], Mem0Deps, bool]:
+    """Store the query and gather the history, summary and memories the agent needs.
+
+    Returns the message history, led by the system prompt, memories and summary, the
+    agent's deps and whether the query was saved.
+    """
+    # History fetch, storing the query, the summary and memory search don't
+    # depend on each other, so run them concurrently. Each stage degrades on
+    # its own (empty history, unsaved query, no summary, no memories) rather
+    # than failing the turn; if the request itself is cancelled, gather
+    # cancels all of them.
+    history_result, store_result, summary_result, memories_result = await asyncio.gather(
+        timer.measure("history", load_session_history(request.session_id)),
+        timer.measure("store_query", store_message(
             session_id=request.session_id,
             message_type="human",
-            content=request.query
-        )       
+            content=request.query,
+            data={"request_id": request.request_id}
+        )),
+        timer.measure("summary", session_summarizer.get(request.session_id)),
+        timer.measure("memory_search", search_memories(request.query, request.user_id)),
+        return_exceptions=True
+    )
+    if isinstance(history_result, Exception):
+        print(f"Error fetching conversation history: {str(history_result)}")
+        history_result = []
+    if isinstance(store_result, Exception):
+        print(f"Failed to store message: {str(store_result)}")
+        store_result = None
+    if isinstance(summary_result, Exception):
+        print(f"Error loading session summary: {str(summary_result)}")
+        summary_result = None
+    memories_str = memories_result
+    if isinstance(memories_result, Exception):
+        print(f"Error retrieving memories: {str(memories_result)}")
+        memories_str = "(No memories available)"
 
-        # Retrieve relevant memories with Mem0
+    # Turns the summary already covers need not be sent again
+    uncovered = [
+        entry for entry in history_result
+        if not (summary_result and session_summarizer.is_covered(summary_result, entry.created_at))
+    ]
+    if summary_result and uncovered and len(uncovered) == len(history_result) >= history_cache.turns:
+        # The window may not reach back to the summary's cursor (a refresh is
+        # late), so read the messages in between rather than lose them
         try:
-            relevant_memories = memory.search(query=request.query, user_id=request.user_id, limit=3)
-            memories_str = "\n".join(f"- {entry['memory']}" for entry in relevant_memories["results"])
+            uncovered = await timer.measure("summary_gap", fill_summary_gap(request.session_id, summary_result, uncovered))
         except Exception as e:
-            print(f"Error retrieving memories: {str(e)}")
-            memories_str = "(No memories available)"
+            print(f"Error reading messages after the session summary: {str(e)}")
+    # Counted from stored rows, so it is right whichever worker stored them
+    session_summarizer.note_uncovered(request.session_id, len(uncovered))
+    # The concurrent store may already have added this request's query to the history
+    messages = [
+        entry.message for entry in uncovered
+        if not (entry.message_type == "human" and entry.request_id == request.request_id)
+    ]
+    deps = Mem0Deps(
+        memories=memories_str,
+        summary=summary_result.summary if summary_result else ""
+    )
+    return with_context(context_builder.trim_history(messages, message_text), deps), deps, store_result is not None
 
-        # Initialize agent dependencies
-        async with httpx.AsyncClient() as client:
-            deps = Mem0Deps(
-                memories=memories_str
-            )
+async def finish_turn(request: AgentRequest, reply: str, timer: StageTimer) -> Optional[Dict[str, Any]]:
+    """Store the agent's reply, queue the memory update for the turn and return the reply row."""
+    # Store agent's response
+    row = await timer.measure("store_reply", store_message(
+        session_id=request.session_id,
+        message_type="ai",
+        content=reply,
+        data={"request_id": request.request_id}
+    ))
 
-            # Run the agent with conversation history
-            result = await mem0_agent.run(
-                request.query,
-                message_history=messages,
-                deps=deps
-            )
-
-        # Store agent's response
-        await store_message(
-            session_id=request.session_id,
-            message_type="ai",
-            content=result.data,
-            data={"request_id": request.request_id}
+    # Queue a memory update from the last user message and agent response
+    try:
+        memory_messages = [
+            {"role": "user", "content": request.query},
+            {"role": "assistant", "content": reply}
+        ]
+        await timer.measure(
+            "memory_enqueue",
+            memory_queue.submit(MemoryJob(user_id=request.user_id, messages=memory_messages))
         )
+    except Exception as e:
+        print(f"Error queueing memory update: {str(e)}")
+
+    return row
+
+async def store_error(request: AgentRequest, error: Exception) -> Optional[Dict[str, Any]]:
+    """Store an apology in the conversation when a turn fails and return its row."""
+    return await store_message(
+        session_id=request.session_id,
+        message_type="ai",
+        content="I apologize, but I encountered an error processing your request.",
+        data={"error": str(error), "request_id": request.request_id}
+    )
 
-        # Update memories based on the last user message and agent response
+@app.post("/api/mem0-agent", response_model=AgentResponse)
+async def web_search(
+    request: AgentRequest,
+    response: Response,
+    authenticated: bool = Depends(verify_token),
+    ready: None = Depends(require_ready)
+):
+    timer = StageTimer()
+    with in_flight("agent"):
         try:
-            memory_messages = [
-                {"role": "user", "content": request.query},
-                {"role": "assistant", "content": result.data}
-            ]
-            memory.add(memory_messages, user_id=request.user_id)        
+            messages, deps, query_saved = await prepare_turn(request, timer)
+
+            # Run the agent with conversation history
+            # A reply has no side effects, so a failed run may be retried
+            result = await timer.measure("agent", llm_dependency.call(
+                "agent",
+                lambda timeout: asyncio.wait_for(
+                    mem0_agent.run(request.query, message_history=messages, deps=deps),
+                    timeout
+                ),
+                retry=True
+            ))
+            record_usage(result.usage())
+
+            row = await finish_turn(request, result.data, timer)
+
+            REQUESTS.labels("agent", "ok").inc()
+            response.headers["Server-Timing"] = timer.header()
+            return AgentResponse(
+                success=query_saved and row is not None,
+                message=result.data,
+                cursor=row["created_at"] if row else None
+            )
+
         except Exception as e:
-            print(f"Error adding memory: {str(e)}")
+            print(f"Error processing agent request: {str(e)}")
+            REQUESTS.labels("agent", "error").inc()
+            # Store error message in conversation
+            row = await store_error(request, e)
+            response.headers["Server-Timing"] = timer.header()
+            return AgentResponse(
+                success=False,
+                message=row["message"]["content"] if row else None,
+                cursor=row["created_at"] if row else None
+            )
 
-        return AgentResponse(success=True)
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    except Exception as e:
-        print(f"Error processing agent request: {str(e)}")
-        # Store error message in conversation
-        await store_message(
-            session_id=request.session_id,
-            message_type="ai",
-            content="I apologize, but I encountered an error processing your request.",
-            data={"error": str(e), "request_id": request.request_id}
+@app.post("/api/mem0-agent/stream")
+async def web_search_stream(
+    request: AgentRequest,
+    authenticated: bool = Depends(verify_token),
+    ready: None = Depends(require_ready)
+):
+    """Streaming variant of /api/mem0-agent that sends the reply as Server-Sent Events.
+
+    Emits ``token`` events with text deltas as the model produces them, then a
+    ``done`` event with the full reply once it has been stored, or an ``error``
+    event if the turn fails.
+    """
+    timer = StageTimer()
+    with in_flight("stream"):
+        messages, deps, query_saved = await prepare_turn(request, timer)
+
+    async def events():
+        chunks = []
+        with in_flight("stream"):
+            try:
+                # Tokens already sent can't be taken back, so streams are never retried
+                async with llm_dependency.track("agent.stream"), mem0_agent.run_stream(
+                    request.query,
+                    message_history=messages,
+                    deps=deps
+                ) as result:
+                    async for delta in result.stream_text(delta=True):
+                        chunks.append(delta)
+                        yield sse_event("token", {"text": delta})
+                    record_usage(result.usage())
+                reply = "".join(chunks)
+                row = await finish_turn(request, reply, timer)
+                REQUESTS.labels("stream", "ok").inc()
+                yield sse_event("done", {
+                    "message": reply,
+                    "cursor": row["created_at"] if row else None,
+                    # False if the query or the reply could not be saved
+                    "success": query_saved and row is not None
+                })
+            except Exception as e:
+                print(f"Error processing streaming agent request: {str(e)}")
+                REQUESTS.labels("stream", "error").inc()
+                await store_error(request, e)
+                yield sse_event("error", {"detail": "I apologize, but I encountered an error processing your request."})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Server-Timing": timer.header()
+        }
+    )
+
+MEMORY_BATCH_MAX_ITEMS = int(os.getenv("MEMORY_BATCH_MAX_ITEMS", "1000"))
+
+async def add_memory_group(messages: List[Dict[str, str]], user_id: str) -> Any:
+    # The ingestor retries with its own backoff and rate limit gate
+    return await run_blocking(mem0_batch_dependency, "mem0.add_batch", get_memory().add, messages, user_id=user_id, max_timeout=MEM0_ADD_TIMEOUT)
+
+# Shared by all batch requests on this worker, so together they stay within the concurrency and rate limits
+memory_batch_ingestor = MemoryBatchIngestor(
+    add_memory_group,
+    concurrency=int(os.getenv("MEMORY_BATCH_CONCURRENCY", "4")),
+    max_messages=int(os.getenv("MEMORY_BATCH_MAX_MESSAGES", "20")),
+    max_chars=int(os.getenv("MEMORY_BATCH_MAX_CHARS", "12000")),
+    max_retries=int(os.getenv("MEMORY_BATCH_MAX_RETRIES", "5")),
+    gate=RateLimitGate(max_cooldown=float(os.getenv("MEMORY_BATCH_MAX_COOLDOWN", "60")))
+)
+
+@app.post("/api/memories/batch", response_model=MemoryBatchResponse)
+async def add_memories_batch(
+    request: MemoryBatchRequest,
+    authenticated: bool = Depends(verify_token),
+    ready: None = Depends(require_ready)
+):
+    """Extract memories from many (user_id, messages) items, e.g. to backfill from chat logs.
+
+    Each user's items are merged into as few mem0 extraction calls as the
+    size limits allow and run in order; different users run concurrently.
+    Returns a status for every item, in request order. Send large imports as
+    several requests of at most MEMORY_BATCH_MAX_ITEMS items.
+    """
+    if len(request.items) > MEMORY_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MEMORY_BATCH_MAX_ITEMS} items per batch"
         )
-        return AgentResponse(success=False)
+    results = await memory_batch_ingestor.ingest(request.items)
+    added = sum(1 for r in results if r.status == "added")
+    return MemoryBatchResponse(
+        success=added == len(results),
+        added=added,
+        failed=len(results) - added,
+        results=[MemoryBatchItemResult(**vars(r)) for r in results]
+    )
+
+async def check_supabase():
+    def query():
+        return supabase.table("messages").select("id").limit(1).execute()
+
+    await executor.run("health.supabase", query, timeout=health_probe.timeout)
+
+async def check_vector_store():
+    # A filtered lookup for a user that never has memories: one index probe, no rows
+    await executor.run(
+        "health.vector_store",
+        get_memory().vector_store.list,
+        filters={"user_id": "__health_probe__"},
+        limit=1,
+        timeout=health_probe.timeout
+    )
+
+async def check_llm():
+    # Model metadata only; costs no tokens
+    model = mem0_agent.model
+    await model.client.models.retrieve(model.model_name)
+
+# /ready probes the dependencies; results are cached so probes can't pile onto them
+health_probe = HealthProbe(
+    timeout=float(os.getenv("HEALTH_CHECK_TIMEOUT", "2")),
+    ttl=float(os.getenv("HEALTH_CACHE_TTL", "5"))
+)
+health_probe.add("supabase", check_supabase)
+health_probe.add("llm", check_llm)
+# Turns still work without memories, so the vector store only degrades readiness
+health_probe.add("vector_store", check_vector_store, required=False)
+
+def dependency_stats() -> Optional[Dict[str, Any]]:
+    if health_probe.last is None:
+        return None
+    stats = {}
+    for name, result in health_probe.last["dependencies"].items():
+        stats[f"{name}_up"] = int(result["ok"])
+        stats[f"{name}_latency_ms"] = result["latency_ms"]
+    return stats
+
+# Cache, pool and queue statistics are read on every /metrics scrape
+register_stats({
+    "executor": executor.stats,
+    "history_cache": history_cache.stats,
+    "message_batcher": message_batcher.stats,
+    "memory_queue": memory_queue.stats,
+    "session_summaries": session_summarizer.stats,
+    "memory_search_cache": lambda: memory.cache_stats() if memory is not None else None,
+    "embedding_cache": lambda: embedding_stats(memory) if memory is not None else None,
+    "embedding_batch": lambda: embedding_batch_stats(memory) if memory is not None else None,
+    "dependency": dependency_stats,
+    "resilience_supabase": supabase_dependency.stats,
+    "resilience_supabase_write": supabase_write_dependency.stats,
+    "resilience_mem0": mem0_dependency.stats,
+    "resilience_mem0_batch": mem0_batch_dependency.stats,
+    "resilience_llm": llm_dependency.stats,
+})
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage and blocking call latencies, in-flight turns, tokens, cache and pool stats."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/ready")
+async def ready_check(response: Response):
+    """Readiness probe for load balancers.
+
+    503 while warm-up runs, if it failed, or if Supabase or the LLM provider
+    does not answer within HEALTH_CHECK_TIMEOUT. A failing vector store
+    reports "degraded" but stays ready. Each dependency's latency is included;
+    results are at most HEALTH_CACHE_TTL seconds old.
+    """
+    status, error = warmup_status()
+    if status != "ready":
+        response.status_code = 503
+        return {"status": status, "error": error}
+    result = await health_probe.check()
+    if result["status"] == "down":
+        response.status_code = 503
+    return {**result, "memory": memory is not None}
 
 @app.get("/health")
-async def health_check():
-    """Simple health check endpoint."""
-    return {"status": "ok"}
+async def health_check(response: Response):
+    """Liveness check; answers while warm-up is still running, 503 only if it failed."""
+    status, error = warmup_status()
+    if status == "failed":
+        response.status_code = 503
+    return {
+        "status": "failed" if status == "failed" else "ok",
+        "warmup": status,
+        "warmup_error": error,
+        # Last /ready result; /health itself never calls the dependencies
+        "dependencies": health_probe.last,
+        "circuits": {d.name: d.stats() for d in (supabase_dependency, supabase_write_dependency, mem0_dependency, mem0_batch_dependency, llm_dependency)},
+        "executor": executor.stats(),
+        "history_cache": history_cache.stats(),
+        "message_batcher": message_batcher.stats(),
+        "memory_queue": memory_queue.stats(),
+        "session_summaries": session_summarizer.stats(),
+        "embedding_cache": embedding_stats(memory) if memory is not None else None,
+        "embedding_batch": embedding_batch_stats(memory) if memory is not None else None,
+        "memory_batch_rate_limits": memory_batch_ingestor.gate.trips
+    }
 
 @app.get("/api/history")
 async def get_history(
+    response: Response,
     session_id: str,
-    limit: int = 50,
-    authenticated: bool = Depends(verify_token)
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    authenticated: bool = Depends(verify_token),
+    ready: None = Depends(require_ready)
 ):
-    """Get conversation history for a session."""
+    """Get conversation history for a session.
+
+    Returns the newest ``limit`` messages, oldest first. Page backwards with
+    ``before`` (the ``X-Before-Cursor`` header) or forwards with ``after``
+    (the ``X-After-Cursor`` header, or an agent response's ``cursor``).
+    ``format=ndjson`` streams every message from ``after`` onwards (or the
+    whole session without it) as one JSON object per line, ``limit`` rows
+    per database round-trip.
+    """
     try:
-        messages = await fetch_conversation_history(session_id, limit)
+        # Turns are only acknowledged once written, so those of other workers are
+        # visible already; this waits for the rows this worker is still writing
+        await message_batcher.flush()
+        if format == "ndjson":
+            return StreamingResponse(
+                stream_history(session_id, after, limit),
+                media_type="application/x-ndjson"
+            )
+        messages = await fetch_history_page(session_id, limit, before=before, after=after)
+        if messages:
+            response.headers["X-Before-Cursor"] = encode_cursor(messages[0])
+            response.headers["X-After-Cursor"] = encode_cursor(messages[-1])
         return messages
     except Exception as e:
         raise HTTPException(
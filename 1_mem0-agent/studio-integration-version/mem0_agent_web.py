@@ -1,13 +1,43 @@
 from fastapi import FastAPI, Request, Form, Depends
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+import importlib.util
 import uuid
 import os
 import httpx
 from pathlib import Path
 
-app = FastAPI()
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8001")
+
+def create_api_client() -> httpx.AsyncClient:
+    """Long-lived, pooled client for the mem0 agent API."""
+    return httpx.AsyncClient(
+        base_url=API_BASE_URL,
+        headers={"Authorization": f"Bearer {os.getenv('API_BEARER_TOKEN', 'mem0-secret-token')}"},
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("API_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("API_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("API_KEEPALIVE_EXPIRY", "30"))
+        ),
+        timeout=httpx.Timeout(
+            float(os.getenv("API_TIMEOUT", "120")),
+            connect=float(os.getenv("API_CONNECT_TIMEOUT", "5"))
+        ),
+        # HTTP/2 needs the h2 package and a server that speaks it; otherwise HTTP/1.1 keep-alive is used
+        http2=os.getenv("API_HTTP2", "true").lower() == "true" and importlib.util.find_spec("h2") is not None
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.api_client = create_api_client()
+    yield
+    await app.state.api_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Tạo thư mục templates và static
 templates_dir = Path("./templates")
@@ -51,10 +81,51 @@ if not index_html.exists():
                 {% endfor %}
             </div>
             
-            <form method="post">
+            <form method="post" id="chat-form">
                 <input type="text" name="message" placeholder="Type your message..." required>
                 <button type="submit">Send</button>
             </form>
+
+            <script>
+            // Stream the reply token by token; fall back to a normal form post if unsupported
+            const form = document.getElementById("chat-form");
+            form.addEventListener("submit", async (event) => {
+                if (!window.fetch || !window.ReadableStream || !window.TextDecoder) return;
+                event.preventDefault();
+                const container = document.querySelector(".chat-container");
+                const input = form.querySelector("input[name=message]");
+                const userDiv = document.createElement("div");
+                userDiv.className = "message user";
+                userDiv.textContent = input.value;
+                container.appendChild(userDiv);
+                const aiDiv = document.createElement("div");
+                aiDiv.className = "message ai";
+                container.appendChild(aiDiv);
+
+                const body = new FormData(form);
+                input.value = "";
+                const response = await fetch("/stream", { method: "POST", body: body });
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = "";
+                while (true) {
+                    const { done, value } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+                    const events = buffer.split("\\n\\n");
+                    buffer = events.pop();
+                    for (const raw of events) {
+                        const type = (raw.match(/^event: (.*)$/m) || [])[1];
+                        const data = (raw.match(/^data: (.*)$/m) || [])[1];
+                        if (!data) continue;
+                        const payload = JSON.parse(data);
+                        if (type === "token") aiDiv.textContent += payload.text;
+                        else if (type === "done") aiDiv.textContent = payload.message;
+                        else if (type === "error") aiDiv.textContent = payload.detail;
+                    }
+                }
+            });
+            </script>
         </body>
         </html>
         """)
@@ -65,30 +136,68 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Setup templates
 templates = Jinja2Templates(directory="templates")
 
+# Rendered history per session with the cursor of its newest row, so each page
+# view only asks the API for rows it hasn't seen yet
+session_histories: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+MAX_CACHED_SESSIONS = int(os.getenv("WEB_SESSION_CACHE_SIZE", "1000"))
+MAX_CACHED_MESSAGES = int(os.getenv("WEB_SESSION_CACHE_MESSAGES", "50"))
+# The API serves at most 500 rows per page
+HISTORY_PAGE_SIZE = min(MAX_CACHED_MESSAGES, 500)
+
+def remember_messages(session_id: str, messages: List[Dict[str, str]], cursor: Optional[str]):
+    """Append messages to the local copy of a session's history."""
+    cached = session_histories.pop(session_id, {"messages": [], "cursor": None})
+    cached["messages"] = (cached["messages"] + messages)[-MAX_CACHED_MESSAGES:]
+    cached["cursor"] = cursor or cached["cursor"]
+    session_histories[session_id] = cached
+    while len(session_histories) > MAX_CACHED_SESSIONS:
+        session_histories.popitem(last=False)
+
+def cached_messages(session_id: str) -> List[Dict[str, str]]:
+    """The local copy of a session's history, without asking the API."""
+    cached = session_histories.get(session_id)
+    return list(cached["messages"]) if cached else []
+
+async def load_history(client: httpx.AsyncClient, session_id: str) -> Optional[List[Dict[str, str]]]:
+    """Get message history from mem0_agent_endpoint API, fetching only rows newer than the local copy.
+
+    Returns None if the API could not be read.
+    """
+    try:
+        while True:
+            cached = session_histories.get(session_id)
+            params = {"session_id": session_id, "limit": HISTORY_PAGE_SIZE}
+            if cached and cached["cursor"]:
+                params["after"] = cached["cursor"]
+            response = await client.get("/api/history", params=params)
+            if response.status_code != 200:
+                return None
+            data = response.json()
+            messages = []
+            for msg in data:
+                msg_data = msg["message"]
+                messages.append({
+                    "type": "user" if msg_data["type"] == "human" else "ai",
+                    "content": msg_data["content"]
+                })
+            remember_messages(session_id, messages, response.headers.get("X-After-Cursor"))
+            # A full page after the cursor may have more rows behind it
+            if "after" not in params or len(data) < HISTORY_PAGE_SIZE:
+                break
+    except Exception as e:
+        print(f"Error fetching message history: {e}")
+        return None
+    return cached_messages(session_id)
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     # Initialize or get session
     session_id = request.cookies.get("session_id", str(uuid.uuid4()))
     user_id = request.cookies.get("user_id", str(uuid.uuid4()))
     
-    # Get message history from mem0_agent_endpoint API
-    messages = []
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"http://localhost:8001/api/history?session_id={session_id}",
-                headers={"Authorization": f"Bearer {os.getenv('API_BEARER_TOKEN', 'mem0-secret-token')}"}
-            )
-            if response.status_code == 200:
-                data = response.json()
-                for msg in data:
-                    msg_data = msg["message"]
-                    messages.append({
-                        "type": "user" if msg_data["type"] == "human" else "ai",
-                        "content": msg_data["content"]
-                    })
-    except Exception as e:
-        print(f"Error fetching message history: {e}")
+    messages = await load_history(request.app.state.api_client, session_id)
+    if messages is None:
+        messages = cached_messages(session_id)
     
     # Return template with message history
     return templates.TemplateResponse(
@@ -103,39 +212,31 @@ async def post_message(request: Request, message: str = Form(...)):
     user_id = request.cookies.get("user_id", str(uuid.uuid4()))
     
     # Send message to mem0_agent_endpoint
+    result = None
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "http://localhost:8001/api/mem0-agent",
-                json={
-                    "query": message,
-                    "user_id": user_id,
-                    "session_id": session_id,
-                    "request_id": str(uuid.uuid4())
-                },
-                headers={"Authorization": f"Bearer {os.getenv('API_BEARER_TOKEN', 'mem0-secret-token')}"}
-            )
+        response = await request.app.state.api_client.post(
+            "/api/mem0-agent",
+            json={
+                "query": message,
+                "user_id": user_id,
+                "session_id": session_id,
+                "request_id": str(uuid.uuid4())
+            }
+        )
+        if response.status_code == 200:
+            result = response.json()
     except Exception as e:
         print(f"Error sending message to API: {e}")
     
-    # Get updated message history
-    messages = []
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"http://localhost:8001/api/history?session_id={session_id}",
-                headers={"Authorization": f"Bearer {os.getenv('API_BEARER_TOKEN', 'mem0-secret-token')}"}
-            )
-            if response.status_code == 200:
-                data = response.json()
-                for msg in data:
-                    msg_data = msg["message"]
-                    messages.append({
-                        "type": "user" if msg_data["type"] == "human" else "ai",
-                        "content": msg_data["content"]
-                    })
-    except Exception as e:
-        print(f"Error fetching message history: {e}")
+    # Read the rows after the local copy's cursor rather than merging the
+    # returned turn: other tabs may have written messages before it
+    messages = await load_history(request.app.state.api_client, session_id)
+    if messages is None:
+        messages = cached_messages(session_id)
+        if result and result.get("message"):
+            # Show the turn anyway, but keep it out of the local copy so the
+            # next read picks it up in order
+            messages += [{"type": "user", "content": message}, {"type": "ai", "content": result["message"]}]
     
     # Add the new messages if history API failed
     if not messages:
@@ -156,6 +257,41 @@ async def post_message(request: Request, message: str = Form(...)):
     
     return response
 
+@app.post("/stream")
+async def stream_message(request: Request, message: str = Form(...)):
+    """Relay the agent's Server-Sent Events so the page can render tokens as they arrive."""
+    session_id = request.cookies.get("session_id", str(uuid.uuid4()))
+    user_id = request.cookies.get("user_id", str(uuid.uuid4()))
+
+    async def relay():
+        try:
+            async with request.app.state.api_client.stream(
+                "POST",
+                "/api/mem0-agent/stream",
+                json={
+                    "query": message,
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "request_id": str(uuid.uuid4())
+                },
+                # Tokens may pause for a while mid-reply; only connecting is bounded
+                timeout=httpx.Timeout(None, connect=float(os.getenv("API_CONNECT_TIMEOUT", "5")))
+            ) as upstream:
+                async for chunk in upstream.aiter_raw():
+                    yield chunk
+        except Exception as e:
+            print(f"Error streaming message from API: {e}")
+            yield 'event: error\ndata: {"detail": "Could not reach the agent API."}\n\n'.encode()
+
+    response = StreamingResponse(
+        relay(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    response.set_cookie(key="session_id", value=session_id)
+    response.set_cookie(key="user_id", value=user_id)
+    return response
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8080) 
\ No newline at end of file
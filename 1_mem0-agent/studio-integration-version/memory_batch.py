@@ -0,0 +1,161 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from resilience import CircuitOpenError
+
+
+@dataclass
+class ItemResult:
+    """Outcome of one (user_id, messages) item of a batch."""
+    index: int
+    user_id: str
+    status: str = "pending"  # added, failed
+    memories: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class ExtractionGroup:
+    """Consecutive items of one user that go through a single mem0 ``add``."""
+    user_id: str
+    indexes: List[int] = field(default_factory=list)
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    chars: int = 0
+
+
+def group_items(items: List[Any], max_messages: int = 20, max_chars: int = 12000) -> List[List[ExtractionGroup]]:
+    """Group items per user, in submission order, into extraction calls of bounded size.
+
+    Returns one list of groups per user; a user's groups must run in order.
+    """
+    by_user: Dict[str, List[ExtractionGroup]] = {}
+    for index, item in enumerate(items):
+        size = sum(len(m.get("content") or "") for m in item.messages)
+        groups = by_user.setdefault(item.user_id, [])
+        group = groups[-1] if groups else None
+        if group is None or (group.messages and (
+            len(group.messages) + len(item.messages) > max_messages or group.chars + size > max_chars
+        )):
+            group = ExtractionGroup(user_id=item.user_id)
+            groups.append(group)
+        group.indexes.append(index)
+        group.messages.extend(item.messages)
+        group.chars += size
+    return list(by_user.values())
+
+
+def rate_limit_delay(error: Exception) -> Optional[float]:
+    """Seconds to back off if ``error`` is an OpenAI rate limit, else None."""
+    if getattr(error, "status_code", None) != 429 and type(error).__name__ != "RateLimitError":
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[header]) * scale
+        except (KeyError, TypeError, ValueError):
+            continue
+    return 0.0
+
+
+class RateLimitGate:
+    """Shared pause for all extraction workers after the API reports a rate limit.
+
+    One 429 means every concurrent call is about to hit it too, so instead of
+    each worker retrying on its own schedule they all wait until the
+    cooldown has passed.
+    """
+
+    def __init__(self, min_cooldown: float = 1.0, max_cooldown: float = 60.0):
+        self.min_cooldown = min_cooldown
+        self.max_cooldown = max_cooldown
+        self._resume_at = 0.0
+        self.trips = 0
+
+    def trip(self, retry_after: Optional[float], attempt: int):
+        backoff = self.min_cooldown * (2 ** attempt) * (0.5 + random.random())
+        self.pause(min(max(retry_after or 0.0, backoff), self.max_cooldown))
+        self.trips += 1
+
+    def pause(self, seconds: float):
+        """Hold every worker back for ``seconds``, without counting a trip."""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    async def wait(self):
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class MemoryBatchIngestor:
+    """Backfills mem0 from many (user_id, messages) items with few LLM calls.
+
+    A user's items are merged into as few ``add`` calls as the size limits
+    allow, since each call costs one fact-extraction and one update LLM
+    request however many turns it covers. Users run concurrently, at most
+    ``concurrency`` calls at a time, and each user's calls run in order.
+    Rate-limited calls wait on a shared RateLimitGate and are retried;
+    calls rejected by an open circuit breaker wait for it on the same gate
+    and are retried without using up an attempt, since nothing was sent.
+    Other errors fail just the items of that call.
+    """
+
+    def __init__(
+        self,
+        add: Callable[[List[Dict[str, str]], str], Awaitable[Any]],
+        concurrency: int = 4,
+        max_messages: int = 20,
+        max_chars: int = 12000,
+        max_retries: int = 5,
+        gate: Optional[RateLimitGate] = None,
+    ):
+        self.add = add
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.max_retries = max_retries
+        self.gate = gate or RateLimitGate()
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def _run_group(self, group: ExtractionGroup, results: List[ItemResult]):
+        attempt = 0
+        while True:
+            await self.gate.wait()
+            async with self._slots:
+                try:
+                    added = await self.add(group.messages, group.user_id)
+                except CircuitOpenError as e:
+                    self.gate.pause(e.retry_after)
+                    continue
+                except Exception as e:
+                    for index in group.indexes:
+                        results[index].attempts += 1
+                    retry_after = rate_limit_delay(e)
+                    if retry_after is None or attempt == self.max_retries:
+                        for index in group.indexes:
+                            results[index].status = "failed"
+                            results[index].error = str(e)
+                        return
+                    self.gate.trip(retry_after, attempt)
+                    attempt += 1
+                    continue
+                memories = len((added or {}).get("results") or []) if isinstance(added, dict) else 0
+                for position, index in enumerate(group.indexes):
+                    results[index].attempts += 1
+                    results[index].status = "added"
+                    # The memories come from the whole group; count them once, on its first item
+                    results[index].memories = memories if position == 0 else 0
+                return
+
+    async def _run_user(self, groups: List[ExtractionGroup], results: List[ItemResult]):
+        for group in groups:
+            await self._run_group(group, results)
+
+    async def ingest(self, items: List[Any]) -> List[ItemResult]:
+        """Extract memories for every item; returns one result per item, in order."""
+        results = [ItemResult(index=i, user_id=item.user_id) for i, item in enumerate(items)]
+        users = group_items(items, self.max_messages, self.max_chars)
+        await asyncio.gather(*(self._run_user(groups, results) for groups in users))
+        return results
@@ -0,0 +1,158 @@
+import copy
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, Unicode forms, whitespace and trailing punctuation so near-identical queries share a key."""
+    query = unicodedata.normalize("NFKC", query).casefold()
+    return " ".join(query.split()).rstrip(" ?!.,;:")
+
+
+class CachedMemory:
+    """Wraps a mem0 ``Memory`` with an LRU+TTL cache in front of ``search``.
+
+    Results are keyed by (user_id, normalized query, limit), so a repeated
+    question skips both the embedding call and the pgvector query. Anything
+    that writes memories (``add``, ``clear``, ``delete_all``...) bumps the
+    user's generation, which makes that user's cached results stale at once;
+    writes that can't be tied to a user invalidate every entry. All other
+    attributes are passed through to the wrapped instance.
+
+    Generations live in this process unless ``generations_path`` names a
+    SQLite file (WAL mode) shared by the worker processes on the host; then
+    a write in one worker invalidates the cached results of all of them.
+    Workers on other hosts still serve results up to ``ttl`` seconds old.
+    """
+
+    def __init__(self, memory: Any, max_entries: int = 1024, ttl: float = 300.0, generations_path: Optional[str] = None):
+        self._memory = memory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple[int, ...], Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if generations_path:
+            self._db = sqlite3.connect(generations_path, timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS generations (user_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+            self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _generation(self, user_id: str) -> Optional[Tuple[int, ...]]:
+        """The user's cache generation; None if the shared generations can't be read."""
+        local = (self._epoch, self._generations.get(user_id, 0))
+        if self._db is None:
+            return local
+        try:
+            # "*" is the epoch bumped by writes that can't be tied to a user
+            rows = dict(self._db.execute(
+                "SELECT user_id, generation FROM generations WHERE user_id IN (?, '*')", (user_id,)
+            ).fetchall())
+        except sqlite3.Error as e:
+            print(f"Failed to read memory cache generations: {str(e)}")
+            return None
+        return local + (rows.get("*", 0), rows.get(user_id, 0))
+
+    def search(self, query: str, user_id: Optional[str] = None, limit: int = 100, **kwargs) -> Any:
+        # Only plain per-user lookups are cached; agent/run scoped or filtered searches pass through
+        if user_id is None or kwargs:
+            return self._memory.search(query=query, user_id=user_id, limit=limit, **kwargs)
+
+        key = (user_id, normalize_query(query), limit)
+        now = time.monotonic()
+        with self._lock:
+            generation = self._generation(user_id)
+            entry = self._entries.get(key)
+            if generation is not None and entry is not None and entry[1] == generation and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[2])
+            self.misses += 1
+
+        result = self._memory.search(query=query, user_id=user_id, limit=limit)
+
+        with self._lock:
+            # Don't cache a result that raced with a write for the same user
+            if generation is not None and self._generation(user_id) == generation:
+                self._entries[key] = (now, generation, copy.deepcopy(result))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop cached results for one user, or for everyone when user_id is None."""
+        with self._lock:
+            if user_id is None:
+                self._epoch += 1
+            else:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT INTO generations (user_id, generation) VALUES (?, 1) "
+                        "ON CONFLICT(user_id) DO UPDATE SET generation = generation + 1",
+                        ("*" if user_id is None else user_id,)
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Failed to share memory cache invalidation: {str(e)}")
+
+    def add(self, messages: Any, user_id: Optional[str] = None, **kwargs) -> Any:
+        try:
+            return self._memory.add(messages, user_id=user_id, **kwargs)
+        finally:
+            self.invalidate(user_id)
+
+    def clear(self, user_id: Optional[str] = None) -> Any:
+        # mem0's Memory calls this delete_all; fallback stores may implement clear directly
+        clear = getattr(self._memory, "clear", None) or self._memory.delete_all
+        try:
+            return clear(user_id=user_id)
+        finally:
+            self.invalidate(user_id)
+
+    def delete_all(self, user_id: Optional[str] = None, **kwargs) -> Any:
+        try:
+            return self._memory.delete_all(user_id=user_id, **kwargs)
+        finally:
+            self.invalidate(None if kwargs else user_id)
+
+    def delete(self, *args, **kwargs) -> Any:
+        try:
+            return self._memory.delete(*args, **kwargs)
+        finally:
+            self.invalidate()
+
+    def update(self, *args, **kwargs) -> Any:
+        try:
+            return self._memory.update(*args, **kwargs)
+        finally:
+            self.invalidate()
+
+    def reset(self) -> Any:
+        try:
+            return self._memory.reset()
+        finally:
+            self.invalidate()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._memory, name)
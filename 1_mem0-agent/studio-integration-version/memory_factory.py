@@ -0,0 +1,114 @@
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from mem0 import Memory
+from mem0.utils.factory import VectorStoreFactory
+
+from embedding_cache import CachedEmbedder, EmbeddingCache
+
+
+class _LocalStoreMemory(Memory):
+    """Memory on a LocalVectorStore, which mem0's VectorStoreFactory can't rebuild."""
+
+    def reset(self):
+        # Memory.reset would recreate the store from the placeholder qdrant config
+        self.vector_store.reset()
+        # SQLiteManager.reset takes its own lock twice and hangs (mem0 0.1.65),
+        # so the history is emptied here
+        with self.db._lock, self.db.connection:
+            self.db.connection.execute("DELETE FROM history")
+
+
+@contextmanager
+def _provide_vector_store(store: Any):
+    """Make mem0's VectorStoreFactory hand out ``store`` while a Memory is built."""
+    original = VectorStoreFactory.__dict__["create"]
+    VectorStoreFactory.create = classmethod(lambda cls, provider_name, config: store)
+    try:
+        yield
+    finally:
+        VectorStoreFactory.create = original
+
+
+@contextmanager
+def _provide_vecs_client(client: Any):
+    """Make ``vecs.create_client`` return ``client`` while a Memory is built."""
+    import vecs
+
+    original = vecs.create_client
+    vecs.create_client = lambda connection_string: client
+    try:
+        yield
+    finally:
+        vecs.create_client = original
+
+
+def build_memory(config: Dict[str, Any]) -> Memory:
+    """Create a mem0 Memory from ``config``, honouring this project's extra keys.
+
+    ``Memory.from_config`` only knows mem0's own sections, so extension keys are
+    removed before the call and applied to the built instance:
+
+    - ``embedding_cache``: ``{"path": ..., "memory_items": ...}`` wraps the
+      embedder in a CachedEmbedder backed by a local SQLite file.
+    - ``vector_store.provider == "local"``: stores memories in an embedded
+      LocalVectorStore; its ``config`` takes the LocalVectorStore arguments.
+      mem0 rejects unknown providers, so it is handed to Memory in place of a
+      placeholder qdrant store that is never created; ``reset`` clears the
+      local store instead of building one from the placeholder.
+    - ``db_pool``: a DatabasePool whose bounded vecs client the supabase
+      provider uses instead of opening its own unbounded engine.
+    - ``embedding_batch``: ``{"max_batch": ..., "workers": ...}`` sends
+      concurrent embedding calls as one OpenAI request and prefetches the
+      embeddings of extracted facts in one batch (OpenAI embedder only).
+    """
+    config = dict(config)
+    cache_config = config.pop("embedding_cache", None)
+    batch_config = config.pop("embedding_batch", None)
+    db_pool = config.pop("db_pool", None)
+
+    vector_store = config.get("vector_store") or {}
+    if vector_store.get("provider") == "local":
+        from local_vector_store import LocalVectorStore
+
+        store_config = dict(vector_store.get("config") or {})
+        store = LocalVectorStore(**store_config)
+        config["vector_store"] = {
+            "provider": "qdrant",
+            "config": {
+                "collection_name": store.collection_name,
+                "embedding_model_dims": store.dims
+            }
+        }
+        with _provide_vector_store(store):
+            memory = _LocalStoreMemory.from_config(config)
+    elif db_pool is not None and vector_store.get("provider") == "supabase":
+        with _provide_vecs_client(db_pool.vecs_client()):
+            memory = Memory.from_config(config)
+    else:
+        memory = Memory.from_config(config)
+
+    batching = batch_config is not None and hasattr(memory.embedding_model, "client")
+    if batching:
+        from embedding_batch import BatchingEmbedder
+
+        memory.embedding_model = BatchingEmbedder(
+            memory.embedding_model,
+            max_batch=batch_config.get("max_batch", 64),
+            workers=batch_config.get("workers", 2)
+        )
+
+    if cache_config is not None:
+        cache = EmbeddingCache(
+            path=cache_config.get("path", "embedding_cache.sqlite3"),
+            memory_items=cache_config.get("memory_items", 10000)
+        )
+        memory.embedding_model = CachedEmbedder(memory.embedding_model, cache)
+
+    if batching:
+        from embedding_batch import FactPrefetchLLM
+
+        # Prefetch through the outermost embedder so cached texts are skipped
+        memory.llm = FactPrefetchLLM(memory.llm, memory.embedding_model)
+
+    return memory
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import zlib
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from resilience import CircuitOpenError
+
+
+@dataclass
+class MemoryJob:
+    """One user/assistant turn waiting to be added to mem0."""
+    user_id: str
+    messages: List[Dict[str, str]]
+
+
+class MemoryQueue:
+    """Background worker pool that runs memory extraction off the request path.
+
+    Jobs are sharded by user_id so each user's turns are always handled by the
+    same worker, in the order they were submitted. Every shard has a bounded
+    queue: when it is full, ``submit`` waits for room (backpressure) instead of
+    growing without limit. On shutdown the queue is drained; anything that
+    could not be processed in time, including the jobs still running, is
+    spooled to disk and replayed on the next start. Worker processes share
+    the spool: each claims it with an atomic rename, so a job is replayed by
+    one process only. A job rejected by an open circuit breaker was never
+    run, so its worker waits for the breaker and runs it again rather than
+    dropping it.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[MemoryJob], Awaitable[None]],
+        workers: int = 4,
+        max_depth: int = 1000,
+        spool_path: Optional[str] = None,
+    ):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.spool_path = spool_path
+        self._shards: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        # The job each shard's worker is handling, spooled if stop() cuts it short
+        self._active: List[Optional[MemoryJob]] = []
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.circuit_waits = 0
+
+    def _shard_for(self, user_id: str) -> asyncio.Queue:
+        return self._shards[zlib.crc32(user_id.encode("utf-8")) % self.workers]
+
+    async def start(self):
+        """Start the workers and replay any jobs spooled by a previous run."""
+        self._shards = [asyncio.Queue(maxsize=self.max_depth) for _ in range(self.workers)]
+        self._active = [None] * self.workers
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        for job in self._load_spool():
+            await self.submit(job)
+
+    async def submit(self, job: MemoryJob):
+        """Enqueue a job, waiting for room if the user's shard is full."""
+        await self._shard_for(job.user_id).put(job)
+        self.submitted += 1
+
+    def depth(self) -> int:
+        return sum(shard.qsize() for shard in self._shards)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth(),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "circuit_waits": self.circuit_waits,
+        }
+
+    async def _worker(self, index: int):
+        shard = self._shards[index]
+        while True:
+            job = await shard.get()
+            self._active[index] = job
+            try:
+                while True:
+                    try:
+                        await self.handler(job)
+                        break
+                    except CircuitOpenError as e:
+                        # Still the active job, so it is spooled if stop() comes first
+                        self.circuit_waits += 1
+                        await asyncio.sleep(e.retry_after)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Error adding memory for user {job.user_id}: {str(e)}")
+            finally:
+                self._active[index] = None
+                shard.task_done()
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued job has been handled. Returns False on timeout."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(shard.join() for shard in self._shards)),
+                timeout
+            )
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self, timeout: Optional[float] = 30.0):
+        """Drain the queue, stop the workers and spool whatever is left over."""
+        if not await self.flush(timeout):
+            print(f"Memory queue flush timed out with {self.depth()} jobs pending")
+        # Cancelled jobs are not recorded as running any more, so take them first
+        interrupted = list(self._active)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        leftover = []
+        for job, shard in zip(interrupted, self._shards):
+            # An interrupted job goes ahead of its shard's queued jobs to keep each user's order
+            if job is not None:
+                leftover.append(job)
+            while not shard.empty():
+                leftover.append(shard.get_nowait())
+        self._save_spool(leftover)
+        self._tasks = []
+
+    def _save_spool(self, jobs: List[MemoryJob]):
+        if not jobs:
+            return
+        if not self.spool_path:
+            print(f"Dropping {len(jobs)} pending memory jobs (no spool path configured)")
+            return
+        # One append per process, so lines of workers stopping together don't interleave
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(asdict(job)) + "\n" for job in jobs))
+        print(f"Spooled {len(jobs)} pending memory jobs to {self.spool_path}")
+
+    def _load_spool(self) -> List[MemoryJob]:
+        if not self.spool_path:
+            return []
+        # The rename succeeds for exactly one of the workers starting together
+        claimed = f"{self.spool_path}.{os.getpid()}.replay"
+        try:
+            os.rename(self.spool_path, claimed)
+        except FileNotFoundError:
+            return []
+        jobs = []
+        with open(claimed, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    jobs.append(MemoryJob(**json.loads(line)))
+        os.remove(claimed)
+        print(f"Replaying {len(jobs)} spooled memory jobs")
+        return jobs
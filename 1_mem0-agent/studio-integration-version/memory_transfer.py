@@ -0,0 +1,335 @@
+"""Bulk import/export of mem0 memories without re-running LLM extraction.
+
+Usage:
+    python memory_transfer.py export vecs:memories_new backup.jsonl
+    python memory_transfer.py export vecs:memories_new backup.parquet --user-id USER
+    python memory_transfer.py import backup.jsonl vecs:memories_api_new
+    python memory_transfer.py copy vecs:memories_new vecs:memories_api_new --user-id USER
+    python memory_transfer.py copy vecs:memories_api_new local:memories_api_new
+
+Stores are "vecs:<collection>" (the Supabase collections, via DATABASE_URL) or
+"local:<collection>" (a LocalVectorStore under --local-path). Files are JSONL
+or Parquet, chosen by extension. Each record keeps its id, its embedding as
+raw little-endian float32 (base64 in JSONL, binary in Parquet) and its mem0
+payload, so restored memories are searchable as they were.
+
+Records move in batches of --batch-size and writes are idempotent upserts by
+id. Progress is saved to <destination>.checkpoint.json after every batch; run
+the same command again to resume, or pass --restart to start over. Parquet
+exports cannot be appended to and always start over.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import psycopg2
+from dotenv import load_dotenv
+
+# (id, float32 vector, mem0 payload)
+Record = Tuple[str, np.ndarray, Dict[str, Any]]
+
+
+def encode_vector(vector: Any) -> str:
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def decode_vector(data: Any) -> np.ndarray:
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+    return np.frombuffer(data, dtype="<f4")
+
+
+class Checkpoint:
+    """Progress of one transfer, rewritten atomically after every batch."""
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self.state: Dict[str, Any] = {}
+        if restart and os.path.exists(path):
+            os.remove(path)
+        elif os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.state.get(key, default)
+
+    def save(self, **state):
+        self.state.update(state)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def finish(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# Stores
+
+def parse_store(spec: str) -> Tuple[str, str]:
+    kind, _, name = spec.partition(":")
+    if kind not in ("vecs", "local") or not name:
+        raise ValueError(f"Unknown store {spec!r}; use vecs:<collection> or local:<collection>")
+    return kind, name
+
+
+def iter_vecs(
+    conn_str: str,
+    collection: str,
+    batch_size: int = 500,
+    user_id: Optional[str] = None,
+    after_id: Optional[str] = None,
+) -> Iterator[List[Record]]:
+    """Read a vecs collection in id order, one keyset-paginated query per batch."""
+    conn = psycopg2.connect(conn_str)
+    conn.autocommit = True
+    try:
+        while True:
+            query = f'SELECT id, vec::real[], metadata FROM vecs."{collection}" WHERE id > %s'
+            params: List[Any] = [after_id or ""]
+            if user_id is not None:
+                query += " AND metadata->>'user_id' = %s"
+                params.append(user_id)
+            query += " ORDER BY id LIMIT %s"
+            params.append(batch_size)
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                rows = cur.fetchall()
+            if not rows:
+                return
+            yield [(row[0], np.asarray(row[1], dtype=np.float32), row[2] or {}) for row in rows]
+            after_id = rows[-1][0]
+    finally:
+        conn.close()
+
+
+class VecsWriter:
+    def __init__(self, conn_str: str, collection: str):
+        import vecs
+
+        self.client = vecs.create_client(conn_str)
+        self.name = collection
+        self.collection = None
+
+    def write(self, records: List[Record]):
+        if self.collection is None:
+            self.collection = self.client.get_or_create_collection(name=self.name, dimension=len(records[0][1]))
+        self.collection.upsert(records=[(i, vector, payload) for i, vector, payload in records])
+
+    def close(self):
+        self.client.disconnect()
+
+
+class LocalWriter:
+    def __init__(self, path: str, collection: str):
+        self.path = path
+        self.name = collection
+        self.store = None
+
+    def write(self, records: List[Record]):
+        if self.store is None:
+            from local_vector_store import LocalVectorStore
+
+            self.store = LocalVectorStore(path=self.path, collection_name=self.name, embedding_model_dims=len(records[0][1]))
+        self.store.insert(
+            vectors=[vector for _, vector, _ in records],
+            payloads=[payload for _, _, payload in records],
+            ids=[i for i, _, _ in records]
+        )
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+
+# Files
+
+def iter_jsonl(path: str, batch_size: int = 500, skip: int = 0) -> Iterator[List[Record]]:
+    batch: List[Record] = []
+    seen = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            seen += 1
+            if seen <= skip:
+                continue
+            item = json.loads(line)
+            batch.append((item["id"], decode_vector(item["vector"]), item["payload"]))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def iter_parquet(path: str, batch_size: int = 500, skip: int = 0) -> Iterator[List[Record]]:
+    import pyarrow.parquet as pq
+
+    seen = 0
+    for table in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        columns = table.to_pydict()
+        records = [
+            (i, decode_vector(vector), json.loads(payload))
+            for i, vector, payload in zip(columns["id"], columns["vector"], columns["payload"])
+        ]
+        start = max(skip - seen, 0)
+        seen += len(records)
+        if start < len(records):
+            yield records[start:]
+
+
+class JsonlWriter:
+    def __init__(self, path: str, offset: int = 0):
+        # Drop anything written after the last checkpoint before appending again
+        self.file = open(path, "r+b" if offset and os.path.exists(path) else "wb")
+        self.file.seek(offset)
+        self.file.truncate()
+
+    def write(self, records: List[Record]):
+        lines = [
+            json.dumps({"id": i, "vector": encode_vector(vector), "payload": payload}, ensure_ascii=False)
+            for i, vector, payload in records
+        ]
+        self.file.write(("\n".join(lines) + "\n").encode("utf-8"))
+        self.file.flush()
+
+    def offset(self) -> int:
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path: str):
+        import pyarrow as pa
+
+        self.path = path
+        self.schema = pa.schema([("id", pa.string()), ("vector", pa.binary()), ("payload", pa.string())])
+        self.writer = None
+
+    def write(self, records: List[Record]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, self.schema, compression="zstd")
+        # One row group per batch, so readers can stream the file back in chunks
+        self.writer.write_table(pa.table({
+            "id": [i for i, _, _ in records],
+            "vector": [np.asarray(vector, dtype="<f4").tobytes() for _, vector, _ in records],
+            "payload": [json.dumps(payload, ensure_ascii=False) for _, _, payload in records],
+        }, schema=self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def is_parquet(path: str) -> bool:
+    return path.endswith((".parquet", ".pq"))
+
+
+# Transfers
+
+def open_source(spec: str, batch_size: int, user_id: Optional[str], after_id: Optional[str],
+                conn_str: Optional[str], local_path: str) -> Iterator[List[Record]]:
+    kind, name = parse_store(spec)
+    if kind == "vecs":
+        return iter_vecs(conn_str, name, batch_size, user_id, after_id)
+    from local_vector_store import LocalVectorStore
+
+    store = LocalVectorStore(path=local_path, collection_name=name, embedding_model_dims=None)
+    return store.iter_records(batch_size, user_id, after_id)
+
+
+def open_store_writer(spec: str, conn_str: Optional[str], local_path: str):
+    kind, name = parse_store(spec)
+    return VecsWriter(conn_str, name) if kind == "vecs" else LocalWriter(local_path, name)
+
+
+def run_transfer(batches: Iterator[List[Record]], writer, checkpoint: Checkpoint, count: int = 0) -> int:
+    """Write every batch, saving progress after each one; returns the records moved."""
+    try:
+        for batch in batches:
+            writer.write(batch)
+            count += len(batch)
+            state = {"count": count, "last_id": batch[-1][0]}
+            if hasattr(writer, "offset"):
+                state["offset"] = writer.offset()
+            checkpoint.save(**state)
+            print(f"{count} memories transferred")
+    finally:
+        writer.close()
+    checkpoint.finish()
+    return count
+
+
+def export_memories(source: str, path: str, batch_size: int = 500, user_id: Optional[str] = None,
+                    conn_str: Optional[str] = None, local_path: str = "local_vector_store",
+                    restart: bool = False) -> int:
+    # A checkpoint is only useful while the partial JSONL file it describes is still there
+    checkpoint = Checkpoint(f"{path}.checkpoint.json", restart=restart or is_parquet(path) or not os.path.exists(path))
+    writer = ParquetWriter(path) if is_parquet(path) else JsonlWriter(path, checkpoint.get("offset", 0))
+    batches = open_source(source, batch_size, user_id, checkpoint.get("last_id"), conn_str, local_path)
+    return run_transfer(batches, writer, checkpoint, checkpoint.get("count", 0))
+
+
+def import_memories(path: str, target: str, batch_size: int = 500, conn_str: Optional[str] = None,
+                    local_path: str = "local_vector_store", restart: bool = False) -> int:
+    checkpoint = Checkpoint(f"{path}.{target.replace(':', '_')}.checkpoint.json", restart=restart)
+    skip = checkpoint.get("count", 0)
+    batches = (iter_parquet if is_parquet(path) else iter_jsonl)(path, batch_size, skip)
+    return run_transfer(batches, open_store_writer(target, conn_str, local_path), checkpoint, skip)
+
+
+def copy_memories(source: str, target: str, batch_size: int = 500, user_id: Optional[str] = None,
+                  conn_str: Optional[str] = None, local_path: str = "local_vector_store",
+                  restart: bool = False) -> int:
+    name = f"{source}-{target}" + (f"-{user_id}" if user_id else "")
+    checkpoint = Checkpoint(f"{name.replace(':', '_').replace('/', '_')}.checkpoint.json", restart=restart)
+    batches = open_source(source, batch_size, user_id, checkpoint.get("last_id"), conn_str, local_path)
+    return run_transfer(batches, open_store_writer(target, conn_str, local_path), checkpoint, checkpoint.get("count", 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "import", "copy"])
+    parser.add_argument("source")
+    parser.add_argument("destination")
+    parser.add_argument("--user-id", default=None, help="only this user's memories (export and copy)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--database-url", default=None, help="defaults to DATABASE_URL")
+    parser.add_argument("--local-path", default=None, help="defaults to LOCAL_VECTOR_STORE_PATH")
+    parser.add_argument("--restart", action="store_true", help="ignore a saved checkpoint")
+    args = parser.parse_args()
+
+    load_dotenv()
+    options = {
+        "batch_size": args.batch_size,
+        "conn_str": args.database_url or os.getenv("DATABASE_URL"),
+        "local_path": args.local_path or os.getenv("LOCAL_VECTOR_STORE_PATH", "local_vector_store"),
+        "restart": args.restart,
+    }
+    if args.command == "export":
+        count = export_memories(args.source, args.destination, user_id=args.user_id, **options)
+    elif args.command == "import":
+        count = import_memories(args.source, args.destination, **options)
+    else:
+        count = copy_memories(args.source, args.destination, user_id=args.user_id, **options)
+    print(f"Done: {count} memories")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Transfer failed: {str(e)}")
+        sys.exit(1)
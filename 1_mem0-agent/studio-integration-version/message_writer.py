@@ -0,0 +1,170 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from resilience import CircuitOpenError
+
+
+class AlreadyStoredError(Exception):
+    """Raised by ``enqueue`` when a row with the same idempotency key was stored earlier."""
+
+    def __init__(self, row: Dict[str, Any]):
+        super().__init__(f"A message with idempotency key {row.get('idempotency_key')} is already stored")
+        self.row = row
+
+
+class MessageBatcher:
+    """Write-behind batcher for rows of the ``messages`` table.
+
+    Rows from all concurrent requests are collected and written as one
+    multi-row upsert once ``max_batch`` rows are pending or ``max_delay``
+    seconds have passed since the first one. A single flusher writes batches
+    in enqueue order, and a failed batch is retried before anything queued
+    after it, so every session's messages land in order. Retries are safe
+    because each row carries an ``idempotency_key`` and duplicates are ignored.
+    While the database's circuit breaker is open the batch waits for it to
+    let a call through again, which does not use up a retry.
+    ``enqueue`` returns once its row is written, and raises if the row's
+    batch was given up on, so a caller never reports a message as saved
+    that isn't. ``write_rows`` may return the idempotency keys of the rows
+    it actually inserted; ``enqueue`` of any other row of the batch raises
+    AlreadyStoredError, since an earlier write holds that key.
+
+    Rows get a client-side ``created_at`` that is strictly increasing per
+    process, since rows of one multi-row insert would otherwise share the
+    transaction timestamp.
+    """
+
+    def __init__(
+        self,
+        write_rows: Callable[[List[Dict[str, Any]]], Awaitable[Optional[Iterable[str]]]],
+        max_batch: int = 100,
+        max_delay: float = 0.05,
+        max_pending: int = 10000,
+        max_retries: int = 3,
+        retry_backoff: float = 0.2,
+    ):
+        self.write_rows = write_rows
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # Each row with the future its enqueue() call waits on
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._wakeup = asyncio.Event()
+        self._written = asyncio.Condition()
+        self._enqueued_count = 0
+        self._written_count = 0
+        self._last_created_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.failed_rows = 0
+        self.duplicate_rows = 0
+        self.circuit_waits = 0
+
+    def _next_created_at(self) -> str:
+        now = datetime.now(timezone.utc)
+        if self._last_created_at is not None and now <= self._last_created_at:
+            now = self._last_created_at + timedelta(microseconds=1)
+        self._last_created_at = now
+        return now.isoformat()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def enqueue(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Write a row with the next batch and return it with its ``created_at`` filled in.
+
+        Raises the last write error if the batch failed after all retries, or
+        AlreadyStoredError if the row's idempotency key was taken.
+        """
+        if len(self._pending) >= self.max_pending:
+            # Backpressure: let the flusher catch up before accepting more rows
+            await self.flush()
+        row = dict(row, created_at=row.get("created_at") or self._next_created_at())
+        written = asyncio.get_running_loop().create_future()
+        self._pending.append((row, written))
+        self._enqueued_count += 1
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+        elif len(self._pending) == 1:
+            asyncio.get_running_loop().call_later(self.max_delay, self._wakeup.set)
+        # A caller that gives up cancels only its wait; the row is still written
+        await written
+        return row
+
+    async def flush(self):
+        """Wait until every row queued so far has been written (or given up on)."""
+        target = self._enqueued_count
+        self._wakeup.set()
+        async with self._written:
+            await self._written.wait_for(lambda: self._written_count >= target)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:len(batch)]
+                error, inserted = await self._write([row for row, _ in batch])
+                for row, written in batch:
+                    if written.done():
+                        continue
+                    if error is None and (inserted is None or row.get("idempotency_key") in inserted):
+                        written.set_result(None)
+                        continue
+                    if error is None:
+                        self.duplicate_rows += 1
+                    written.set_exception(error or AlreadyStoredError(row))
+                    # Nobody may be waiting any more; don't log "exception never retrieved"
+                    written.exception()
+                async with self._written:
+                    self._written_count += len(batch)
+                    self._written.notify_all()
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> Tuple[Optional[Exception], Optional[Set[str]]]:
+        """Write a batch with retries.
+
+        Returns the last error if it was given up on, and the idempotency
+        keys of the inserted rows if ``write_rows`` reports them.
+        """
+        attempt = 0
+        while True:
+            try:
+                inserted = await self.write_rows(batch)
+                self.batches += 1
+                return None, None if inserted is None else set(inserted)
+            except CircuitOpenError as e:
+                # Nothing was sent; the breaker's next trial decides
+                self.circuit_waits += 1
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed_rows += len(batch)
+                    print(f"Failed to store {len(batch)} messages: {str(e)}")
+                    return e, None
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt) * (0.5 + random.random()))
+                attempt += 1
+
+    async def stop(self):
+        """Write everything still pending and stop the flusher."""
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "rows_written": self._written_count - self.failed_rows - self.duplicate_rows,
+            "failed_rows": self.failed_rows,
+            "duplicate_rows": self.duplicate_rows,
+            "circuit_waits": self.circuit_waits,
+        }
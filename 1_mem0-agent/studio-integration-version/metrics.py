@@ -0,0 +1,148 @@
+import os
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory before start-up so every worker's counters and histograms are
+# aggregated on each scrape
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# From a cached lookup (milliseconds) to a slow LLM turn or mem0 add (minutes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+STAGE_SECONDS = Histogram(
+    "mem0_agent_stage_seconds",
+    "Duration of each stage of an agent turn (the Server-Timing stages)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+BLOCKING_CALL_SECONDS = Histogram(
+    "mem0_agent_blocking_call_seconds",
+    "Run time of blocking Supabase, pgvector and mem0 calls in the thread pool",
+    ["call", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+BLOCKING_CALL_WAIT_SECONDS = Histogram(
+    "mem0_agent_blocking_call_wait_seconds",
+    "Time blocking calls spent queued for a thread",
+    ["call"],
+    buckets=LATENCY_BUCKETS
+)
+BLOCKING_CALL_TIMEOUTS = Counter(
+    "mem0_agent_blocking_call_timeouts_total",
+    "Blocking calls the caller stopped waiting for",
+    ["call"]
+)
+REQUESTS = Counter(
+    "mem0_agent_requests_total",
+    "Agent turns by endpoint and outcome",
+    ["endpoint", "outcome"]
+)
+IN_FLIGHT = Gauge(
+    "mem0_agent_requests_in_flight",
+    "Agent turns being processed",
+    ["endpoint"],
+    multiprocess_mode="livesum"
+)
+LLM_TOKENS = Counter(
+    "mem0_agent_llm_tokens_total",
+    "Tokens used by agent runs",
+    ["kind"]
+)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def observe_blocking_call(call: str, outcome: str, wait: Optional[float], run: Optional[float]):
+    """BlockingExecutor observer: ``outcome`` is ok, error or timeout (no durations)."""
+    if outcome == "timeout":
+        BLOCKING_CALL_TIMEOUTS.labels(call).inc()
+        return
+    BLOCKING_CALL_WAIT_SECONDS.labels(call).observe(wait)
+    BLOCKING_CALL_SECONDS.labels(call, outcome).observe(run)
+
+
+def record_usage(usage: Any):
+    """Count the tokens of a pydantic-ai run's ``usage()``."""
+    for kind in ("request_tokens", "response_tokens"):
+        tokens = getattr(usage, kind, None)
+        if tokens:
+            LLM_TOKENS.labels(kind.replace("_tokens", "")).inc(tokens)
+
+
+@contextmanager
+def in_flight(endpoint: str) -> Iterator[None]:
+    IN_FLIGHT.labels(endpoint).inc()
+    try:
+        yield
+    finally:
+        IN_FLIGHT.labels(endpoint).dec()
+
+
+class StatsCollector:
+    """Exposes the numeric ``stats()`` values of caches, pools and queues as gauges.
+
+    Read on every scrape, so the endpoint keeps a single source of truth for
+    /health and /metrics. In multiprocess mode the values are those of the
+    worker that serves the scrape and carry its pid as a label.
+    """
+
+    def __init__(self, sources: Dict[str, Callable[[], Optional[Dict[str, Any]]]]):
+        self.sources = sources
+
+    def collect(self):
+        labels = ["pid"] if MULTIPROCESS else []
+        values = [str(os.getpid())] if MULTIPROCESS else []
+        for source, stats_of in self.sources.items():
+            try:
+                stats = stats_of() or {}
+            except Exception as e:
+                print(f"Failed to read {source} stats for metrics: {str(e)}")
+                continue
+            for key, value in stats.items():
+                # Nested per-call dicts are covered by the histograms
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                gauge = GaugeMetricFamily(f"mem0_agent_{source}_{key}", f"{key} of the {source}", labels=labels)
+                gauge.add_metric(values, value)
+                yield gauge
+
+
+_stats_collector: Optional[StatsCollector] = None
+
+
+def register_stats(sources: Dict[str, Callable[[], Optional[Dict[str, Any]]]]):
+    global _stats_collector
+    _stats_collector = StatsCollector(sources)
+    if not MULTIPROCESS:
+        REGISTRY.register(_stats_collector)
+
+
+def render() -> bytes:
+    """The /metrics payload."""
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    if _stats_collector is not None:
+        registry.register(_stats_collector)
+    return generate_latest(registry)
+
+
+def mark_worker_stopped():
+    """Drop this worker's live gauges from the multiprocess aggregate."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,131 @@
+"""Apply the versioned SQL migrations in ./migrations to the Supabase database.
+
+Usage:
+    python migrate.py                      # apply pending migrations
+    python migrate.py --dry-run            # print what would run
+    python migrate.py --set hnsw_m=32 --set ann_method=ivfflat
+
+Applied versions are recorded in public.schema_migrations. Migrations may use
+{{name}} placeholders, filled from --set, then MIGRATION_<NAME> environment
+variables, then DEFAULT_PARAMS. A file whose first line is
+"-- migrate: no-transaction" runs in autocommit mode (needed for CREATE INDEX
+CONCURRENTLY); every other file runs in its own transaction.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import psycopg2
+from dotenv import load_dotenv
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+DEFAULT_PARAMS = {
+    "collections": "memories,memories_new,memories_api_new",
+    "ann_method": "hnsw",
+    "hnsw_m": "16",
+    "hnsw_ef_construction": "64",
+    "ivfflat_lists": "100",
+    "ann_rebuild": "false",
+}
+
+# Parameters end up inside SQL text, so only allow plain identifiers and numbers
+SAFE_PARAM = re.compile(r"^[A-Za-z0-9_,.]*$")
+
+
+def resolve_params(overrides: Dict[str, str]) -> Dict[str, str]:
+    params = {}
+    for name, default in DEFAULT_PARAMS.items():
+        params[name] = overrides.get(name, os.getenv(f"MIGRATION_{name.upper()}", default))
+    for name, value in params.items():
+        if not SAFE_PARAM.match(value):
+            raise ValueError(f"Unsafe value for migration parameter {name}: {value!r}")
+    return params
+
+
+def render(sql: str, params: Dict[str, str]) -> str:
+    def substitute(match):
+        name = match.group(1)
+        if name not in params:
+            raise KeyError(f"Unknown migration parameter: {name}")
+        return params[name]
+    return re.sub(r"\{\{\s*(\w+)\s*\}\}", substitute, sql)
+
+
+def load_migrations(params: Dict[str, str]) -> List[Tuple[str, str, str]]:
+    """(version, rendered sql, checksum) for every migration file, in order."""
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        sql = render(path.read_text(encoding="utf-8"), params)
+        migrations.append((path.stem, sql, hashlib.sha256(sql.encode("utf-8")).hexdigest()))
+    return migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="defaults to DATABASE_URL")
+    parser.add_argument("--dry-run", action="store_true", help="print pending migrations without running them")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE", help="migration parameter")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = args.database_url or os.environ["DATABASE_URL"]
+    overrides = dict(item.split("=", 1) for item in args.set)
+    migrations = load_migrations(resolve_params(overrides))
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version text PRIMARY KEY,
+                    checksum text NOT NULL,
+                    applied_at timestamptz NOT NULL DEFAULT now()
+                )
+            """)
+            cur.execute("SELECT version, checksum FROM schema_migrations")
+            applied = dict(cur.fetchall())
+
+        for version, sql, checksum in migrations:
+            if version in applied:
+                if applied[version] != checksum:
+                    print(f"warning: {version} was applied with different contents or parameters")
+                continue
+
+            print(f"Applying {version}")
+            if args.dry_run:
+                print(sql)
+                continue
+
+            if sql.lstrip().startswith("-- migrate: no-transaction"):
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                conn.autocommit = False
+                with conn, conn.cursor() as cur:
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, checksum) VALUES (%s, %s)",
+                        (version, checksum)
+                    )
+            else:
+                with conn, conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, checksum) VALUES (%s, %s)",
+                        (version, checksum)
+                    )
+        print("Database is up to date")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Migration failed: {str(e)}")
+        sys.exit(1)
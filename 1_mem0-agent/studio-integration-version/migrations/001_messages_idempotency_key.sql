@@ -0,0 +1,9 @@
+-- Idempotency key for batched, retried writes of the messages table.
+-- store_message sets it to "<session_id>:<request_id>:<type>", with type
+-- "error" for apologies (a random uuid for messages without a request id),
+-- and upserts with
+-- on_conflict=idempotency_key, so a retried batch never duplicates a turn.
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS idempotency_key text;
+
+CREATE UNIQUE INDEX IF NOT EXISTS messages_idempotency_key_idx
+    ON messages (idempotency_key);
@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- History reads filter by session_id and walk (created_at, id) newest first.
+-- Built CONCURRENTLY so writes to messages are not blocked while it builds.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS messages_session_created_at_idx
+    ON messages (session_id, created_at DESC, id DESC);
@@ -0,0 +1,22 @@
+-- mem0 scopes every search, list and delete to one user through the
+-- metadata column of the vecs collections. Index both the extracted
+-- user_id (equality lookups) and the whole document (@> containment).
+DO $$
+DECLARE
+    c text;
+BEGIN
+    FOREACH c IN ARRAY string_to_array('{{collections}}', ',') LOOP
+        IF to_regclass(format('vecs.%I', c)) IS NULL THEN
+            RAISE NOTICE 'Collection vecs.% does not exist, skipping', c;
+            CONTINUE;
+        END IF;
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS %I ON vecs.%I ((metadata->>''user_id''))',
+            c || '_user_id_idx', c
+        );
+        EXECUTE format(
+            'CREATE INDEX IF NOT EXISTS %I ON vecs.%I USING gin (metadata jsonb_path_ops)',
+            c || '_metadata_gin_idx', c
+        );
+    END LOOP;
+END $$;
@@ -0,0 +1,49 @@
+-- Approximate nearest-neighbour index on the vec column of each collection,
+-- using cosine distance like mem0's searches. {{ann_method}} is hnsw
+-- (m={{hnsw_m}}, ef_construction={{hnsw_ef_construction}}) or ivfflat
+-- (lists={{ivfflat_lists}}). vecs may already have built an index of its own;
+-- it is kept unless ann_rebuild=true.
+DO $$
+DECLARE
+    c text;
+    existing text;
+BEGIN
+    FOREACH c IN ARRAY string_to_array('{{collections}}', ',') LOOP
+        IF to_regclass(format('vecs.%I', c)) IS NULL THEN
+            RAISE NOTICE 'Collection vecs.% does not exist, skipping', c;
+            CONTINUE;
+        END IF;
+
+        FOR existing IN
+            SELECT indexname FROM pg_indexes
+            WHERE schemaname = 'vecs' AND tablename = c
+              AND (indexdef ILIKE '%USING hnsw%' OR indexdef ILIKE '%USING ivfflat%')
+        LOOP
+            IF '{{ann_rebuild}}' = 'true' THEN
+                EXECUTE format('DROP INDEX vecs.%I', existing);
+            ELSE
+                RAISE NOTICE 'vecs.% already has ANN index %, skipping', c, existing;
+            END IF;
+        END LOOP;
+
+        IF EXISTS (
+            SELECT 1 FROM pg_indexes
+            WHERE schemaname = 'vecs' AND tablename = c
+              AND (indexdef ILIKE '%USING hnsw%' OR indexdef ILIKE '%USING ivfflat%')
+        ) THEN
+            CONTINUE;
+        END IF;
+
+        IF '{{ann_method}}' = 'ivfflat' THEN
+            EXECUTE format(
+                'CREATE INDEX %I ON vecs.%I USING ivfflat (vec vector_cosine_ops) WITH (lists = %s)',
+                c || '_vec_ivfflat_idx', c, {{ivfflat_lists}}
+            );
+        ELSE
+            EXECUTE format(
+                'CREATE INDEX %I ON vecs.%I USING hnsw (vec vector_cosine_ops) WITH (m = %s, ef_construction = %s)',
+                c || '_vec_hnsw_idx', c, {{hnsw_m}}, {{hnsw_ef_construction}}
+            );
+        END IF;
+    END LOOP;
+END $$;
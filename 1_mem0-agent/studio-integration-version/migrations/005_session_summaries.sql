@@ -0,0 +1,9 @@
+-- Rolling summary of each session's older messages. The endpoint folds
+-- messages up to covered_until into summary in the background and sends the
+-- summary plus the newer turns to the agent instead of the full history.
+CREATE TABLE IF NOT EXISTS session_summaries (
+    session_id text PRIMARY KEY,
+    summary text NOT NULL,
+    covered_until timestamptz NOT NULL,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
@@ -0,0 +1,366 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Exception type names of the HTTP clients in use (httpx, openai, requests,
+# psycopg) that mean the call never got a proper answer
+TRANSIENT_ERROR_NAMES = ("Timeout", "Connect", "RateLimit", "ServiceUnavailable", "InternalServer", "RemoteProtocol", "ReadError")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open, next try in {retry_after:.1f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether ``error`` says the dependency is slow or down, rather than that the request was bad."""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 429) or status >= 500
+    return any(part in type(error).__name__ for part in TRANSIENT_ERROR_NAMES)
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether ``error`` is a 429: the dependency is up but wants fewer calls."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or "RateLimit" in type(error).__name__
+
+
+class LatencyTracker:
+    """Latencies of the most recent successful calls of one operation."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        """The ``q`` quantile (0-1), or None until ``min_samples`` calls have succeeded."""
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Stops calling a dependency once most recent calls to it failed.
+
+    The breaker opens when at least ``failure_rate`` of the last ``window``
+    calls (and ``min_calls`` or more) failed. While open, calls are rejected
+    at once; every ``cooldown`` seconds one trial call is let through
+    (half-open), and the breaker closes again when a trial succeeds.
+    """
+
+    def __init__(self, name: str, failure_rate: float = 0.5, window: int = 20, min_calls: int = 5, cooldown: float = 10.0):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._open = False
+        self._next_trial = 0.0
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if not self._open:
+            return "closed"
+        return "open" if time.monotonic() < self._next_trial else "half_open"
+
+    def allow(self):
+        """Raise CircuitOpenError unless the call may go ahead."""
+        with self._lock:
+            if not self._open:
+                return
+            now = time.monotonic()
+            if now < self._next_trial:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self._next_trial - now)
+            # Half-open: this call is the trial; the next one waits for another cooldown
+            self._next_trial = now + self.cooldown
+
+    def record(self, ok: bool):
+        with self._lock:
+            if self._open:
+                if ok:
+                    self._open = False
+                    self._outcomes.clear()
+                    print(f"Circuit for {self.name} closed")
+                else:
+                    self._next_trial = time.monotonic() + self.cooldown
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures >= self.failure_rate * len(self._outcomes):
+                self._open = True
+                self._next_trial = time.monotonic() + self.cooldown
+                self.opened += 1
+                print(f"Circuit for {self.name} opened after {failures} of {len(self._outcomes)} calls failed")
+
+
+class RetryBudget:
+    """Caps retries and hedges at ``ratio`` of the calls of the last ``ttl`` seconds.
+
+    ``min_per_second`` keeps a few retries available when traffic is low.
+    Without a budget every slow call turns into several, which is what
+    finishes off a dependency that is already struggling.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, ttl: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.ttl = ttl
+        self._calls: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self._lock = threading.Lock()
+        self.exhausted = 0
+
+    def _prune(self, now: float):
+        for events in (self._calls, self._retries):
+            while events and events[0] < now - self.ttl:
+                events.popleft()
+
+    def record_call(self):
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            self._calls.append(now)
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget; False if it is used up."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            if len(self._retries) >= self.ratio * len(self._calls) + self.min_per_second * self.ttl:
+                self.exhausted += 1
+                return False
+            self._retries.append(now)
+            return True
+
+
+class Dependency:
+    """Circuit breaker, adaptive timeouts, retry budget and hedging for one external dependency.
+
+    Each call gets ``timeout_multiplier`` times the p99 latency of its
+    operation's recent successful calls, clamped to ``min_timeout`` and the
+    call's ``max_timeout``; until enough calls have succeeded it gets
+    ``max_timeout``. Retries (``retry=True``, only for calls that are safe to
+    repeat) back off with full jitter and draw from a shared retry budget.
+    Hedged calls (``hedge=True``, idempotent reads only) start a second
+    attempt once the first has taken longer than the p95 latency and use
+    whichever answers first. Only transient errors are retried and count
+    against the breaker, except rate limits: those are retried but leave the
+    breaker alone, so a client that exceeds its quota (a backfill, say) does
+    not cut everyone else off from a healthy dependency.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_timeout: float = 30.0,
+        min_timeout: float = 1.0,
+        timeout_multiplier: float = 3.0,
+        max_attempts: int = 2,
+        backoff: float = 0.1,
+        max_backoff: float = 2.0,
+        min_samples: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.min_samples = min_samples
+        self.breaker = breaker or CircuitBreaker(name)
+        self.budget = budget or RetryBudget()
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._ceilings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _latency(self, operation: str) -> LatencyTracker:
+        with self._lock:
+            return self._latencies.setdefault(operation, LatencyTracker())
+
+    def timeout_for(self, operation: str, max_timeout: Optional[float] = None) -> float:
+        if max_timeout is not None:
+            self._ceilings[operation] = max_timeout
+        ceiling = self._ceilings.get(operation, self.max_timeout)
+        p99 = self._latency(operation).percentile(0.99, self.min_samples)
+        if p99 is None:
+            return ceiling
+        return min(ceiling, max(self.min_timeout, self.timeout_multiplier * p99))
+
+    def _record(self, operation: str, error: Optional[BaseException], elapsed: float):
+        if error is None:
+            self._latency(operation).observe(elapsed)
+        elif is_rate_limited(error):
+            self.rate_limited += 1
+            return
+        elif is_transient(error):
+            self.failures += 1
+            self.breaker.record(False)
+            return
+        # A non-transient error is still an answer, so the dependency is up
+        self.breaker.record(True)
+
+    def _should_retry(self, error: Exception, attempt: int, retry: bool) -> bool:
+        if not retry or attempt >= self.max_attempts or isinstance(error, CircuitOpenError) or not is_transient(error):
+            return False
+        if not self.budget.try_spend():
+            return False
+        self.retries += 1
+        return True
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    async def _attempt(self, operation: str, fn: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        start = time.perf_counter()
+        try:
+            result = await fn(timeout)
+        except Exception as e:
+            self._record(operation, e, time.perf_counter() - start)
+            raise
+        self._record(operation, None, time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, operation: str, fn: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        delay = self._latency(operation).percentile(0.95, self.min_samples)
+        first = asyncio.ensure_future(self._attempt(operation, fn, timeout))
+        pending = {first}
+        try:
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and self.budget.try_spend():
+                    self.hedges += 1
+                    pending.add(asyncio.ensure_future(self._attempt(operation, fn, timeout)))
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(
+        self,
+        operation: str,
+        fn: Callable[[float], Awaitable[T]],
+        max_timeout: Optional[float] = None,
+        retry: bool = False,
+        hedge: bool = False
+    ) -> T:
+        """Await ``fn(timeout)``, which must give up after ``timeout`` seconds.
+
+        Raises CircuitOpenError right away while the breaker is open.
+        """
+        self.breaker.allow()
+        self.budget.record_call()
+        self.calls += 1
+        attempt = 1
+        while True:
+            timeout = self.timeout_for(operation, max_timeout)
+            try:
+                if hedge:
+                    return await self._hedged(operation, fn, timeout)
+                return await self._attempt(operation, fn, timeout)
+            except Exception as e:
+                if not self._should_retry(e, attempt, retry):
+                    raise
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+            self.breaker.allow()
+
+    def call_sync(
+        self,
+        operation: str,
+        fn: Callable[[float], T],
+        max_timeout: Optional[float] = None,
+        retry: bool = False
+    ) -> T:
+        """Blocking variant of ``call`` (no hedging) for code that runs in threads."""
+        self.breaker.allow()
+        self.budget.record_call()
+        self.calls += 1
+        attempt = 1
+        while True:
+            timeout = self.timeout_for(operation, max_timeout)
+            start = time.perf_counter()
+            try:
+                result = fn(timeout)
+            except Exception as e:
+                self._record(operation, e, time.perf_counter() - start)
+                if not self._should_retry(e, attempt, retry):
+                    raise
+            else:
+                self._record(operation, None, time.perf_counter() - start)
+                return result
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+            self.breaker.allow()
+
+    @asynccontextmanager
+    async def track(self, operation: str) -> AsyncIterator[None]:
+        """Breaker check and outcome recording for calls that can't be wrapped, like streams."""
+        self.breaker.allow()
+        self.calls += 1
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self._record(operation, e, time.perf_counter() - start)
+            raise
+        self._record(operation, None, time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.breaker.state
+        with self._lock:
+            operations = list(self._latencies)
+        return {
+            "state": state,
+            "open": int(state != "closed"),
+            "opened": self.breaker.opened,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "rejected": self.breaker.rejected,
+            "retries": self.retries,
+            "retry_budget_exhausted": self.budget.exhausted,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "timeouts_s": {op: round(self.timeout_for(op), 3) for op in operations},
+        }
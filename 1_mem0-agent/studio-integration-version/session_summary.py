@@ -0,0 +1,144 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse a Postgres/ISO timestamp; Python 3.10 only accepts 3 or 6 fractional digits."""
+    value = value.replace("Z", "+00:00")
+    value = re.sub(r"\.(\d+)", lambda m: "." + m.group(1)[:6].ljust(6, "0"), value, count=1)
+    # Postgres may print the offset as +00
+    value = re.sub(r"([+-]\d{2})$", r"\1:00", value)
+    return datetime.fromisoformat(value)
+
+
+@dataclass
+class SessionSummary:
+    """Running summary of a session's messages up to and including ``covered_until``."""
+    summary: str
+    covered_until: Optional[str]  # created_at of the last summarized message
+    loaded_at: float
+
+
+class SessionSummarizer:
+    """Keeps a rolling summary per session so the prompt stays flat as sessions grow.
+
+    Each turn reports how many stored messages of its history the summary
+    does not cover yet (``note_uncovered``). The count comes from the
+    database rather than from this worker's own writes, so it is the same
+    whichever worker process serves the turn. Once it reaches
+    ``keep_recent + refresh_every``, a background task folds the messages
+    after the summary's cursor, except the newest ``keep_recent``, into the
+    summary and saves it. With that sum below the history window a refresh
+    starts before the window fills up; if one lags, the caller reads the
+    messages between the cursor and the window, so none drops out of both
+    the summary and the prompt.
+
+    Summaries are cached per worker and reloaded after ``max_age`` seconds,
+    like the history cache. Concurrent refreshes of a session are skipped.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+        save: Callable[[str, str, str], Awaitable[Any]],
+        fetch_after: Callable[[str, Optional[str], int], Awaitable[List[Dict[str, Any]]]],
+        summarize: Callable[[str, List[Dict[str, Any]]], Awaitable[str]],
+        keep_recent: int = 4,
+        refresh_every: int = 4,
+        batch_size: int = 100,
+        concurrency: int = 2,
+        max_sessions: int = 10000,
+        max_age: float = 60.0,
+    ):
+        self.load = load
+        self.save = save
+        self.fetch_after = fetch_after
+        self.summarize = summarize
+        self.keep_recent = keep_recent
+        self.refresh_every = refresh_every
+        self.batch_size = batch_size
+        self.max_sessions = max_sessions
+        self.max_age = max_age
+        self._cache: "OrderedDict[str, SessionSummary]" = OrderedDict()
+        self._running: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(concurrency)
+        self.refreshes = 0
+        self.failures = 0
+
+    def _remember(self, session_id: str, summary: SessionSummary):
+        self._cache[session_id] = summary
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.max_sessions:
+            self._cache.popitem(last=False)
+
+    async def get(self, session_id: str) -> SessionSummary:
+        """The session's summary, from the cache or Supabase."""
+        cached = self._cache.get(session_id)
+        if cached is not None and time.monotonic() - cached.loaded_at < self.max_age:
+            self._cache.move_to_end(session_id)
+            return cached
+        row = await self.load(session_id)
+        summary = SessionSummary(
+            summary=(row or {}).get("summary") or "",
+            covered_until=(row or {}).get("covered_until"),
+            loaded_at=time.monotonic()
+        )
+        self._remember(session_id, summary)
+        return summary
+
+    def note_uncovered(self, session_id: str, count: int):
+        """Start a background refresh if ``count`` stored messages are newer than the summary's cursor."""
+        if count < self.keep_recent + self.refresh_every or session_id in self._running:
+            return
+        self._running.add(session_id)
+        task = asyncio.create_task(self._refresh(session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, session_id: str):
+        try:
+            async with self._slots:
+                await self.refresh(session_id)
+            self.refreshes += 1
+        except Exception as e:
+            self.failures += 1
+            print(f"Failed to refresh summary of session {session_id}: {str(e)}")
+        finally:
+            self._running.discard(session_id)
+
+    async def refresh(self, session_id: str):
+        """Fold the messages after the summary's cursor, except the newest few, into the summary."""
+        current = await self.get(session_id)
+        rows = await self.fetch_after(session_id, current.covered_until, self.batch_size)
+        if len(rows) <= self.keep_recent:
+            return
+        older = rows[:len(rows) - self.keep_recent]
+        summary = await self.summarize(current.summary, older)
+        covered_until = older[-1]["created_at"]
+        await self.save(session_id, summary, covered_until)
+        self._remember(session_id, SessionSummary(summary, covered_until, time.monotonic()))
+
+    def is_covered(self, summary: SessionSummary, created_at: Optional[str]) -> bool:
+        """Whether a message created at ``created_at`` is already part of the summary."""
+        if not summary.covered_until or not created_at:
+            return False
+        return parse_timestamp(created_at) <= parse_timestamp(summary.covered_until)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_sessions": len(self._cache),
+            "refreshing": len(self._running),
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
@@ -0,0 +1,44 @@
+from history_cache import CachedMessage, SessionHistoryCache
+
+
+def message(key: str, message_type: str = "human") -> CachedMessage:
+    return CachedMessage(key=key, message_type=message_type, request_id=None, message=key, size=10)
+
+
+def keys(entries):
+    return [entry.key for entry in entries]
+
+
+def test_load_is_cached_with_messages_stored_while_it_ran():
+    cache = SessionHistoryCache(turns=4)
+    assert cache.get("s") is None
+
+    # prepare_turn reads the history while storing the query of the same turn
+    token = cache.begin_load("s")
+    cache.append("s", message("q3"))
+    cache.finish_load(token, [message("q1"), message("a1", "ai"), message("q3")])
+
+    assert keys(cache.get("s")) == ["q1", "a1", "q3"]
+    cache.append("s", message("a3", "ai"))
+    cache.append("s", message("q4"))
+    assert keys(cache.get("s")) == ["a1", "q3", "a3", "q4"]
+    assert cache.stats()["hits"] == 2
+
+
+def test_read_that_missed_a_store_gets_it_merged():
+    cache = SessionHistoryCache(turns=10)
+    token = cache.begin_load("s")
+    cache.append("s", message("q2"))
+    cache.finish_load(token, [message("q1")])
+    assert keys(cache.get("s")) == ["q1", "q2"]
+
+
+def test_failed_load_caches_nothing():
+    cache = SessionHistoryCache()
+    token = cache.begin_load("s")
+    cache.append("s", message("q1"))
+    cache.finish_load(token, None)
+    assert cache.get("s") is None
+    # Stores to sessions that aren't cached are not kept
+    cache.append("s", message("q2"))
+    assert cache.get("s") is None
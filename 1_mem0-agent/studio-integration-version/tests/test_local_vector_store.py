@@ -0,0 +1,135 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import local_vector_store
+from local_vector_store import LocalVectorStore, fcntl
+
+
+@pytest.mark.skipif(fcntl is None, reason="file locks need fcntl")
+def test_second_process_cannot_open_the_store(tmp_path):
+    store = LocalVectorStore(str(tmp_path), collection_name="memories", embedding_model_dims=4)
+    store.insert([[1, 0, 0, 0]], payloads=[{"user_id": "u", "data": "a"}], ids=["a"])
+
+    opened = subprocess.run(
+        [sys.executable, "-c", f"from local_vector_store import LocalVectorStore; LocalVectorStore({str(tmp_path)!r}, 'memories', 4)"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(local_vector_store.__file__)
+    )
+    assert opened.returncode != 0
+    assert "in use by another process" in opened.stderr
+    # The first process's vector is untouched
+    assert store.search("a", [1, 0, 0, 0], limit=1, filters={"user_id": "u"})[0].id == "a"
+
+
+def test_local_to_local_copy_under_one_path(tmp_path, monkeypatch):
+    from memory_transfer import copy_memories
+
+    # The checkpoint is written to the working directory
+    monkeypatch.chdir(tmp_path)
+    store_path = str(tmp_path / "store")
+    source = LocalVectorStore(store_path, collection_name="a", embedding_model_dims=4)
+    source.insert([[1, 0, 0, 0], [0, 1, 0, 0]], payloads=[{"user_id": "u", "data": "x"}, {"user_id": "u", "data": "y"}], ids=["x", "y"])
+    source.close()
+
+    assert copy_memories("local:a", "local:b", local_path=store_path) == 2
+
+    # Opening a collection again is refused while a store in this process holds it
+    copied = LocalVectorStore(store_path, collection_name="b", embedding_model_dims=4)
+    assert [r.id for r in copied.list()[0]] == ["x", "y"]
+    if fcntl is not None:
+        with pytest.raises(RuntimeError, match="already open in this process"):
+            LocalVectorStore(store_path, collection_name="b", embedding_model_dims=4)
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def test_exact_search_ranks_by_cosine_distance(tmp_path):
+    store = LocalVectorStore(str(tmp_path), collection_name="memories", embedding_model_dims=3)
+    store.insert(
+        [[1, 0, 0], [1, 1, 0], [0, 1, 0], [-1, 0, 0], [1, 0, 0]],
+        payloads=[{"user_id": "u", "data": name} for name in "abcd"] + [{"user_id": "other", "data": "e"}],
+        ids=["a", "b", "c", "d", "e"]
+    )
+
+    hits = store.search("q", [2, 0, 0], limit=3, filters={"user_id": "u"})
+    assert [hit.id for hit in hits] == ["a", "b", "c"]
+    assert [hit.score for hit in hits] == pytest.approx([0.0, 1 - np.sqrt(0.5), 1.0], abs=1e-6)
+    assert hits[0].payload == {"user_id": "u", "data": "a"}
+    # Without a user filter every user's vectors are searched
+    assert {hit.id for hit in store.search("q", [1, 0, 0], limit=2)} == {"a", "e"}
+    assert len(store.search("q", [1, 0, 0], limit=10, filters={"user_id": "u"})) == 4
+
+
+@pytest.mark.skipif(local_vector_store.hnswlib is None, reason="needs hnswlib")
+def test_large_users_switch_to_hnsw_with_high_recall(tmp_path):
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(600, 16)).astype(np.float32)
+    store = LocalVectorStore(str(tmp_path), collection_name="memories", embedding_model_dims=16, ann_threshold=100)
+    store.insert(
+        vectors.tolist(),
+        payloads=[{"user_id": "big" if i < 500 else "small"} for i in range(600)],
+        ids=[f"m{i:03d}" for i in range(600)]
+    )
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    found = relevant = 0
+    for query in rng.normal(size=(20, 16)):
+        expected = np.argsort(-(normalized[:500] @ (query / np.linalg.norm(query))))[:10]
+        hits = store.search("q", query.tolist(), limit=10, filters={"user_id": "big"})
+        found += len({hit.id for hit in hits} & {f"m{i:03d}" for i in expected})
+        relevant += len(expected)
+    assert found / relevant >= 0.95
+    assert store.col_info()["ann_indexes"] == 1
+
+    # The small user stays on exact search
+    small = store.search("q", vectors[550].tolist(), limit=1, filters={"user_id": "small"})
+    assert small[0].id == "m550" and small[0].score == pytest.approx(0.0, abs=1e-6)
+    assert store.col_info()["ann_indexes"] == 1
+
+
+def test_update_moves_a_vector_between_users_and_delete_removes_it(tmp_path):
+    store = LocalVectorStore(str(tmp_path), collection_name="memories", embedding_model_dims=2)
+    store.insert([[1, 0], [0, 1]], payloads=[{"user_id": "u", "data": "a"}, {"user_id": "u", "data": "b"}], ids=["a", "b"])
+
+    store.update("a", payload={"user_id": "v", "data": "a moved"})
+    assert [hit.id for hit in store.search("q", [1, 0], limit=5, filters={"user_id": "u"})] == ["b"]
+    moved = store.search("q", [1, 0], limit=5, filters={"user_id": "v"})
+    assert [(hit.id, hit.payload["data"]) for hit in moved] == [("a", "a moved")]
+
+    store.update("b", vector=unit(1, 1))
+    assert store.search("q", [1, 1], limit=1, filters={"user_id": "u"})[0].score == pytest.approx(0.0, abs=1e-6)
+    assert store.get("b").payload == {"user_id": "u", "data": "b"}
+
+    store.delete("a")
+    assert store.get("a") is None
+    assert store.search("q", [1, 0], limit=5, filters={"user_id": "v"}) == []
+    assert [r.id for r in store.list()[0]] == ["b"]
+
+
+def test_store_reloads_from_disk_after_close(tmp_path):
+    store = LocalVectorStore(str(tmp_path), collection_name="memories", embedding_model_dims=2)
+    # More rows than the initial file capacity, so the vector file has grown
+    store.insert(
+        [unit(1, i / 2000) for i in range(1500)],
+        payloads=[{"user_id": "u", "data": str(i)} for i in range(1500)],
+        ids=[f"m{i}" for i in range(1500)]
+    )
+    store.update("m0", payload={"user_id": "v", "data": "moved"})
+    store.delete("m1")
+    store.close()
+
+    reopened = LocalVectorStore(str(tmp_path), collection_name="memories", embedding_model_dims=None)
+    assert reopened.dims == 2 and reopened.col_info()["count"] == 1499
+    assert reopened.get("m1") is None
+    assert reopened.get("m0").payload == {"user_id": "v", "data": "moved"}
+    assert reopened.search("q", [0, 1], limit=1, filters={"user_id": "u"})[0].id == "m1499"
+    with pytest.raises(ValueError):
+        LocalVectorStore(str(tmp_path / "other"), collection_name="memories", embedding_model_dims=None)
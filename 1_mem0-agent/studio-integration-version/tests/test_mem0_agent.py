@@ -0,0 +1,52 @@
+import asyncio
+
+from pydantic_ai.messages import ModelRequest, ModelResponse, SystemPromptPart, TextPart, UserPromptPart
+from pydantic_ai.models.function import FunctionModel
+
+from mem0_agent import SYSTEM_PROMPT, Mem0Deps, mem0_agent, with_context
+
+
+def run_and_capture_prompts(history, deps):
+    """Run the agent on a FunctionModel; returns the system prompts the model was sent."""
+    seen = []
+
+    def model(messages, info):
+        seen.extend(
+            part.content for message in messages if isinstance(message, ModelRequest)
+            for part in message.parts if isinstance(part, SystemPromptPart)
+        )
+        return ModelResponse(parts=[TextPart("ok")])
+
+    async def scenario():
+        return await mem0_agent.run(
+            "What do I like?",
+            message_history=with_context(history, deps),
+            deps=deps,
+            model=FunctionModel(model)
+        )
+
+    assert asyncio.run(scenario()).data == "ok"
+    return seen
+
+
+def test_memories_reach_the_model_when_the_conversation_has_history():
+    history = [
+        ModelRequest(parts=[UserPromptPart("Hi")]),
+        ModelResponse(parts=[TextPart("Hello!")]),
+    ]
+    prompts = run_and_capture_prompts(history, Mem0Deps(memories="- Likes green tea"))
+    assert prompts == [SYSTEM_PROMPT, "User Memories:\n- Likes green tea"]
+
+
+def test_first_turn_gets_the_prompt_once_and_no_empty_memory_section():
+    assert run_and_capture_prompts([], Mem0Deps(memories="")) == [SYSTEM_PROMPT]
+
+
+def test_summary_reaches_the_model_ahead_of_the_recent_turns():
+    history = [ModelRequest(parts=[UserPromptPart("And the second one?")])]
+    deps = Mem0Deps(memories="- Lives in Lisbon", summary="The user asked for two book recommendations.")
+    assert run_and_capture_prompts(history, deps) == [
+        SYSTEM_PROMPT,
+        "User Memories:\n- Lives in Lisbon",
+        "Summary of the earlier conversation:\nThe user asked for two book recommendations.",
+    ]
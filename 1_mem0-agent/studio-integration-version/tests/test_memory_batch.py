@@ -0,0 +1,30 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List
+
+from memory_batch import MemoryBatchIngestor, RateLimitGate
+from resilience import CircuitOpenError
+
+
+@dataclass
+class Item:
+    user_id: str
+    messages: List[Dict[str, str]]
+
+
+def test_open_circuit_pauses_the_batch_without_failing_items():
+    calls = []
+
+    async def add(messages, user_id):
+        calls.append(user_id)
+        if len(calls) <= 2:
+            raise CircuitOpenError("mem0_batch", 0.01)
+        return {"results": [{"memory": "x"}]}
+
+    async def scenario():
+        ingestor = MemoryBatchIngestor(add, max_retries=0, gate=RateLimitGate(min_cooldown=0.001))
+        return await ingestor.ingest([Item("u", [{"role": "user", "content": "hi"}])])
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 3
+    assert results[0].status == "added" and results[0].attempts == 1 and results[0].memories == 1
@@ -0,0 +1,44 @@
+from memory_cache import CachedMemory
+
+
+class FakeMemory:
+    def __init__(self):
+        self.memories = {}
+        self.searches = 0
+
+    def search(self, query, user_id=None, limit=100):
+        self.searches += 1
+        return {"results": list(self.memories.get(user_id, []))}
+
+    def add(self, messages, user_id=None):
+        self.memories.setdefault(user_id, []).append(messages)
+
+
+def test_repeated_search_is_cached_until_a_write():
+    backend = FakeMemory()
+    memory = CachedMemory(backend)
+    memory.search("Where do I live?", user_id="u")
+    memory.search("where do I live", user_id="u")
+    assert backend.searches == 1
+
+    memory.add("lives in Hanoi", user_id="u")
+    assert memory.search("where do I live", user_id="u")["results"] == ["lives in Hanoi"]
+    assert backend.searches == 2
+
+
+def test_write_in_one_worker_invalidates_the_others(tmp_path):
+    # Two workers: separate processes' caches over the same store and generations file
+    backend = FakeMemory()
+    path = str(tmp_path / "generations.sqlite3")
+    first = CachedMemory(backend, generations_path=path)
+    second = CachedMemory(backend, generations_path=path)
+    assert second.search("home", user_id="u")["results"] == []
+
+    first.add("lives in Hanoi", user_id="u")
+    assert second.search("home", user_id="u")["results"] == ["lives in Hanoi"]
+
+    # Other users' entries stay cached
+    second.search("home", user_id="v")
+    first.add("likes tea", user_id="u")
+    second.search("home", user_id="v")
+    assert second.hits == 1
@@ -0,0 +1,30 @@
+import os
+
+# Keep mem0 from sending telemetry while the tests build Memory instances
+os.environ.setdefault("MEM0_TELEMETRY", "False")
+
+from local_vector_store import LocalVectorStore
+from memory_cache import CachedMemory
+from memory_factory import build_memory
+
+
+def test_reset_clears_the_local_store_instead_of_rebuilding_it(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    memory = build_memory({
+        "vector_store": {
+            "provider": "local",
+            "config": {"path": str(tmp_path / "store"), "collection_name": "memories", "embedding_model_dims": 3}
+        },
+        "history_db_path": str(tmp_path / "history.db"),
+    })
+    store = memory.vector_store
+    store.insert([[1, 0, 0]], payloads=[{"user_id": "u", "data": "a"}], ids=["a"])
+    memory.db.add_history("a", None, "a", "ADD")
+
+    CachedMemory(memory).reset()
+
+    assert memory.vector_store is store and isinstance(store, LocalVectorStore)
+    assert store.get("a") is None and store.col_info()["count"] == 0
+    assert memory.history("a") == []
+    store.insert([[0, 1, 0]], payloads=[{"user_id": "u", "data": "b"}], ids=["b"])
+    assert store.search("q", [0, 1, 0], limit=1, filters={"user_id": "u"})[0].id == "b"
@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from memory_queue import MemoryJob, MemoryQueue
+from resilience import CircuitOpenError
+
+
+def job(user_id: str, text: str) -> MemoryJob:
+    return MemoryJob(user_id=user_id, messages=[{"role": "user", "content": text}])
+
+
+def test_spool_replays_queued_and_interrupted_jobs(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    handled = []
+
+    async def stuck(j):
+        await asyncio.sleep(60)
+
+    async def record(j):
+        handled.append(j.messages[0]["content"])
+
+    async def scenario():
+        queue = MemoryQueue(stuck, workers=1, spool_path=str(spool))
+        await queue.start()
+        for i in range(3):
+            await queue.submit(job("u", f"m{i}"))
+        await asyncio.sleep(0.01)
+        await queue.stop(timeout=0.05)
+
+        replay = MemoryQueue(record, workers=1, spool_path=str(spool))
+        await replay.start()
+        await replay.flush(timeout=1)
+        await replay.stop()
+
+    asyncio.run(scenario())
+    # m0 was running when stop() gave up; it is replayed first, in order
+    assert handled == ["m0", "m1", "m2"]
+    assert not spool.exists()
+
+
+def test_spool_is_claimed_by_one_queue_only(tmp_path):
+    spool = tmp_path / "spool.jsonl"
+    spool.write_text("".join(json.dumps({"user_id": "u", "messages": []}) + "\n" for _ in range(4)))
+    first = MemoryQueue(lambda j: None, spool_path=str(spool))
+    second = MemoryQueue(lambda j: None, spool_path=str(spool))
+
+    assert len(first._load_spool()) == 4
+    # The spool is gone: nothing to replay and no FileNotFoundError
+    assert second._load_spool() == []
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_job_rejected_by_an_open_circuit_runs_once_it_closes():
+    calls = []
+
+    async def handler(j):
+        calls.append(j.user_id)
+        if len(calls) == 1:
+            raise CircuitOpenError("mem0", 0.001)
+
+    async def scenario():
+        queue = MemoryQueue(handler, workers=1)
+        await queue.start()
+        await queue.submit(job("u", "m0"))
+        await queue.flush(timeout=1)
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    assert calls == ["u", "u"]
+    assert stats["completed"] == 1 and stats["failed"] == 0 and stats["circuit_waits"] == 1
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from message_writer import AlreadyStoredError, MessageBatcher
+from resilience import CircuitOpenError
+
+
+def run(scenario):
+    return asyncio.run(scenario())
+
+
+def test_concurrent_rows_are_written_as_one_batch():
+    batches = []
+
+    async def write_rows(rows):
+        batches.append([row["idempotency_key"] for row in rows])
+
+    async def scenario():
+        batcher = MessageBatcher(write_rows, max_delay=0.01)
+        await batcher.start()
+        rows = await asyncio.gather(*(batcher.enqueue({"idempotency_key": str(i)}) for i in range(3)))
+        await batcher.stop()
+        return rows
+
+    rows = run(scenario)
+    assert batches == [["0", "1", "2"]]
+    # created_at is strictly increasing, in enqueue order
+    assert [row["created_at"] for row in rows] == sorted({row["created_at"] for row in rows})
+
+
+def test_failed_batch_is_retried_before_enqueue_returns():
+    attempts = []
+
+    async def write_rows(rows):
+        attempts.append(len(rows))
+        if len(attempts) < 3:
+            raise ConnectionError("supabase unreachable")
+
+    async def scenario():
+        batcher = MessageBatcher(write_rows, max_delay=0.01, max_retries=3, retry_backoff=0.001)
+        await batcher.start()
+        await batcher.enqueue({"idempotency_key": "a"})
+        stats = batcher.stats()
+        await batcher.stop()
+        return stats
+
+    stats = run(scenario)
+    assert attempts == [1, 1, 1]
+    assert stats["rows_written"] == 1 and stats["failed_rows"] == 0
+
+
+def test_dropped_rows_raise_in_enqueue():
+    async def write_rows(rows):
+        raise ConnectionError("supabase unreachable")
+
+    async def scenario():
+        batcher = MessageBatcher(write_rows, max_delay=0.01, max_retries=2, retry_backoff=0.001)
+        await batcher.start()
+        try:
+            with pytest.raises(ConnectionError):
+                await batcher.enqueue({"idempotency_key": "a"})
+            # The flusher carries on with later rows
+            with pytest.raises(ConnectionError):
+                await batcher.enqueue({"idempotency_key": "b"})
+            return batcher.stats()
+        finally:
+            await batcher.stop()
+
+    assert run(scenario)["failed_rows"] == 2
+
+
+def test_open_circuit_delays_the_batch_without_using_up_retries():
+    calls = []
+
+    async def write_rows(rows):
+        calls.append(len(rows))
+        if len(calls) <= 3:
+            raise CircuitOpenError("supabase_write", 0.001)
+
+    async def scenario():
+        batcher = MessageBatcher(write_rows, max_delay=0.01, max_retries=0)
+        await batcher.start()
+        await batcher.enqueue({"idempotency_key": "a"})
+        stats = batcher.stats()
+        await batcher.stop()
+        return stats
+
+    stats = run(scenario)
+    assert len(calls) == 4
+    assert stats["rows_written"] == 1 and stats["circuit_waits"] == 3
+
+
+def test_rows_the_writer_skipped_raise_already_stored():
+    async def write_rows(rows):
+        # "old" was stored by an earlier batch; only "new" is inserted
+        return [row["idempotency_key"] for row in rows if row["idempotency_key"] != "old"]
+
+    async def scenario():
+        batcher = MessageBatcher(write_rows, max_delay=0.01)
+        await batcher.start()
+        try:
+            new, old = await asyncio.gather(
+                batcher.enqueue({"idempotency_key": "new"}),
+                batcher.enqueue({"idempotency_key": "old"}),
+                return_exceptions=True
+            )
+            return new, old, batcher.stats()
+        finally:
+            await batcher.stop()
+
+    new, old, stats = run(scenario)
+    assert new["idempotency_key"] == "new"
+    assert isinstance(old, AlreadyStoredError) and old.row["idempotency_key"] == "old"
+    assert stats["rows_written"] == 1 and stats["duplicate_rows"] == 1 and stats["failed_rows"] == 0
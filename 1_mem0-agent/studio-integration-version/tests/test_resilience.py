@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpenError, Dependency, RetryBudget, is_transient
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def failing(error):
+    async def call(timeout):
+        raise error
+    return call
+
+
+async def succeeding(timeout):
+    return "ok"
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_good_trial():
+    dependency = Dependency("db", breaker=CircuitBreaker("db", min_calls=3, cooldown=0.05))
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                await dependency.call("read", failing(ConnectionError("down")))
+        assert dependency.breaker.state == "open"
+
+        # Rejected without calling the dependency
+        calls = []
+        with pytest.raises(CircuitOpenError) as rejected:
+            await dependency.call("read", lambda timeout: calls.append(timeout))
+        assert calls == [] and 0 < rejected.value.retry_after <= 0.05
+
+        await asyncio.sleep(0.06)
+        assert dependency.breaker.state == "half_open"
+        assert await dependency.call("read", succeeding) == "ok"
+        assert dependency.breaker.state == "closed"
+
+    asyncio.run(scenario())
+    assert dependency.stats()["opened"] == 1 and dependency.stats()["rejected"] == 1
+
+
+def test_failed_trial_keeps_the_breaker_open():
+    breaker = CircuitBreaker("db", min_calls=2, cooldown=0.01)
+    breaker.record(False)
+    breaker.record(False)
+    time.sleep(0.02)
+    breaker.allow()
+    breaker.record(False)
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_rate_limits_are_retried_but_never_open_the_breaker():
+    dependency = Dependency("llm", max_attempts=3, backoff=0.001, breaker=CircuitBreaker("llm", min_calls=2))
+    attempts = []
+
+    async def rate_limited(timeout):
+        attempts.append(timeout)
+        raise HTTPError(429)
+
+    async def scenario():
+        for _ in range(4):
+            with pytest.raises(HTTPError):
+                await dependency.call("add", rate_limited, retry=True)
+
+    asyncio.run(scenario())
+    assert is_transient(HTTPError(429))
+    assert len(attempts) == 12
+    assert dependency.breaker.state == "closed"
+    assert dependency.stats()["rate_limited"] == 12 and dependency.stats()["failures"] == 0
+
+
+def test_bad_requests_are_not_retried_and_count_as_answers():
+    dependency = Dependency("db", max_attempts=3, breaker=CircuitBreaker("db", min_calls=2))
+    attempts = []
+
+    async def bad_request(timeout):
+        attempts.append(timeout)
+        raise HTTPError(400)
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(HTTPError):
+                await dependency.call("write", bad_request, retry=True)
+
+    asyncio.run(scenario())
+    assert len(attempts) == 3 and dependency.breaker.state == "closed"
+
+
+def test_retry_budget_caps_retries_at_a_share_of_calls():
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0, ttl=10.0)
+    for _ in range(4):
+        budget.record_call()
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+    assert budget.exhausted == 1
@@ -0,0 +1,34 @@
+import asyncio
+
+from session_summary import SessionSummarizer
+
+
+def test_refresh_starts_from_the_stored_count_and_keeps_the_newest_messages():
+    rows = [{"created_at": f"2025-01-01T00:00:{i:02d}+00:00", "message": {"type": "human", "content": f"m{i}"}} for i in range(8)]
+    saved = []
+
+    async def load(session_id):
+        return None
+
+    async def save(session_id, summary, covered_until):
+        saved.append((summary, covered_until))
+
+    async def fetch_after(session_id, cursor, limit):
+        return rows
+
+    async def summarize(previous, older):
+        return " ".join(row["message"]["content"] for row in older)
+
+    async def scenario():
+        summarizer = SessionSummarizer(load, save, fetch_after, summarize, keep_recent=4, refresh_every=4)
+        # Whichever worker serves the turn sees the same stored count
+        summarizer.note_uncovered("s", 7)
+        assert summarizer.stats()["refreshing"] == 0
+        summarizer.note_uncovered("s", 8)
+        summarizer.note_uncovered("s", 8)
+        await asyncio.gather(*summarizer._tasks)
+        return summarizer
+
+    summarizer = asyncio.run(scenario())
+    assert saved == [("m0 m1 m2 m3", rows[3]["created_at"])]
+    assert summarizer.stats()["refreshes"] == 1
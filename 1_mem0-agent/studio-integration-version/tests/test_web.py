@@ -0,0 +1,58 @@
+import importlib
+import json
+import os
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def web(tmp_path_factory):
+    """The web app, run from a scratch directory since it writes its templates to the working one."""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("web"))
+    try:
+        yield importlib.import_module("mem0_agent_web")
+    finally:
+        os.chdir(cwd)
+
+
+class FakeAPI:
+    """The agent API's history and POST endpoints over a list of stored messages."""
+
+    def __init__(self):
+        self.rows = []
+
+    def add(self, message_type: str, content: str):
+        self.rows.append({"message": {"type": message_type, "content": content}})
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            body = json.loads(request.content)
+            self.add("human", body["query"])
+            self.add("ai", f"re: {body['query']}")
+            return httpx.Response(200, json={"success": True, "message": f"re: {body['query']}", "cursor": str(len(self.rows))})
+        params = request.url.params
+        limit = int(params.get("limit", 50))
+        start = int(params.get("after", max(len(self.rows) - limit, 0)))
+        page = self.rows[start:start + limit]
+        headers = {"X-After-Cursor": str(start + len(page))} if page else {}
+        return httpx.Response(200, json=page, headers=headers)
+
+
+def test_post_shows_messages_another_tab_wrote_before_the_turn(web):
+    api = FakeAPI()
+    api.add("human", "hello")
+    api.add("ai", "hi")
+    with TestClient(web.app, cookies={"session_id": "s", "user_id": "u"}) as client:
+        web.app.state.api_client = httpx.AsyncClient(transport=httpx.MockTransport(api.handle), base_url="http://api")
+        client.get("/")
+        # Another tab's turn lands after this page view
+        api.add("human", "from the other tab")
+        api.add("ai", "other reply")
+        client.post("/", data={"message": "mine"})
+
+    assert [m["content"] for m in web.session_histories["s"]["messages"]] == [
+        "hello", "hi", "from the other tab", "other reply", "mine", "re: mine"
+    ]
@@ -0,0 +1,30 @@
+import time
+from typing import Any, Awaitable, Dict
+
+import logfire
+
+from metrics import observe_stage
+
+
+class StageTimer:
+    """Collects per-stage durations of one request for the Server-Timing header.
+
+    Each stage also runs in a logfire span (debug level, so it stays off the
+    console) and is observed in the stage histogram of /metrics.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    async def measure(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        """Await ``awaitable`` and record how long it took under ``name``."""
+        start = time.perf_counter()
+        try:
+            with logfire.span("{stage}", stage=name, _level="debug"):
+                return await awaitable
+        finally:
+            self.stages[name] = time.perf_counter() - start
+            observe_stage(name, self.stages[name])
+
+    def header(self) -> str:
+        return ", ".join(f"{name};dur={1000 * seconds:.1f}" for name, seconds in self.stages.items())